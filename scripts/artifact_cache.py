@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Default location and size bound of the local artifact store
+CACHE_DIR = Path('.cache/artifacts')
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+# OpenSCAD sources every render depends on
+SCAD_ROOT = Path('swatch')
+
+# Values that are expensive to compute and fixed for the life of a process
+_memo = {}
+
+def hash_file(path: Path) -> str:
+    """Return the SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def hash_path(path: Path) -> str:
+    """Return the SHA-256 of a file, or of every file under a directory (paths and contents)."""
+    path = Path(path)
+    if path.is_file():
+        return hash_file(path)
+    digest = hashlib.sha256()
+    for child in sorted(p for p in path.rglob('*') if p.is_file()):
+        digest.update(str(child.relative_to(path)).encode() + b'\0')
+        digest.update(hash_file(child).encode() + b'\0')
+    return digest.hexdigest()
+
+def scad_sources_hash(root: Path = SCAD_ROOT) -> str:
+    """Hash every .scad file under the swatch sources (paths and contents)."""
+    memo_key = ('scad', str(Path(root).resolve()))
+    if memo_key not in _memo:
+        digest = hashlib.sha256()
+        for path in sorted(Path(root).rglob('*.scad')):
+            digest.update(str(path.relative_to(root)).encode() + b'\0')
+            digest.update(hash_file(path).encode() + b'\0')
+        _memo[memo_key] = digest.hexdigest()
+    return _memo[memo_key]
+
+def submodule_revision(path: str) -> str:
+    """Return the checked-out commit of a submodule (e.g. the pinned BOSL2 revision)."""
+    memo_key = ('submodule', path)
+    if memo_key not in _memo:
+        result = subprocess.run(["git", "-C", path, "rev-parse", "HEAD"], capture_output=True, text=True)
+        _memo[memo_key] = result.stdout.strip() if result.returncode == 0 else "unknown"
+    return _memo[memo_key]
+
+def tool_version(executable) -> str:
+    """Identify a tool build by its --version output, falling back to the binary's size and mtime."""
+    memo_key = ('tool', str(executable))
+    if memo_key not in _memo:
+        version = ""
+        try:
+            result = subprocess.run([str(executable), "--version"], capture_output=True, text=True, timeout=60)
+            if result.returncode == 0:
+                lines = (result.stdout + result.stderr).strip().splitlines()
+                version = lines[0] if lines else ""
+        except (OSError, subprocess.TimeoutExpired):
+            pass
+        if not version:
+            stat = Path(executable).stat() if Path(executable).exists() else None
+            version = f"{executable}:{stat.st_size}:{stat.st_mtime_ns}" if stat else str(executable)
+        _memo[memo_key] = version
+    return _memo[memo_key]
+
+def cache_key(**parts) -> str:
+    """Derive a content address from everything that determines an artifact."""
+    encoded = json.dumps(parts, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+class ArtifactStore:
+    """Content-addressed store of build artifacts with size-bounded LRU eviction.
+
+    Objects are plain files under objects/<key[:2]>/<key>; their mtime is the
+    last-use time, so concurrent processes need no shared index. Hits, misses,
+    stores and evictions are appended to events.jsonl for statistics.
+    """
+    def __init__(self, root: Path = CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.objects_dir = self.root / "objects"
+        self.events_file = self.root / "events.jsonl"
+
+    def object_path(self, key: str) -> Path:
+        """Return where an artifact with this key is stored."""
+        return self.objects_dir / key[:2] / key
+
+    def _record(self, event: str, key: str, label: Optional[str] = None, size: int = 0):
+        """Append one event to the statistics log."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        line = json.dumps({'time': time.time(), 'event': event, 'key': key, 'label': label, 'size': size})
+        # Single short appends are atomic, so concurrent workers can share the log
+        with open(self.events_file, 'a') as f:
+            f.write(line + '\n')
+
+    def fetch(self, key: str, dest: Path, label: Optional[str] = None) -> bool:
+        """Copy a cached artifact to dest. Returns False on a miss."""
+        path = self.object_path(key)
+        try:
+            dest = Path(dest)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            tmp_dest = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+            shutil.copyfile(path, tmp_dest)
+            os.replace(tmp_dest, dest)
+            os.utime(path)  # Mark as recently used
+        except FileNotFoundError:
+            self._record('miss', key, label)
+            return False
+
+        self._record('hit', key, label, dest.stat().st_size)
+        return True
+
+    def store(self, key: str, src: Path, label: Optional[str] = None):
+        """Add an artifact to the store, then evict least recently used objects over the bound."""
+        path = self.object_path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{key}.{os.getpid()}.tmp")
+        shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, path)
+        self._record('store', key, label, path.stat().st_size)
+        self.evict()
+
+    def entries(self) -> List[Dict]:
+        """List stored objects with their size and last-use time."""
+        entries = []
+        if not self.objects_dir.exists():
+            return entries
+        for path in self.objects_dir.glob('*/*'):
+            if path.name.startswith('.'):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append({'key': path.name, 'path': path, 'size': stat.st_size, 'used': stat.st_mtime})
+        return entries
+
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """Delete least recently used objects until the store fits. Returns bytes freed."""
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        entries = sorted(self.entries(), key=lambda e: e['used'])
+        total = sum(e['size'] for e in entries)
+        freed = 0
+        for entry in entries:
+            if total <= max_bytes:
+                break
+            try:
+                entry['path'].unlink()
+            except FileNotFoundError:
+                continue
+            total -= entry['size']
+            freed += entry['size']
+            self._record('evict', entry['key'], size=entry['size'])
+        return freed
+
+    def stats(self) -> Dict:
+        """Summarize store contents and the hit/miss history."""
+        counts = {'hit': 0, 'miss': 0, 'store': 0, 'evict': 0}
+        by_label = {}
+        if self.events_file.exists():
+            with open(self.events_file) as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    counts[event['event']] = counts.get(event['event'], 0) + 1
+                    if event['event'] in ('hit', 'miss') and event.get('label'):
+                        label = by_label.setdefault(event['label'], {'hit': 0, 'miss': 0})
+                        label[event['event']] += 1
+
+        entries = self.entries()
+        lookups = counts['hit'] + counts['miss']
+        return {
+            'objects': len(entries),
+            'bytes': sum(e['size'] for e in entries),
+            'max_bytes': self.max_bytes,
+            'hit_rate': counts['hit'] / lookups if lookups else None,
+            'events': counts,
+            'by_label': by_label,
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect and maintain the build artifact cache')
+    parser.add_argument('command', choices=['stats', 'prune', 'clear'], help='Action to perform')
+    parser.add_argument('--cache-dir', type=Path, default=CACHE_DIR, help='Artifact store directory')
+    parser.add_argument('--max-size', type=int, default=DEFAULT_MAX_BYTES,
+                      help='Size bound in bytes used by prune')
+    args = parser.parse_args()
+
+    store = ArtifactStore(args.cache_dir, args.max_size)
+    if args.command == 'stats':
+        print(json.dumps(store.stats(), indent=2))
+    elif args.command == 'prune':
+        print(f"Freed {store.evict()} bytes")
+    elif args.command == 'clear':
+        if store.root.exists():
+            shutil.rmtree(store.root)
+        print(f"Removed {store.root}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+from get_material_config import get_latest_config_file
+from profile_index import read_config_file, parent_section_pattern, InheritanceResolver
+
+# Keys looked up for every section, the ones the pipeline actually reads first
+DEFAULT_KEYS = [
+    'temperature',
+    'first_layer_temperature',
+    'bed_temperature',
+    'filament_type',
+    'layer_height',
+    'compatible_printers_condition',
+]
+
+def scan_inherited_value(config, section_name, key):
+    """Previous resolver: scan every section for each parent, per key."""
+    visited = set()
+
+    def _get_value(section):
+        if section in visited:
+            return None
+        visited.add(section)
+
+        value = config[section].get(key)
+        if value is not None:
+            return value
+
+        inherits = config[section].get('inherits')
+        if inherits:
+            section_type = section.split(':', 1)[0]
+            for parent in inherits.split(';'):
+                parent_pattern = parent_section_pattern(parent.strip(), section_type)
+                for potential_parent in config.sections():
+                    if re.match(parent_pattern, potential_parent):
+                        value = _get_value(potential_parent)
+                        if value is not None:
+                            return value
+
+        return None
+
+    return _get_value(section_name)
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the indexed inheritance resolver with section scanning')
+    parser.add_argument('config_file', nargs='?', type=Path,
+                      help='Vendor bundle INI (defaults to the latest PrusaResearch bundle)')
+    parser.add_argument('--keys', nargs='+', default=DEFAULT_KEYS,
+                      help='Keys to resolve for every section')
+    parser.add_argument('--limit', type=int, default=200,
+                      help='Sections to resolve with the scanning resolver (0 for all, slow)')
+    args = parser.parse_args()
+
+    config_file = args.config_file or get_latest_config_file()
+    if config_file is None:
+        return 1
+
+    start = time.perf_counter()
+    config = read_config_file(config_file)
+    parse_time = time.perf_counter() - start
+
+    sections = [s for s in config.sections()
+                if s.split(':', 1)[0] in ('filament', 'print', 'printer')]
+    print(f"Bundle: {config_file} ({len(sections)} profile sections, parsed in {parse_time:.2f}s)")
+
+    # Indexed resolver over the whole bundle, including the one-time build
+    start = time.perf_counter()
+    resolver = InheritanceResolver(config)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indexed = {(s, k): resolver.get(s, k) for s in sections for k in args.keys}
+    indexed_time = time.perf_counter() - start
+
+    # Scanning resolver over a sample, it is far too slow for the whole bundle
+    sample = sections if args.limit <= 0 else sections[::max(1, len(sections) // args.limit)][:args.limit]
+    start = time.perf_counter()
+    scanned = {(s, k): scan_inherited_value(config, s, k) for s in sample for k in args.keys}
+    scan_time = time.perf_counter() - start
+
+    mismatches = [key for key, value in scanned.items() if indexed[key] != value]
+
+    indexed_per_lookup = (build_time + indexed_time) / len(indexed)
+    scan_per_lookup = scan_time / len(scanned)
+
+    print(f"\nIndexed: {len(indexed)} lookups, build {build_time * 1000:.1f}ms, "
+          f"lookups {indexed_time * 1000:.1f}ms ({indexed_per_lookup * 1e6:.2f}us/lookup)")
+    print(f"Scanning: {len(scanned)} lookups in {scan_time:.2f}s ({scan_per_lookup * 1e6:.2f}us/lookup)")
+    print(f"Speedup: {scan_per_lookup / indexed_per_lookup:.0f}x per lookup")
+
+    if mismatches:
+        print(f"\n{len(mismatches)} lookups differ:", file=sys.stderr)
+        for section, key in mismatches[:20]:
+            print(f"  - [{section}] {key}: indexed={indexed[(section, key)]!r} "
+                  f"scanning={scanned[(section, key)]!r}", file=sys.stderr)
+        return 1
+
+    print("Results identical for all sampled lookups")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
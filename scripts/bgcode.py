@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import struct
+import sys
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List
+
+# File header: magic, format version, checksum type
+MAGIC = b"GCDE"
+FILE_HEADER = struct.Struct('<4sIH')
+
+# Block header: type, compression, uncompressed size (compressed size follows when compressed)
+BLOCK_HEADER = struct.Struct('<HHI')
+COMPRESSED_SIZE = struct.Struct('<I')
+
+CHECKSUM_NONE = 0
+CHECKSUM_CRC32 = 1
+
+BLOCK_TYPES = {
+    0: "file_metadata",
+    1: "gcode",
+    2: "slicer_metadata",
+    3: "printer_metadata",
+    4: "print_metadata",
+    5: "thumbnail",
+}
+GCODE_BLOCK = 1
+THUMBNAIL = 5
+
+COMPRESSION_NONE = 0
+COMPRESSION_DEFLATE = 1
+COMPRESSIONS = {0: "none", 1: "deflate", 2: "heatshrink_11_4", 3: "heatshrink_12_4"}
+
+THUMBNAIL_FORMATS = {0: "png", 1: "jpg", 2: "qoi"}
+
+# Payloads are read and checksummed in chunks of this size
+CHUNK_SIZE = 1024 * 1024
+
+class BgcodeError(ValueError):
+    """The file is not valid binary G-code."""
+
+class Block:
+    """One block of a binary G-code file, as found in its header."""
+    def __init__(self, block_type: int, compression: int, uncompressed_size: int,
+                 compressed_size: int, params: bytes, offset: int):
+        self.type = block_type
+        self.compression = compression
+        self.uncompressed_size = uncompressed_size
+        self.compressed_size = compressed_size
+        self.params = params
+        self.offset = offset
+        self.data = None
+
+    @property
+    def name(self) -> str:
+        return BLOCK_TYPES.get(self.type, f"unknown_{self.type}")
+
+def read_exact(f: BinaryIO, size: int, what: str) -> bytes:
+    """Read exactly size bytes or raise BgcodeError."""
+    data = f.read(size)
+    if len(data) != size:
+        raise BgcodeError(f"Truncated {what}")
+    return data
+
+def read_file_header(f: BinaryIO) -> int:
+    """Check the file header and return its checksum type."""
+    magic, version, checksum_type = FILE_HEADER.unpack(read_exact(f, FILE_HEADER.size, "file header"))
+    if magic != MAGIC:
+        raise BgcodeError("Not a binary G-code file")
+    if version != 1:
+        raise BgcodeError(f"Unsupported version {version}")
+    if checksum_type not in (CHECKSUM_NONE, CHECKSUM_CRC32):
+        raise BgcodeError(f"Unknown checksum type {checksum_type}")
+    return checksum_type
+
+def iter_blocks(f: BinaryIO, keep_data=lambda block: False) -> Iterator[Block]:
+    """Stream through the blocks of an open file, verifying each block's CRC32.
+
+    Payloads are checksummed chunk by chunk and discarded unless keep_data
+    returns True for the block, so memory stays flat for any file size.
+    """
+    checksum_type = read_file_header(f)
+    while True:
+        offset = f.tell()
+        header = f.read(BLOCK_HEADER.size)
+        if not header:
+            return
+        if len(header) != BLOCK_HEADER.size:
+            raise BgcodeError(f"Truncated block header at offset {offset}")
+        block_type, compression, uncompressed_size = BLOCK_HEADER.unpack(header)
+        if block_type not in BLOCK_TYPES:
+            raise BgcodeError(f"Unknown block type {block_type} at offset {offset}")
+        if compression not in COMPRESSIONS:
+            raise BgcodeError(f"Unknown compression {compression} at offset {offset}")
+
+        compressed_size = uncompressed_size
+        if compression != COMPRESSION_NONE:
+            size_field = read_exact(f, COMPRESSED_SIZE.size, "block header")
+            header += size_field
+            compressed_size, = COMPRESSED_SIZE.unpack(size_field)
+
+        params = read_exact(f, 6 if block_type == THUMBNAIL else 2, "block parameters")
+        block = Block(block_type, compression, uncompressed_size, compressed_size, params, offset)
+
+        crc = zlib.crc32(header + params)
+        keep = keep_data(block)
+        chunks = []
+        remaining = compressed_size
+        while remaining:
+            chunk = read_exact(f, min(remaining, CHUNK_SIZE), f"{block.name} block at offset {offset}")
+            crc = zlib.crc32(chunk, crc)
+            if keep:
+                chunks.append(chunk)
+            remaining -= len(chunk)
+
+        if checksum_type == CHECKSUM_CRC32:
+            stored, = struct.unpack('<I', read_exact(f, 4, "block checksum"))
+            if stored != crc:
+                raise BgcodeError(f"Checksum mismatch in {block.name} block at offset {offset}")
+        if keep:
+            block.data = b"".join(chunks)
+        yield block
+
+def decompress(block: Block) -> bytes:
+    """Return a block's uncompressed payload."""
+    if block.compression == COMPRESSION_NONE:
+        return block.data
+    if block.compression == COMPRESSION_DEFLATE:
+        return zlib.decompress(block.data)
+    raise BgcodeError(f"{COMPRESSIONS[block.compression]} compressed {block.name} blocks are not supported")
+
+def parse_metadata(data: bytes) -> Dict[str, str]:
+    """Parse the key=value lines of an INI-encoded metadata block."""
+    metadata = {}
+    for line in data.decode('utf-8').splitlines():
+        if '=' in line:
+            key, value = line.split('=', 1)
+            metadata[key.strip()] = value.strip()
+    return metadata
+
+def verify_bgcode(path: Path) -> Dict:
+    """Verify every block checksum of a file and count its blocks and G-code bytes."""
+    counts = {}
+    gcode_bytes = 0
+    with open(path, 'rb') as f:
+        for block in iter_blocks(f):
+            counts[block.name] = counts.get(block.name, 0) + 1
+            if block.type == GCODE_BLOCK:
+                gcode_bytes += block.uncompressed_size
+    if not counts.get("gcode"):
+        raise BgcodeError("No G-code blocks")
+    return {'file': str(path), 'blocks': counts, 'gcode_bytes': gcode_bytes, 'size': path.stat().st_size}
+
+def read_metadata(path: Path) -> Dict[str, Dict[str, str]]:
+    """Return the metadata blocks of a file, by block name, without decoding the G-code."""
+    metadata = {}
+    with open(path, 'rb') as f:
+        for block in iter_blocks(f, keep_data=lambda b: b.type not in (GCODE_BLOCK, THUMBNAIL)):
+            if block.data is not None:
+                metadata.setdefault(block.name, {}).update(parse_metadata(decompress(block)))
+    return metadata
+
+def extract_thumbnails(path: Path, output_dir: Path) -> List[Path]:
+    """Write every thumbnail of a file to output_dir and return their paths."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    written = []
+    with open(path, 'rb') as f:
+        for block in iter_blocks(f, keep_data=lambda b: b.type == THUMBNAIL):
+            if block.data is None:
+                continue
+            image_format, width, height = struct.unpack('<HHH', block.params)
+            extension = THUMBNAIL_FORMATS.get(image_format, "bin")
+            thumbnail = output_dir / f"{path.stem}_{width}x{height}.{extension}"
+            thumbnail.write_bytes(decompress(block))
+            written.append(thumbnail)
+    return written
+
+def main():
+    parser = argparse.ArgumentParser(description='Verify binary G-code files and extract their metadata')
+    parser.add_argument('command', choices=['verify', 'metadata', 'thumbnails'], help='What to do')
+    parser.add_argument('files', type=Path, nargs='+', help='.bgcode files')
+    parser.add_argument('--output-dir', type=Path, default=Path('output/thumbnails'),
+                      help='Where thumbnails are written')
+    args = parser.parse_args()
+
+    failed = 0
+    for path in args.files:
+        try:
+            if args.command == 'verify':
+                result = verify_bgcode(path)
+                blocks = ", ".join(f"{count} {name}" for name, count in sorted(result['blocks'].items()))
+                print(f"✅ {path}: {blocks}")
+            elif args.command == 'metadata':
+                print(json.dumps({'file': str(path), 'metadata': read_metadata(path)}))
+            else:
+                for thumbnail in extract_thumbnails(path, args.output_dir):
+                    print(thumbnail)
+        except (OSError, BgcodeError, zlib.error) as e:
+            print(f"❌ {path}: {e}", file=sys.stderr)
+            failed += 1
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,680 @@
+#!/usr/bin/env python3
+
+import argparse
+import csv
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from generate_3mf import output_3mf_path, find_prusaslicer, render_params, render_key, base_3mf_path, BODY_MESH, IRONING_SETTINGS
+from get_material_config import SUPPORTED_PRINTERS, get_latest_config_file, resolve_filament_config
+from profile_index import load_profile_index, hash_config_file
+from artifact_cache import ArtifactStore, CACHE_DIR, DEFAULT_MAX_BYTES, cache_key, hash_file, tool_version
+from run_ledger import LEDGER_FILE, RunLedger
+from tracing import TRACE_FILE, configure, export_chrome_trace, span, traced_run
+
+# Every target of the build, with the class and files it resolves to
+MANIFEST = Path("output/manifest.json")
+
+# Assumed run time of a job (seconds) in a stage the duration history has never seen
+DEFAULT_STAGE_COSTS = {'render': 60.0, 'check': 2.0, 'convert': 2.0, 'slice': 30.0, 'verify': 1.0}
+
+# Swatch text lengths are grouped into buckets of this many characters in the duration history
+TEXT_BUCKET_SIZE = 8
+
+def default_jobs() -> int:
+    """Return the number of CPUs this process may run on."""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def load_materials(materials_dir: Path) -> List[Dict[str, str]]:
+    """Read every material row from the CSV files in a directory."""
+    materials = []
+    for csv_file in sorted(Path(materials_dir).glob('*.csv')):
+        with open(csv_file, newline='') as f:
+            for row in csv.DictReader(f):
+                materials.append({
+                    'material': row['Material'].strip(),
+                    'brand': row['Brand'].strip(),
+                    'color': row['Color'].strip(),
+                    'filament_profile': (row.get('FilamentProfile') or row.get('Profile') or '').strip(),
+                    'temperature': (row.get('Temperature') or '').strip(),
+                    'source': csv_file.name,
+                })
+    return materials
+
+def load_printers(printers_file: Path) -> List[Dict]:
+    """Read the printer configurations."""
+    with open(printers_file) as f:
+        return json.load(f)['printers']
+
+def profile_layer_height(print_profile: str) -> str:
+    """Extract the layer height from a print profile name (e.g., "0.20mm QUALITY" -> 0.20)."""
+    match = re.search(r'[0-9]\.[0-9]+', print_profile)
+    return match.group(0) if match else "0.20"
+
+class BuildJob:
+    """One node of the build graph: a single tool invocation and the files it produces.
+
+    Jobs with `cache` set are looked up in the artifact store before their tool
+    is launched. `cache` holds the key parts known up front; the contents of
+    `cache_inputs` and the tool version are added when the job runs.
+    """
+    def __init__(self, job_id: str, stage: str, command: List[str], outputs: List[Path],
+                 depends_on: Optional[List[str]] = None, meta: Optional[Dict] = None,
+                 cache: Optional[Dict] = None, cache_inputs: Optional[List[Path]] = None):
+        self.job_id = job_id
+        self.stage = stage
+        self.command = command
+        self.outputs = outputs
+        self.depends_on = depends_on or []
+        self.meta = meta or {}
+        self.cache = cache
+        self.cache_inputs = cache_inputs or []
+
+class JobResult:
+    """Outcome of running (or skipping) a build job."""
+    def __init__(self, job: BuildJob, status: str, returncode: Optional[int] = None,
+                 duration: float = 0.0, log: str = "", cached: bool = False):
+        self.job = job
+        self.status = status
+        self.returncode = returncode
+        self.duration = duration
+        self.log = log
+        self.cached = cached
+
+def printer_model(printer: Dict) -> Optional[str]:
+    """Return the get_material_config printer key of a printer entry (e.g. "Prusa CORE ONE" -> "COREONE").
+
+    Printers without printer-specific filament profiles return None.
+    """
+    model = re.sub(r'[^A-Za-z0-9]', '', re.sub(r'^(Original )?Prusa ', '', printer['name']))
+    return model if model in SUPPORTED_PRINTERS else None
+
+def material_temperature(material: Dict, index, printer: Optional[str] = None) -> str:
+    """Return the nozzle temperature for a material row on a printer.
+
+    Uses the CSV value when present, otherwise the value of its filament
+    profile's variant for the printer (e.g. "@MK4S"), falling back to the
+    printer-independent profile, otherwise the generator's 215 default.
+    """
+    if material['temperature']:
+        return material['temperature']
+    try:
+        return resolve_filament_config(index, material['filament_profile'], printer, verbose=False)['temperature']
+    except ValueError as e:
+        print(f"Warning: {e}; using 215 for {material['brand']} {material['material']} {material['color']}",
+              file=sys.stderr)
+        return "215"
+
+def resolved_section(index, section: str) -> Optional[Dict[str, str]]:
+    """Return a flattened profile section, or None if the bundle does not define it."""
+    return index[section] if section in index else None
+
+def expand_matrix(materials: List[Dict], printers: List[Dict], config_file: Path,
+                  prusaslicer: str = "prusa-slicer", cache_dir: Optional[Path] = CACHE_DIR,
+                  binary_gcode: bool = False) -> Tuple[List[BuildJob], List[Dict]]:
+    """Expand materials x printers x print profiles into render, convert and slice jobs.
+
+    Geometry only depends on the render parameters (material text, temperature
+    and layer height), so every distinct parameter set is rendered once and the
+    base 3MF is fanned out to one printer-specific conversion per target. The
+    renders themselves share one body mesh and only compute their text, and
+    each base 3MF is checked against the .scad dimensions alongside its
+    conversions; the check is advisory and does not hold them up.
+
+    Targets whose render parameters and fully resolved printer, print and
+    filament settings are identical (e.g. printers that share a profile) form
+    one equivalence class that is converted and sliced once.
+
+    With binary_gcode, printers marked "binary_gcode" in the printer list
+    are sliced to .bgcode and each slice is followed by a checksum verification.
+
+    Returns:
+        The jobs, and one entry per target naming its class, its output paths
+        and the canonical target whose outputs it shares
+    """
+    index = load_profile_index(config_file)
+    bundle_digest = hash_config_file(config_file)
+    generator = str(Path(__file__).parent / "generate_3mf.py")
+    conformance = str(Path(__file__).parent / "conformance.py")
+    verifier = str(Path(__file__).parent / "bgcode.py")
+    generator_flags = ["--cache-dir", str(cache_dir)] if cache_dir else ["--no-cache"]
+
+    # The material-independent body is rendered once; every render only adds its text
+    body_job = BuildJob("render:body", "render", [sys.executable, generator, "--body-only"] + generator_flags,
+                        [BODY_MESH])
+    jobs = [body_job]
+    renders = {}
+    targets = []
+    classes = {}
+    for material in materials:
+        for printer in printers:
+            temperature = material_temperature(material, index, printer_model(printer))
+            for print_profile in printer['print_profiles']:
+                layer_height = profile_layer_height(print_profile)
+                params = render_params(material['material'], material['brand'], material['color'],
+                                       temperature=temperature, layer_height=layer_height)
+                swatch_args = [
+                    "--material", material['material'],
+                    "--brand", material['brand'],
+                    "--color", material['color'],
+                    "--temperature", params['NOZZLE_TEMP'],
+                    "--layer-height", params['LAYER_HEIGHT'],
+                ]
+                meta = {
+                    'material': material['material'],
+                    'brand': material['brand'],
+                    'color': material['color'],
+                    'printer': printer['name'],
+                    'print_profile': print_profile,
+                }
+
+                # One render per distinct parameter set
+                base_3mf = base_3mf_path(params)
+                render_id = f"render:{base_3mf.stem}"
+                if render_id not in renders:
+                    render_meta = {k: meta[k] for k in ('material', 'brand', 'color')}
+                    render_meta['layer_height'] = params['LAYER_HEIGHT']
+                    renders[render_id] = BuildJob(render_id, "render",
+                                                  [sys.executable, generator, "--base-only",
+                                                   "--body", str(BODY_MESH)] + swatch_args + generator_flags,
+                                                  [base_3mf], depends_on=[body_job.job_id], meta=render_meta)
+                    check = BuildJob(f"check:{base_3mf.stem}", "check",
+                                     [sys.executable, conformance, "--advisory", str(base_3mf)],
+                                     [], depends_on=[render_id], meta=render_meta)
+                    jobs.extend([renders[render_id], check])
+
+                printer_3mf = output_3mf_path(material['material'], material['brand'], material['color'],
+                                              printer['name'], print_profile)
+                binary = binary_gcode and printer.get('binary_gcode', False)
+                gcode = Path("output/gcode") / f"{printer_3mf.stem}.{'bgcode' if binary else 'gcode'}"
+                slice_cmd = [
+                    prusaslicer,
+                    "--export-gcode",
+                    "--load", str(config_file),
+                    "--printer", printer['profile'],
+                    "--print", print_profile,
+                    "--filament", material['filament_profile'],
+                ]
+                for setting in IRONING_SETTINGS:
+                    slice_cmd.extend(["--print-settings", setting])
+                if binary:
+                    slice_cmd.append("--binary-gcode")
+                slice_cache = {
+                    'stage': "prusaslicer-gcode",
+                    'settings': slice_cmd[1:],
+                    'bundle': bundle_digest,
+                    'profiles': {
+                        'printer': resolved_section(index, f"printer:{printer['profile']}"),
+                        'print': resolved_section(index, f"print:{print_profile}"),
+                        'filament': resolved_section(index, f"filament:{material['filament_profile']}"),
+                    },
+                }
+
+                # Targets with equal geometry and settings share one conversion and slice
+                target_class = cache_key(render=render_key(params), **slice_cache)[:16]
+                target = dict(meta, **{'class': target_class, '3mf': str(printer_3mf), 'gcode': str(gcode)})
+                canonical = classes.setdefault(target_class, target)
+                target['canonical'] = canonical['gcode']
+                target['slice_job'] = f"slice:{Path(canonical['gcode']).stem}"
+                if binary:
+                    target['verify_job'] = f"verify:{Path(canonical['gcode']).stem}"
+                targets.append(target)
+                if canonical is not target:
+                    continue
+
+                convert_cmd = [sys.executable, generator, "--base", str(base_3mf),
+                               "--printer", printer['name'], "--profile", print_profile,
+                               "--printer-profile", printer['profile'],
+                               "--filament-profile", material['filament_profile']] + swatch_args + generator_flags
+                convert = BuildJob(f"convert:{printer_3mf.stem}", "convert", convert_cmd, [printer_3mf],
+                                   depends_on=[f"render:{base_3mf.stem}"], meta=meta)
+
+                slice_cmd.extend([str(printer_3mf), "--output", str(gcode)])
+                slice_job = BuildJob(target['slice_job'], "slice", slice_cmd, [gcode],
+                                     depends_on=[convert.job_id], meta=meta,
+                                     cache=slice_cache, cache_inputs=[printer_3mf])
+
+                jobs.extend([convert, slice_job])
+                if binary:
+                    verify = BuildJob(target['verify_job'], "verify", [sys.executable, verifier, "verify", str(gcode)],
+                                      [], depends_on=[slice_job.job_id], meta=meta)
+                    jobs.append(verify)
+    return jobs, targets
+
+def link_file(src: Path, dest: Path):
+    """Materialize dest as a hardlink to src, copying where links are not supported."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dest = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+    try:
+        os.link(src, tmp_dest)
+    except OSError:
+        shutil.copyfile(src, tmp_dest)
+    os.replace(tmp_dest, dest)
+
+def target_status(target: Dict, results: Dict[str, JobResult]) -> str:
+    """Return a target's build status: its slice's, then its verification's if it has one."""
+    for job_id in (target['slice_job'], target.get('verify_job')):
+        if job_id is None:
+            continue
+        result = results.get(job_id)
+        if result is None or result.status != "done":
+            return result.status if result else "missing"
+    return "done"
+
+def materialize_aliases(targets: List[Dict], results: Dict[str, JobResult], mode: str = "hardlink") -> int:
+    """Give every alias target its outputs once its class has been sliced.
+
+    In "hardlink" mode each alias gets its own 3MF and G-code names linked to
+    the canonical files; in "manifest" mode aliases only point at them.
+    Returns the number of aliases materialized.
+    """
+    linked = 0
+    for target in targets:
+        if target['canonical'] == target['gcode']:
+            continue
+        if target_status(target, results) != "done":
+            continue
+
+        canonical_gcode = Path(target['canonical'])
+        canonical_3mf = Path("output/3mf") / f"{canonical_gcode.stem}.3mf"
+        if mode == "hardlink":
+            link_file(canonical_3mf, Path(target['3mf']))
+            link_file(canonical_gcode, Path(target['gcode']))
+            linked += 1
+        else:
+            target['3mf'] = str(canonical_3mf)
+            target['gcode'] = str(canonical_gcode)
+    return linked
+
+def write_manifest(targets: List[Dict], results: Dict[str, JobResult], path: Path = MANIFEST,
+                   shard: Optional[Dict] = None):
+    """Write every target with its equivalence class, outputs and build status.
+
+    A binary G-code target is only done once its file has been verified.
+
+    A shard's manifest also names the shard and the partition it belongs to,
+    for merge_shards.py to check.
+    """
+    entries = []
+    for target in targets:
+        entry = {k: v for k, v in target.items() if k not in ('slice_job', 'verify_job')}
+        entry['status'] = target_status(target, results)
+        entries.append(entry)
+
+    manifest = {'classes': len({t['class'] for t in targets}), 'targets': entries}
+    if shard is not None:
+        manifest['shard'] = shard
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+def job_cache_keys(job: BuildJob) -> List[str]:
+    """Compute the artifact keys of a cacheable job's outputs from its inputs as they are now."""
+    parts = dict(job.cache)
+    parts['inputs'] = [hash_file(path) for path in job.cache_inputs]
+    parts['tool'] = tool_version(job.command[0])
+    return [cache_key(output=i, **parts) for i in range(len(job.outputs))]
+
+def run_job(job: BuildJob, store: Optional[ArtifactStore] = None) -> JobResult:
+    """Run one job's command and check that its outputs were produced.
+
+    Cacheable jobs are served from the artifact store when every output is
+    present there; otherwise the tool runs and its outputs are stored.
+    """
+    for output in job.outputs:
+        output.parent.mkdir(parents=True, exist_ok=True)
+
+    start = time.time()
+    keys = None
+    if store is not None and job.cache is not None:
+        keys = job_cache_keys(job)
+        if all(store.fetch(key, output, label=job.stage) for key, output in zip(keys, job.outputs)):
+            return JobResult(job, "done", 0, time.time() - start, "Served from artifact cache", cached=True)
+
+    try:
+        tool = job.command[1] if job.command[0] == sys.executable else job.command[0]
+        result = traced_run(job.command, name=Path(tool).name, outputs=job.outputs)
+    except OSError as e:
+        return JobResult(job, "failed", None, time.time() - start, str(e))
+    duration = time.time() - start
+
+    log = (result.stdout + result.stderr).strip()
+    if result.returncode != 0:
+        return JobResult(job, "failed", result.returncode, duration, log)
+
+    missing = [str(o) for o in job.outputs if not o.exists()]
+    if missing:
+        return JobResult(job, "failed", result.returncode, duration,
+                         f"{log}\nMissing outputs: {', '.join(missing)}")
+
+    if keys is not None:
+        for key, output in zip(keys, job.outputs):
+            store.store(key, output, label=job.stage)
+
+    return JobResult(job, "done", result.returncode, duration, log)
+
+def history_key(job: BuildJob) -> Tuple[str, str, str, int]:
+    """Return the (stage, printer, profile, text length bucket) a job's duration is filed under."""
+    text = sum(len(job.meta.get(key, "")) for key in ('material', 'brand', 'color'))
+    return job.stage, job.meta.get('printer', ""), job.meta.get('print_profile', ""), text // TEXT_BUCKET_SIZE
+
+def estimate_cost(job: BuildJob, history: Dict[Tuple[str, str, str, int], float]) -> float:
+    """Estimate a job's run time from the most specific matching duration history.
+
+    Unseen jobs fall back to the mean of the same stage on the same printer
+    and profile, then with the same text length, then of the whole stage,
+    and finally to DEFAULT_STAGE_COSTS.
+    """
+    key = history_key(job)
+    if key in history:
+        return history[key]
+    stage, printer, profile, bucket = key
+    for matches in (lambda k: k[1:3] == (printer, profile), lambda k: k[3] == bucket, lambda k: True):
+        means = [mean for k, mean in history.items() if k[0] == stage and matches(k)]
+        if means:
+            return sum(means) / len(means)
+    return DEFAULT_STAGE_COSTS.get(stage, 1.0)
+
+def schedule_priorities(jobs: List[BuildJob], costs: Dict[str, float]) -> Dict[str, float]:
+    """Rank every job by the estimated length of the longest chain of work it starts.
+
+    Running the highest rank first starts long jobs, and the jobs that
+    unlock long chains, before short ones, so no long job is left running
+    alone at the end of the build.
+    """
+    dependents = {job.job_id: [] for job in jobs}
+    for job in jobs:
+        for dep in job.depends_on:
+            dependents[dep].append(job.job_id)
+
+    ranks = {}
+    def _rank(job_id):
+        if job_id not in ranks:
+            ranks[job_id] = costs[job_id] + max((_rank(child) for child in dependents[job_id]), default=0.0)
+        return ranks[job_id]
+
+    for job in jobs:
+        _rank(job.job_id)
+    return ranks
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Parse an "i/N" shard argument (1 <= i <= N)."""
+    match = re.fullmatch(r'(\d+)/(\d+)', value)
+    if not match or not 1 <= int(match.group(1)) <= int(match.group(2)):
+        raise argparse.ArgumentTypeError(f"expected i/N with 1 <= i <= N, got {value!r}")
+    return int(match.group(1)), int(match.group(2))
+
+def shard_manifest_path(index: int, count: int) -> Path:
+    """Return where shard index of count writes its manifest."""
+    return MANIFEST.with_name(f"manifest.shard-{index}-of-{count}.json")
+
+def load_history(path: Path) -> Dict[Tuple[str, str, str, int], float]:
+    """Load a duration history exported with `run_ledger.py durations`."""
+    with open(path) as f:
+        return {(e['stage'], e['printer'], e['profile'], e['text_bucket']): e['mean'] for e in json.load(f)}
+
+def render_groups(jobs: List[BuildJob]) -> Dict[str, Optional[str]]:
+    """Map every job (in dependency order) to the render it builds on; the body render belongs to none.
+
+    A render and everything downstream of it (check, conversions, slices)
+    form one group, so sharding by group never splits an equivalence class
+    or renders a base 3MF twice.
+    """
+    groups = {}
+    for job in jobs:
+        if job.stage == "render":
+            groups[job.job_id] = None if job.job_id == "render:body" else job.job_id
+        else:
+            groups[job.job_id] = next((groups[d] for d in job.depends_on if groups.get(d)), None)
+    return groups
+
+def partition_groups(jobs: List[BuildJob], costs: Dict[str, float], count: int) -> Dict[str, int]:
+    """Assign every render group to one of count shards (1-based), balancing estimated cost.
+
+    Groups are placed largest first on the least loaded shard, with ties
+    broken by a stable hash of their id, so every machine computes the same
+    assignment from the same job graph and costs.
+    """
+    group_costs = {}
+    for job_id, group in render_groups(jobs).items():
+        if group:
+            group_costs[group] = group_costs.get(group, 0.0) + costs[job_id]
+
+    loads = [0.0] * count
+    assignment = {}
+    for group in sorted(group_costs, key=lambda g: (-round(group_costs[g], 6), cache_key(group=g))):
+        shard = min(range(count), key=lambda i: (loads[i], i))
+        loads[shard] += group_costs[group]
+        assignment[group] = shard + 1
+    return assignment
+
+def select_shard(jobs: List[BuildJob], targets: List[Dict], assignment: Dict[str, int],
+                 index: int) -> Tuple[List[BuildJob], List[Dict]]:
+    """Keep the jobs and targets of one shard; jobs outside any group run on every shard."""
+    groups = render_groups(jobs)
+    shard_jobs = [job for job in jobs if groups[job.job_id] is None or assignment[groups[job.job_id]] == index]
+    shard_targets = [target for target in targets if assignment[groups[target['slice_job']]] == index]
+    return shard_jobs, shard_targets
+
+def record_result(ledger: RunLedger, result: JobResult, run_id: Optional[int] = None):
+    """Record a job's outcome, duration and first artifact in the run ledger.
+
+    Run times of jobs that actually ran also go into the duration history.
+    """
+    job = result.job
+    if result.status == "done" and not result.cached:
+        ledger.record_duration(*history_key(job), result.duration)
+    ledger.record(job.job_id, job.stage, result.status,
+                  fingerprint=cache_key(**job.cache) if job.cache else None,
+                  artifact=job.outputs[0] if job.outputs else None,
+                  duration=result.duration, exit_status=result.returncode,
+                  message=result.log.splitlines()[-1] if result.status != "done" and result.log else None,
+                  run_id=run_id)
+
+def run_jobs(jobs: List[BuildJob], max_workers: int, store: Optional[ArtifactStore] = None,
+             ledger: Optional[RunLedger] = None, run_id: Optional[int] = None,
+             priorities: Optional[Dict[str, float]] = None) -> Dict[str, JobResult]:
+    """Run a job graph, starting each job once all of its dependencies succeeded.
+
+    Each worker drives one tool process at a time, so `max_workers` bounds the
+    number of concurrent OpenSCAD/PrusaSlicer processes. Whenever a worker is
+    free it takes the ready job with the highest priority; without priorities
+    jobs start in list order. Failures do not stop the build; jobs depending
+    on a failed job are skipped. Every outcome is recorded in the ledger, if
+    one is given.
+    """
+    priorities = priorities or {}
+    by_id = {job.job_id: job for job in jobs}
+    waiting = {job.job_id: set(job.depends_on) for job in jobs}
+    dependents = {job.job_id: [] for job in jobs}
+    for job in jobs:
+        for dep in job.depends_on:
+            dependents[dep].append(job.job_id)
+
+    results = {}
+
+    def _run(job, root):
+        with span(job.job_id, job.stage, parent=root, depends_on=job.depends_on, meta=job.meta) as current:
+            result = run_job(job, store)
+            current.add_outputs(*job.outputs)
+            current.set(cached=result.cached, returncode=result.returncode)
+            if result.status != "done":
+                current.status = result.status
+            return result
+
+    def _skip(job_id, reason):
+        results[job_id] = JobResult(by_id[job_id], "skipped", log=reason)
+        waiting.pop(job_id, None)
+        for child in dependents[job_id]:
+            if child not in results:
+                _skip(child, f"dependency {job_id} did not complete")
+
+    with span("run_jobs", "build", jobs=len(jobs), workers=max_workers) as root, \
+            ThreadPoolExecutor(max_workers=max_workers) as pool:
+        running = {}
+
+        def _submit_ready():
+            # Only fill free workers, so a higher-priority job that becomes ready later is not queued behind these
+            ready = sorted((j for j, deps in waiting.items() if not deps), key=lambda j: -priorities.get(j, 0.0))
+            for job_id in ready[:max_workers - len(running)]:
+                del waiting[job_id]
+                running[pool.submit(_run, by_id[job_id], root)] = job_id
+
+        _submit_ready()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job_id = running.pop(future)
+                result = future.result()
+                results[job_id] = result
+                if ledger is not None:
+                    record_result(ledger, result, run_id)
+
+                cached = " [cached]" if result.cached else ""
+                print(f"[{len(results)}/{len(jobs)}] {result.status:7} {job_id} ({result.duration:.1f}s){cached}")
+                if result.status == "done":
+                    for child in dependents[job_id]:
+                        if child in waiting:
+                            waiting[child].discard(job_id)
+                else:
+                    for child in dependents[job_id]:
+                        if child not in results:
+                            _skip(child, f"dependency {job_id} failed")
+            _submit_ready()
+
+    return results
+
+def report(results: Dict[str, JobResult]) -> bool:
+    """Print a summary of the build and the logs of failed jobs."""
+    failed = [r for r in results.values() if r.status == "failed"]
+    skipped = [r for r in results.values() if r.status == "skipped"]
+    done = [r for r in results.values() if r.status == "done"]
+
+    for result in failed:
+        print(f"\n❌ {result.job.job_id} (exit code {result.returncode})", file=sys.stderr)
+        print(f"   {' '.join(result.job.command)}", file=sys.stderr)
+        for line in result.log.splitlines()[-20:]:
+            print(f"   {line}", file=sys.stderr)
+
+    print("\nBuild Summary:")
+    print("-" * 40)
+    print(f"{'done':10} {len(done)} ({sum(1 for r in done if r.cached)} from cache)")
+    print(f"{'failed':10} {len(failed)}")
+    print(f"{'skipped':10} {len(skipped)}")
+    return not failed and not skipped
+
+def main():
+    parser = argparse.ArgumentParser(description='Build every material x printer x print profile swatch in parallel')
+    parser.add_argument('--materials', type=Path, default=Path('materials'),
+                      help='Directory containing material CSV files')
+    parser.add_argument('--printers', type=Path, default=Path('printers/config.json'),
+                      help='Printer configuration file')
+    parser.add_argument('--jobs', '-j', type=int, default=default_jobs(),
+                      help='Maximum number of concurrent tool processes (default: CPU count)')
+    parser.add_argument('--dry-run', action='store_true',
+                      help='List the jobs without running them')
+    parser.add_argument('--no-cache', action='store_true',
+                      help='Always run OpenSCAD/PrusaSlicer instead of using the artifact cache')
+    parser.add_argument('--cache-dir', type=Path, default=CACHE_DIR,
+                      help='Artifact store directory')
+    parser.add_argument('--ledger', type=Path, default=LEDGER_FILE,
+                      help='Run ledger recording every job outcome')
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_MAX_BYTES,
+                      help='Artifact store size bound in bytes')
+    parser.add_argument('--aliases', choices=['hardlink', 'manifest'], default='hardlink',
+                      help='Give equivalent targets hardlinked files, or only manifest entries (default: hardlink)')
+    parser.add_argument('--binary-gcode', action='store_true',
+                      help='Slice printers that support it to binary G-code (.bgcode) and verify the result')
+    parser.add_argument('--trace', type=Path, nargs='?', const=TRACE_FILE,
+                      help=f'Record job and tool process spans (default file: {TRACE_FILE})')
+    parser.add_argument('--schedule', choices=['longest-first', 'fifo'], default='longest-first',
+                      help='Start the jobs with the longest estimated remaining work first, '
+                           'or in matrix order (default: longest-first)')
+    parser.add_argument('--shard', type=parse_shard, metavar='I/N',
+                      help='Only build shard I of N of the matrix and write its own manifest')
+    parser.add_argument('--shard-history', type=Path,
+                      help='Duration history (run_ledger.py durations) weighting the shards; '
+                           'every shard must get the same file (default: fixed per-stage costs)')
+    args = parser.parse_args()
+
+    config_file = get_latest_config_file()
+    if config_file is None:
+        return 1
+
+    prusaslicer = "prusa-slicer"
+    if not args.dry_run:
+        prusaslicer_path = find_prusaslicer()
+        if not prusaslicer_path:
+            return 1
+        prusaslicer = str(prusaslicer_path)
+
+    materials = load_materials(args.materials)
+    printers = load_printers(args.printers)
+    jobs, targets = expand_matrix(materials, printers, config_file, prusaslicer,
+                                  cache_dir=None if args.no_cache else args.cache_dir,
+                                  binary_gcode=args.binary_gcode)
+    shard = None
+    if args.shard:
+        # The partition must not depend on this machine's ledger, so all shards agree on it
+        index, count = args.shard
+        history = load_history(args.shard_history) if args.shard_history else {}
+        assignment = partition_groups(jobs, {job.job_id: estimate_cost(job, history) for job in jobs}, count)
+        total = len(targets)
+        jobs, targets = select_shard(jobs, targets, assignment, index)
+        shard = {'index': index, 'count': count, 'partition': cache_key(assignment=assignment)[:16],
+                 'targets': len(targets), 'total_targets': total}
+        print(f"Shard {index}/{count}: {len(targets)} of {total} targets")
+    stages = {stage: sum(1 for job in jobs if job.stage == stage)
+              for stage in ("render", "check", "convert", "slice", "verify")}
+    print(f"{len(materials)} materials x {len(printers)} printers: "
+          f"{', '.join(f'{n} {stage}' for stage, n in stages.items())} jobs on {args.jobs} workers")
+    print(f"{len(targets)} targets in {stages['slice']} equivalence classes")
+
+    # Estimate every job from the duration history of earlier builds
+    ledger = RunLedger(args.ledger) if not args.dry_run or args.ledger.exists() else None
+    history = ledger.durations() if ledger else {}
+    costs = {job.job_id: estimate_cost(job, history) for job in jobs}
+    ranks = schedule_priorities(jobs, costs)
+    work, longest = sum(costs.values()), max(ranks.values())
+    print(f"Estimated {work:.0f}s of work, longest chain {longest:.0f}s: "
+          f"at least {max(work / max(1, args.jobs), longest):.0f}s on {args.jobs} workers "
+          f"({len(history)} duration histories)")
+
+    if args.dry_run:
+        for job in jobs:
+            deps = f" (after {', '.join(job.depends_on)})" if job.depends_on else ""
+            print(f"  {job.stage:7} {job.job_id} ~{costs[job.job_id]:.0f}s{deps}")
+        return 0
+
+    if args.trace:
+        configure(args.trace)
+    store = None if args.no_cache else ArtifactStore(args.cache_dir, args.cache_size)
+    run_id = ledger.start_run(sys.argv)
+    priorities = ranks if args.schedule == 'longest-first' else None
+    results = run_jobs(jobs, max(1, args.jobs), store, ledger, run_id, priorities)
+    for result in results.values():
+        if result.status == "skipped":
+            record_result(ledger, result, run_id)
+    success = report(results)
+    ledger.finish_run(run_id, success)
+    linked = materialize_aliases(targets, results, args.aliases)
+    manifest = shard_manifest_path(shard['index'], shard['count']) if shard else MANIFEST
+    write_manifest(targets, results, manifest, shard)
+    print(f"Aliases: {linked} hardlinked, manifest written to {manifest}")
+    if args.trace:
+        print(f"Trace written to {args.trace} and {export_chrome_trace(args.trace)}")
+    if store is not None:
+        stats = store.stats()
+        print(f"Artifact cache: {stats['objects']} objects, {stats['bytes']} bytes")
+    return 0 if success else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
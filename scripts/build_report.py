@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+
+import argparse
+import html
+import json
+import sys
+from pathlib import Path
+from statistics import median
+from typing import Dict, List, Optional, Tuple
+
+from tracing import TRACE_FILE, read_trace
+
+# Where the report is written by default
+REPORT_DIR = Path("output")
+
+# Jobs whose robust z-score within their stage exceeds this are outliers
+OUTLIER_THRESHOLD = 3.5
+# ... and they must also take this many times the stage median
+OUTLIER_RATIO = 1.5
+# Stages need this many timed jobs before outliers are flagged
+OUTLIER_MIN_JOBS = 5
+
+def load_build(records: List[Dict]) -> Tuple[Dict, Dict[str, Dict]]:
+    """Find the last build in a trace and return its root span and its jobs by id."""
+    roots = [r for r in records if r['name'] == "run_jobs"]
+    if not roots:
+        raise ValueError("No build_matrix.py run in the trace (run it with --trace)")
+    root = max(roots, key=lambda r: r['start'])
+
+    jobs = {}
+    for record in records:
+        if record['parent'] != root['id']:
+            continue
+        args = record.get('args', {})
+        jobs[record['name']] = {
+            'job': record['name'],
+            'stage': record['cat'],
+            'start': record['start'],
+            'end': record['start'] + record['wall_s'],
+            'run_s': record['wall_s'],
+            'depends_on': args.get('depends_on', []),
+            'meta': args.get('meta', {}),
+            'status': record['status'],
+            'cached': args.get('cached', False),
+            'child_cpu_s': record['child_cpu_s'],
+            'max_rss_kb': record['max_rss_kb'],
+        }
+    return root, jobs
+
+def queue_waits(root: Dict, jobs: Dict[str, Dict]):
+    """Set each job's queue wait: the time between its last dependency finishing and its start."""
+    for job in jobs.values():
+        deps = [jobs[d]['end'] for d in job['depends_on'] if d in jobs]
+        job['ready'] = max(deps) if deps else root['start']
+        job['wait_s'] = max(0.0, job['start'] - job['ready'])
+
+def critical_path(jobs: Dict[str, Dict]) -> List[Dict]:
+    """Walk back from the last job to finish through the dependency that finished last.
+
+    Each job on the path could not start before its predecessor ended, so
+    together with their queue waits they account for the build's wall time.
+    """
+    if not jobs:
+        return []
+    path = [max(jobs.values(), key=lambda j: j['end'])]
+    while True:
+        deps = [jobs[d] for d in path[-1]['depends_on'] if d in jobs]
+        if not deps:
+            break
+        path.append(max(deps, key=lambda j: j['end']))
+    return path[::-1]
+
+def swatch_name(meta: Dict) -> Optional[str]:
+    """Name the swatch a job belongs to, or None for shared jobs."""
+    if not all(key in meta for key in ('brand', 'material', 'color')):
+        return None
+    return f"{meta['brand']} {meta['material']} {meta['color']}"
+
+def find_outliers(jobs: Dict[str, Dict], threshold: float = OUTLIER_THRESHOLD) -> List[Dict]:
+    """Flag swatch jobs that take far longer than the rest of their stage (median absolute deviation).
+
+    Shared jobs such as the body render do different work from the swatch
+    jobs of their stage, so they are not compared.
+    """
+    by_stage = {}
+    for job in jobs.values():
+        if job['status'] == "ok" and not job['cached'] and swatch_name(job['meta']):
+            by_stage.setdefault(job['stage'], []).append(job)
+
+    outliers = []
+    for stage, stage_jobs in by_stage.items():
+        if len(stage_jobs) < OUTLIER_MIN_JOBS:
+            continue
+        times = [j['run_s'] for j in stage_jobs]
+        middle = median(times)
+        mad = median(abs(t - middle) for t in times)
+        for job in stage_jobs:
+            ratio = job['run_s'] / middle if middle else float('inf')
+            score = 0.6745 * (job['run_s'] - middle) / mad if mad else float('inf')
+            if ratio >= OUTLIER_RATIO and score > threshold:
+                outliers.append({
+                    'job': job['job'],
+                    'stage': stage,
+                    'run_s': round(job['run_s'], 3),
+                    'median_s': round(middle, 3),
+                    'ratio': round(ratio, 2),
+                    'meta': job['meta'],
+                })
+    return sorted(outliers, key=lambda o: -o['ratio'])
+
+def analyze_build(root: Dict, jobs: Dict[str, Dict], top: int = 10) -> Dict:
+    """Compute the critical path, per-stage utilization, queue waits and slowest swatches of a build."""
+    queue_waits(root, jobs)
+    wall = root['wall_s']
+    workers = root.get('args', {}).get('workers', 1)
+    busy = sum(j['run_s'] for j in jobs.values())
+
+    path = critical_path(jobs)
+    critical = {
+        'duration_s': round(path[-1]['end'] - root['start'], 3) if path else 0.0,
+        'run_s': round(sum(j['run_s'] for j in path), 3),
+        'wait_s': round(sum(j['wait_s'] for j in path), 3),
+        'jobs': [{
+            'job': j['job'],
+            'stage': j['stage'],
+            'start_s': round(j['start'] - root['start'], 3),
+            'run_s': round(j['run_s'], 3),
+            'wait_s': round(j['wait_s'], 3),
+        } for j in path],
+    }
+
+    stages = {}
+    for job in jobs.values():
+        stage = stages.setdefault(job['stage'], {'jobs': 0, 'cached': 0, 'failed': 0, 'run_s': 0.0,
+                                                 'wait_s': 0.0, 'max_s': 0.0})
+        stage['jobs'] += 1
+        stage['cached'] += job['cached']
+        stage['failed'] += job['status'] != "ok"
+        stage['run_s'] += job['run_s']
+        stage['wait_s'] += job['wait_s']
+        stage['max_s'] = max(stage['max_s'], job['run_s'])
+    for stage in stages.values():
+        stage['mean_run_s'] = round(stage['run_s'] / stage['jobs'], 3)
+        stage['mean_wait_s'] = round(stage['wait_s'] / stage['jobs'], 3)
+        stage['share'] = round(stage['run_s'] / busy, 4) if busy else 0.0
+        stage['utilization'] = round(stage['run_s'] / (wall * workers), 4) if wall else 0.0
+        for key in ('run_s', 'wait_s', 'max_s'):
+            stage[key] = round(stage[key], 3)
+
+    swatches = {}
+    for job in jobs.values():
+        name = swatch_name(job['meta'])
+        if name:
+            swatch = swatches.setdefault(name, {'swatch': name, 'run_s': 0.0, 'jobs': 0})
+            swatch['run_s'] += job['run_s']
+            swatch['jobs'] += 1
+    slowest = sorted(swatches.values(), key=lambda s: -s['run_s'])[:top]
+    for swatch in slowest:
+        swatch['run_s'] = round(swatch['run_s'], 3)
+
+    return {
+        'build': {
+            'wall_s': round(wall, 3),
+            'workers': workers,
+            'jobs': len(jobs),
+            'busy_s': round(busy, 3),
+            'utilization': round(busy / (wall * workers), 4) if wall else 0.0,
+        },
+        'critical_path': critical,
+        'stages': stages,
+        'slowest_swatches': slowest,
+        'outliers': find_outliers(jobs),
+    }
+
+def table(headers: List[str], rows: List[List]) -> str:
+    """Render an HTML table."""
+    head = "".join(f"<th>{html.escape(h)}</th>" for h in headers)
+    body = "".join("<tr>" + "".join(f"<td>{cell}</td>" for cell in row) + "</tr>" for row in rows)
+    return f"<table><tr>{head}</tr>{body}</table>"
+
+def render_html(report: Dict) -> str:
+    """Render a report as one static HTML page."""
+    build = report['build']
+    critical = report['critical_path']
+    length = critical['duration_s'] or 1.0
+
+    def bar(start: float, run: float, wait: float) -> str:
+        return (f'<div class="lane">'
+                f'<div class="wait" style="left:{100 * (start - wait) / length:.2f}%;width:{100 * wait / length:.2f}%">'
+                f'</div><div class="run" style="left:{100 * start / length:.2f}%;'
+                f'width:{max(100 * run / length, 0.2):.2f}%"></div></div>')
+
+    path_rows = [[html.escape(j['job']), html.escape(j['stage']), f"{j['start_s']:.1f}", f"{j['run_s']:.1f}",
+                  f"{j['wait_s']:.1f}", bar(j['start_s'], j['run_s'], j['wait_s'])] for j in critical['jobs']]
+    stage_rows = [[html.escape(name), s['jobs'], s['cached'], s['failed'], f"{s['run_s']:.1f}",
+                   f"{s['mean_run_s']:.2f}", f"{s['max_s']:.1f}", f"{s['mean_wait_s']:.2f}",
+                   f"{100 * s['share']:.1f}%", f"{100 * s['utilization']:.1f}%"]
+                  for name, s in sorted(report['stages'].items(), key=lambda item: -item[1]['run_s'])]
+    swatch_rows = [[html.escape(s['swatch']), s['jobs'], f"{s['run_s']:.1f}"] for s in report['slowest_swatches']]
+    outlier_rows = [[html.escape(o['job']), html.escape(o['stage']), f"{o['run_s']:.1f}", f"{o['median_s']:.1f}",
+                     f"{o['ratio']:.1f}x", html.escape(", ".join(f"{k}={v}" for k, v in o['meta'].items()))]
+                    for o in report['outliers']]
+
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Swatch build report</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+table {{ border-collapse: collapse; margin-bottom: 2em; }}
+td, th {{ border: 1px solid #ccc; padding: 2px 8px; text-align: left; }}
+.lane {{ position: relative; width: 400px; height: 12px; background: #f4f4f4; }}
+.lane div {{ position: absolute; top: 0; height: 12px; }}
+.run {{ background: #3778c2; }}
+.wait {{ background: #e8a33d; }}
+</style></head><body>
+<h1>Swatch build report</h1>
+<p>{build['jobs']} jobs in {build['wall_s']:.1f}s on {build['workers']} workers:
+{build['busy_s']:.1f}s of work, {100 * build['utilization']:.1f}% utilization.</p>
+<h2>Critical path</h2>
+<p>{len(critical['jobs'])} jobs ending at {critical['duration_s']:.1f}s: {critical['run_s']:.1f}s running,
+{critical['wait_s']:.1f}s queued (orange).</p>
+{table(["Job", "Stage", "Start (s)", "Run (s)", "Queued (s)", "Timeline"], path_rows)}
+<h2>Stages</h2>
+{table(["Stage", "Jobs", "Cached", "Failed", "Run (s)", "Mean (s)", "Max (s)", "Mean queued (s)",
+        "Share of work", "Utilization"], stage_rows)}
+<h2>Slowest swatches</h2>
+{table(["Swatch", "Jobs", "Run (s)"], swatch_rows)}
+<h2>Outliers</h2>
+{table(["Job", "Stage", "Run (s)", "Stage median (s)", "Ratio", "Parameters"], outlier_rows)
+ if outlier_rows else "<p>None</p>"}
+</body></html>
+"""
+
+def print_summary(report: Dict):
+    """Print the headline numbers of a report."""
+    build = report['build']
+    critical = report['critical_path']
+    print(f"{build['jobs']} jobs in {build['wall_s']:.1f}s on {build['workers']} workers "
+          f"({100 * build['utilization']:.1f}% utilization)")
+    print(f"Critical path: {len(critical['jobs'])} jobs, {critical['run_s']:.1f}s running, "
+          f"{critical['wait_s']:.1f}s queued")
+    for job in critical['jobs']:
+        print(f"  {job['stage']:7} {job['job']} ({job['run_s']:.1f}s, queued {job['wait_s']:.1f}s)")
+    for outlier in report['outliers']:
+        print(f"Outlier: {outlier['job']} took {outlier['run_s']:.1f}s, "
+              f"{outlier['ratio']:.1f}x the {outlier['stage']} median")
+
+def main():
+    parser = argparse.ArgumentParser(description='Report the critical path and bottlenecks of a traced build')
+    parser.add_argument('trace', type=Path, nargs='?', default=TRACE_FILE,
+                      help='Span trace written by build_matrix.py --trace')
+    parser.add_argument('--output-dir', type=Path, default=REPORT_DIR,
+                      help='Where build_report.html and build_report.json are written')
+    parser.add_argument('--top', type=int, default=10, help='Number of slowest swatches to list')
+    args = parser.parse_args()
+
+    try:
+        root, jobs = load_build(read_trace(args.trace))
+    except (OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    report = analyze_build(root, jobs, args.top)
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    with open(args.output_dir / "build_report.json", 'w') as f:
+        json.dump(report, f, indent=2)
+    (args.output_dir / "build_report.html").write_text(render_html(report))
+    print_summary(report)
+    print(f"Report written to {args.output_dir / 'build_report.html'}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
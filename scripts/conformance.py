@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+
+import argparse
+import ast
+import json
+import re
+import sys
+import zipfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from mesh_check import load_meshes
+from threemf import MODEL_ENTRY
+
+# OpenSCAD sources the dimensional targets are read from
+SCAD_CONSTANT_FILES = [
+    Path("swatch/common/vars.scad"),
+    Path("swatch/features/geometry.scad"),
+    Path("swatch/features/thickness.scad"),
+]
+
+# Allowed deviation of overall dimensions and of flat surface heights (mm)
+DIMENSION_TOLERANCE = 0.05
+LEVEL_TOLERANCE = 0.02
+
+# Smallest upward-facing area (mm^2) that counts as a surface at an expected height
+MIN_LEVEL_AREA = {'rim': 100.0, 'shelf': 100.0, 'step': 10.0}
+
+# thickness_test() lifts negative depths (bridged steps) by this much
+BRIDGE_LIFT = 1.0
+
+# The expected levels and hole positions are derived from the .scad constants
+# but not yet verified against a base 3MF rendered by OpenSCAD, so builds run
+# the check with --advisory: it reports deviations without failing the build.
+# Make it a gate once such a render is committed under tests/fixtures and
+# test_conformance.py shows that it passes.
+
+# Holes of geometry() that run straight through the shelf (the others hold test features)
+THROUGH_HOLES = (0, 6)
+
+SCAD_ASSIGNMENT = re.compile(r'^\s*([A-Z_][A-Z0-9_]*)\s*=\s*([^;]+);', re.MULTILINE)
+PREVIEW_TERNARY = re.compile(r'^\$preview\s*\?\s*(.+?)\s*:\s*(.+)$')
+
+def _evaluate(node, constants: Dict):
+    """Evaluate a numeric OpenSCAD expression AST, or raise ValueError."""
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body, constants)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return float(node.value)
+    if isinstance(node, ast.Name) and node.id in constants:
+        return constants[node.id]
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [_evaluate(element, constants) for element in node.elts]
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        value = _evaluate(node.operand, constants)
+        return -value if isinstance(node.op, ast.USub) else value
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Sub, ast.Mult, ast.Div)):
+        left, right = _evaluate(node.left, constants), _evaluate(node.right, constants)
+        if isinstance(node.op, ast.Add):
+            return left + right
+        if isinstance(node.op, ast.Sub):
+            return left - right
+        if isinstance(node.op, ast.Mult):
+            return left * right
+        return left / right
+    raise ValueError(f"Unsupported expression: {ast.dump(node)}")
+
+def parse_scad_constants(paths: List[Path] = SCAD_CONSTANT_FILES) -> Dict:
+    """Read the numeric UPPER_CASE assignments of OpenSCAD files.
+
+    Arithmetic on earlier constants and number lists are evaluated;
+    $preview ternaries take their render value. Anything else is skipped.
+    """
+    constants = {}
+    for path in paths:
+        for name, expression in SCAD_ASSIGNMENT.findall(Path(path).read_text()):
+            expression = expression.strip()
+            preview = PREVIEW_TERNARY.match(expression)
+            if preview:
+                expression = preview.group(2)
+            try:
+                constants[name] = _evaluate(ast.parse(expression, mode='eval'), constants)
+            except (ValueError, SyntaxError, ZeroDivisionError):
+                continue
+    return constants
+
+def base_path(c: Dict) -> np.ndarray:
+    """Return BASE_PATH from paths.scad as an (8, 2) array."""
+    h, w = c['BASE_HEIGHT'] / 2, c['BASE_WIDTH'] / 2
+    return np.array([
+        [w - c['CHAMFER_RIGHT'], -h],
+        [w, c['CHAMFER_RIGHT'] - h],
+        [w, h - c['CHAMFER_RIGHT']],
+        [w - c['CHAMFER_RIGHT'], h],
+        [-w + c['CHAMFER_LEFT'], h],
+        [-w, h - c['CHAMFER_LEFT']],
+        [-w, -h + c['CHAMFER_LEFT']],
+        [-w + c['CHAMFER_LEFT'], -h],
+    ])
+
+def polygon_area(points: np.ndarray) -> float:
+    """Return the signed area of a 2D polygon (positive when counter-clockwise)."""
+    following = np.roll(points, -1, axis=0)
+    return float(np.sum(points[:, 0] * following[:, 1] - following[:, 0] * points[:, 1]) / 2)
+
+def offset_polygon(points: np.ndarray, r: float) -> np.ndarray:
+    """Offset a convex polygon by r (negative shrinks), keeping sharp corners and vertex order."""
+    edges = np.roll(points, -1, axis=0) - points
+    normals = np.stack([edges[:, 1], -edges[:, 0]], axis=1) / np.linalg.norm(edges, axis=1)[:, None]
+    if polygon_area(points) < 0:
+        normals = -normals  # Outward normals for clockwise polygons
+
+    # Vertex i is where the offset lines of edges i-1 and i meet
+    shifted = points + r * normals
+    prev_point, prev_dir = np.roll(shifted, 1, axis=0), np.roll(edges, 1, axis=0)
+    cross = prev_dir[:, 0] * edges[:, 1] - prev_dir[:, 1] * edges[:, 0]
+    delta = shifted - prev_point
+    t = (delta[:, 0] * edges[:, 1] - delta[:, 1] * edges[:, 0]) / cross
+    return prev_point + t[:, None] * prev_dir
+
+def inside_convex(points: np.ndarray, polygon: np.ndarray) -> np.ndarray:
+    """Return which 2D points lie inside a convex polygon."""
+    edges = np.roll(polygon, -1, axis=0) - polygon
+    rel = points[:, None, :] - polygon[None, :, :]
+    cross = edges[None, :, 0] * rel[:, :, 1] - edges[None, :, 1] * rel[:, :, 0]
+    return np.all(cross >= 0, axis=1) | np.all(cross <= 0, axis=1)
+
+def expected_dimensions(c: Dict) -> Dict:
+    """Derive the targets the rendered swatch must meet from the .scad constants."""
+    outer = base_path(c)
+    inner = offset_polygon(outer, -c['INNER_WALL_OFFSET'])
+    shelf_height = float(abs(inner[0][1] - inner[3][1]))
+    hole_y = shelf_height / 2 - c['CIRCLE_RADIUS'] - c['CIRCLE_TOP_MARGIN']
+    steps = [d if d > 0 else BRIDGE_LIFT - d for d in c['DEPTHS']]
+    return {
+        'size': [c['BASE_WIDTH'], c['BASE_HEIGHT'], c['BASE_THICKNESS'] - c['P_EPSILON']],
+        'outer_area': abs(polygon_area(outer)),
+        'inner_path': inner,
+        'rim_level': c['BASE_THICKNESS'] - c['P_EPSILON'],
+        'shelf_level': c['SHELF_THICKNESS'] - c['P_EPSILON'] / 2,
+        'step_levels': sorted(set(round(s, 4) for s in steps)),
+        'holes': [(float(inner[4][0]) + c['CIRCLE_DIAMETER'] + i * c['CIRCLE_SPACING'], hole_y) for i in THROUGH_HOLES],
+    }
+
+def ray_crossings(vertices: np.ndarray, triangles: np.ndarray, x: float, y: float) -> int:
+    """Count the triangles a vertical ray through (x, y) crosses."""
+    a, b, c = (vertices[triangles[:, i], :2] for i in range(3))
+    p = np.array([x, y])
+    d = (b[:, 1] - c[:, 1]) * (a[:, 0] - c[:, 0]) + (c[:, 0] - b[:, 0]) * (a[:, 1] - c[:, 1])
+    valid = np.abs(d) > 1e-12  # Skip triangles seen edge-on
+    d = np.where(valid, d, 1.0)
+    l1 = ((b[:, 1] - c[:, 1]) * (p[0] - c[:, 0]) + (c[:, 0] - b[:, 0]) * (p[1] - c[:, 1])) / d
+    l2 = ((c[:, 1] - a[:, 1]) * (p[0] - c[:, 0]) + (a[:, 0] - c[:, 0]) * (p[1] - c[:, 1])) / d
+    l3 = 1 - l1 - l2
+    return int(np.count_nonzero(valid & (l1 >= 0) & (l2 >= 0) & (l3 >= 0)))
+
+def level_histogram(heights: np.ndarray, areas: np.ndarray, bin_size: float = 0.01) -> Dict[float, float]:
+    """Sum the area of flat upward-facing triangles per height bin."""
+    bins = np.round(heights / bin_size).astype(np.int64)
+    levels, inverse = np.unique(bins, return_inverse=True)
+    totals = np.bincount(inverse, weights=areas)
+    return {round(float(level) * bin_size, 4): float(total) for level, total in zip(levels, totals)}
+
+def level_area(histogram: Dict[float, float], level: float) -> float:
+    """Return the area found within LEVEL_TOLERANCE of a height."""
+    return sum(area for height, area in histogram.items() if abs(height - level) <= LEVEL_TOLERANCE)
+
+def measure(vertices: np.ndarray, triangles: np.ndarray, inner_path: np.ndarray) -> Dict:
+    """Compute bounding box, volume, surface area and per-region height histograms.
+
+    The .scad outline is centred on the origin, so positions are taken
+    relative to the bounding box centre: a swatch placed anywhere (e.g. on a
+    PrusaSlicer bed) measures the same.
+    """
+    a, b, c = (vertices[triangles[:, i]] for i in range(3))
+    cross = np.cross(b - a, c - a)
+    areas = np.linalg.norm(cross, axis=1) / 2
+    lower, upper = vertices.min(axis=0), vertices.max(axis=0)
+    center = (lower + upper)[:2] / 2
+
+    # Flat upward-facing triangles, split into the rim and the shelf inside the inner wall
+    up = cross[:, 2] > 0.999 * np.maximum(2 * areas, 1e-300)
+    centroids = (a + b + c)[up] / 3
+    heights = centroids[:, 2] - lower[2]
+    in_shelf = inside_convex(centroids[:, :2] - center, inner_path)
+    return {
+        'bbox_min': lower.tolist(),
+        'size': (upper - lower).tolist(),
+        'center': center.tolist(),
+        'volume': float(np.sum(np.einsum('ij,ij->i', a, np.cross(b, c))) / 6),
+        'area': float(areas.sum()),
+        'levels': {
+            'rim': level_histogram(heights[~in_shelf], areas[up][~in_shelf]),
+            'shelf': level_histogram(heights[in_shelf], areas[up][in_shelf]),
+        },
+    }
+
+def check_conformance(vertices: np.ndarray, triangles: np.ndarray,
+                      constants: Optional[Dict] = None) -> Tuple[List[str], Dict]:
+    """Check a swatch mesh against the dimensions defined in the .scad sources.
+
+    Returns:
+        The failed checks, and the measurements they were based on
+    """
+    expected = expected_dimensions(constants or parse_scad_constants())
+    outer_area = expected['outer_area']
+    metrics = measure(vertices, triangles, expected['inner_path'])
+    errors = []
+
+    for axis, actual, target in zip('XYZ', metrics['size'], expected['size']):
+        if abs(actual - target) > DIMENSION_TOLERANCE:
+            errors.append(f"{axis} size {actual:.3f} mm, expected {target:.3f} mm")
+
+    if not 0 < metrics['volume'] <= outer_area * expected['size'][2]:
+        errors.append(f"Volume {metrics['volume']:.1f} mm^3 outside (0, {outer_area * expected['size'][2]:.1f}]")
+    if metrics['area'] < 2 * outer_area:
+        errors.append(f"Surface area {metrics['area']:.1f} mm^2 is less than top and bottom faces "
+                      f"({2 * outer_area:.1f} mm^2)")
+
+    rim, shelf = metrics['levels']['rim'], metrics['levels']['shelf']
+    if rim and max(rim, key=rim.get) != min(rim, key=lambda h: abs(h - expected['rim_level'])):
+        errors.append(f"Rim is mostly at {max(rim, key=rim.get):.2f} mm, expected {expected['rim_level']:.2f} mm")
+    if level_area(rim, expected['rim_level']) < MIN_LEVEL_AREA['rim']:
+        errors.append(f"No rim top at {expected['rim_level']:.2f} mm")
+    if level_area(shelf, expected['shelf_level']) < MIN_LEVEL_AREA['shelf']:
+        errors.append(f"No shelf top at {expected['shelf_level']:.2f} mm")
+    for level in expected['step_levels']:
+        if level_area(shelf, level) < MIN_LEVEL_AREA['step']:
+            errors.append(f"No thickness step at {level:.2f} mm")
+
+    cx, cy = metrics['center']
+    for i, (x, y) in zip(THROUGH_HOLES, expected['holes']):
+        if ray_crossings(vertices, triangles, cx + x, cy + y):
+            errors.append(f"Hole {i} at ({x:.2f}, {y:.2f}) is not open")
+
+    return errors, metrics
+
+def check_3mf_conformance(path: Path, constants: Optional[Dict] = None) -> Tuple[List[str], Dict]:
+    """Check the model meshes of a 3MF, merged into one, against the .scad dimensions."""
+    try:
+        with zipfile.ZipFile(path) as archive:
+            with archive.open(MODEL_ENTRY) as model:
+                meshes = load_meshes(model, skip_modifiers=True)
+    except (OSError, KeyError, zipfile.BadZipFile, ET.ParseError, ValueError) as e:
+        return [f"Could not read meshes from {path}: {e}"], {}
+    if not meshes:
+        return ["No meshes found"], {}
+
+    # Merge the objects, offsetting each one's triangle indices
+    vertices, triangles, offset = [], [], 0
+    for object_vertices, object_triangles in meshes.values():
+        vertices.append(object_vertices)
+        triangles.append(object_triangles + offset)
+        offset += len(object_vertices)
+    return check_conformance(np.concatenate(vertices), np.concatenate(triangles), constants)
+
+def main():
+    parser = argparse.ArgumentParser(description='Check rendered swatches against the dimensions in the .scad sources')
+    parser.add_argument('files', type=Path, nargs='+', help='3MF files to check')
+    parser.add_argument('--json', action='store_true', help='Print the measurements as JSON lines')
+    parser.add_argument('--advisory', action='store_true',
+                      help='Report deviations but exit successfully (how builds run the check)')
+    args = parser.parse_args()
+
+    constants = parse_scad_constants()
+    failed = 0
+    for path in args.files:
+        errors, metrics = check_3mf_conformance(path, constants)
+        if args.json:
+            print(json.dumps({'file': str(path), 'errors': errors, 'metrics': metrics}))
+        elif errors:
+            print(f"❌ {path}")
+            for error in errors:
+                print(f"  - {error}")
+        else:
+            print(f"✅ {path}")
+        failed += bool(errors)
+    return 1 if failed and not args.advisory else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from itertools import zip_longest
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from gcode_stats import GCODE_DIR, GcodeStats, iter_lines
+
+# Known-good slices to compare new output against
+FIXTURES_DIR = Path("tests/fixtures/gcode")
+
+# Default tolerances: filament mm, fraction of the larger value, and layer height mm
+ABS_TOLERANCE = 0.01
+REL_TOLERANCE = 0.005
+Z_TOLERANCE = 0.001
+
+def iter_layers(path: Path,
+                stats: Optional[GcodeStats] = None) -> Iterator[Tuple[int, Optional[float], Dict[str, float]]]:
+    """Yield (index, z, {feature: extruded mm}) per layer while streaming through a file.
+
+    Only comments marking layers and feature types are interpreted, so
+    timestamps, headers and other volatile comments never affect the result.
+    """
+    stats = stats or GcodeStats()
+    pending = []
+    stats.on_layer = lambda index, z, features: pending.append((index, z, features))
+    for line in iter_lines(path):
+        stats.feed(line)
+        if pending:
+            yield from pending
+            pending.clear()
+    stats.finish()
+    yield from pending
+
+def within(expected: float, actual: float, abs_tol: float, rel_tol: float) -> bool:
+    """Check two amounts for equality within an absolute or relative tolerance."""
+    return abs(expected - actual) <= max(abs_tol, rel_tol * max(abs(expected), abs(actual)))
+
+def layer_differences(expected: Dict[str, float], actual: Dict[str, float],
+                      abs_tol: float, rel_tol: float) -> List[str]:
+    """Describe how two layers' per-feature extrusion differ beyond tolerance."""
+    differences = []
+    for feature in sorted(set(expected) | set(actual)):
+        if feature not in actual:
+            differences.append(f"{feature} missing")
+        elif feature not in expected:
+            differences.append(f"{feature} added ({actual[feature]:.3f} mm)")
+        elif not within(expected[feature], actual[feature], abs_tol, rel_tol):
+            differences.append(f"{feature} {expected[feature]:.3f} -> {actual[feature]:.3f} mm")
+    return differences
+
+def compare_gcode(expected_path: Path, actual_path: Path, abs_tol: float = ABS_TOLERANCE,
+                  rel_tol: float = REL_TOLERANCE, z_tol: float = Z_TOLERANCE) -> Dict:
+    """Compare two G-code files layer by layer in constant memory.
+
+    Returns:
+        The layer counts, the first divergent layer and why it diverges, how
+        many layers diverge, and the per-feature extrusion totals and deltas
+    """
+    expected_stats, actual_stats = GcodeStats(), GcodeStats()
+    first = None
+    divergent = 0
+    layers = zip_longest(iter_layers(expected_path, expected_stats), iter_layers(actual_path, actual_stats))
+    for expected, actual in layers:
+        if expected is None or actual is None:
+            reasons = ["layer missing" if actual is None else "extra layer"]
+        else:
+            reasons = []
+            if expected[1] is not None and actual[1] is not None and abs(expected[1] - actual[1]) > z_tol:
+                reasons.append(f"Z {expected[1]:.3f} -> {actual[1]:.3f}")
+            reasons.extend(layer_differences(expected[2], actual[2], abs_tol, rel_tol))
+        if not reasons:
+            continue
+        divergent += 1
+        if first is None:
+            layer = expected or actual
+            first = {
+                'layer': layer[0],
+                'z': layer[1],
+                'reasons': reasons,
+            }
+
+    features = {}
+    for feature in sorted(set(expected_stats.features) | set(actual_stats.features)):
+        old, new = expected_stats.features.get(feature, 0.0), actual_stats.features.get(feature, 0.0)
+        features[feature] = {
+            'expected': round(old, 3),
+            'actual': round(new, 3),
+            'delta': round(new - old, 3),
+            'relative': round((new - old) / old, 4) if old else None,
+            'within_tolerance': within(old, new, abs_tol, rel_tol),
+        }
+
+    return {
+        'expected': str(expected_path),
+        'actual': str(actual_path),
+        'layers': {'expected': expected_stats.layers, 'actual': actual_stats.layers},
+        'divergent_layers': divergent,
+        'first_divergence': first,
+        'features': features,
+        'match': divergent == 0 and all(f['within_tolerance'] for f in features.values()),
+    }
+
+def compare_safely(args: Tuple[Path, Path, float, float, float]) -> Dict:
+    """Compare a pair of files, reporting errors in the result instead of raising."""
+    expected, actual = args[:2]
+    try:
+        return compare_gcode(*args)
+    except (OSError, ValueError) as e:
+        return {'expected': str(expected), 'actual': str(actual), 'match': False, 'error': str(e)}
+
+def catalog_pairs(fixtures_dir: Path, output_dir: Path) -> List[Tuple[Path, Path]]:
+    """Pair every known-good fixture with the newly sliced file of the same name."""
+    return [(fixture, output_dir / fixture.relative_to(fixtures_dir))
+            for fixture in sorted(fixtures_dir.rglob('*.gcode'))]
+
+def print_report(result: Dict):
+    """Print a human-readable comparison result."""
+    name = Path(result['actual']).name
+    if 'error' in result:
+        print(f"❌ {name}: {result['error']}")
+        return
+    if result['match']:
+        print(f"✅ {name} ({result['layers']['actual']} layers)")
+        return
+
+    layers = result['layers']
+    print(f"❌ {name}: {result['divergent_layers']} divergent layers "
+          f"({layers['expected']} expected, {layers['actual']} actual)")
+    first = result['first_divergence']
+    if first:
+        z = f" (Z {first['z']:.3f})" if first['z'] is not None else ""
+        print(f"  First divergence at layer {first['layer']}{z}:")
+        for reason in first['reasons']:
+            print(f"    - {reason}")
+    for feature, totals in result['features'].items():
+        if not totals['within_tolerance']:
+            print(f"  {feature}: {totals['expected']} -> {totals['actual']} mm ({totals['delta']:+.3f})")
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare G-code layer by layer against known-good slices')
+    parser.add_argument('files', type=Path, nargs='*', help='Expected and actual G-code file')
+    parser.add_argument('--catalog', action='store_true',
+                      help='Compare every fixture under --fixtures with its counterpart under --output-dir')
+    parser.add_argument('--fixtures', type=Path, default=FIXTURES_DIR, help='Known-good G-code directory')
+    parser.add_argument('--output-dir', type=Path, default=GCODE_DIR, help='New G-code directory')
+    parser.add_argument('--abs-tol', type=float, default=ABS_TOLERANCE,
+                      help='Allowed extrusion difference per feature in mm of filament')
+    parser.add_argument('--rel-tol', type=float, default=REL_TOLERANCE,
+                      help='Allowed extrusion difference per feature as a fraction')
+    parser.add_argument('--z-tol', type=float, default=Z_TOLERANCE, help='Allowed layer height difference in mm')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                      help='Worker processes for --catalog (default: CPU count)')
+    parser.add_argument('--json', action='store_true', help='Print results as JSON lines')
+    args = parser.parse_args()
+
+    if args.catalog:
+        pairs = catalog_pairs(args.fixtures, args.output_dir)
+        if not pairs:
+            print(f"Error: No fixtures found under {args.fixtures}", file=sys.stderr)
+            return 1
+    elif len(args.files) == 2:
+        pairs = [tuple(args.files)]
+    else:
+        parser.error("give an expected and an actual file, or --catalog")
+
+    work = [(expected, actual, args.abs_tol, args.rel_tol, args.z_tol) for expected, actual in pairs]
+    if len(work) > 1:
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            results = list(pool.map(compare_safely, work))
+    else:
+        results = [compare_safely(work[0])]
+
+    for result in results:
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print_report(result)
+    return 0 if all(result['match'] for result in results) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import math
+import mmap
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+# Where build_matrix.py writes its slices
+GCODE_DIR = Path("output/gcode")
+
+# Footer comments PrusaSlicer writes after the moves
+FOOTER_KEYS = {
+    b'; estimated printing time (normal mode)': 'estimated_time',
+    b'; filament used [mm]': 'filament_mm',
+    b'; filament used [g]': 'filament_g',
+    b'; filament_diameter': 'filament_diameter',
+    b'; filament_density': 'filament_density',
+}
+
+DURATION_PART = re.compile(r'(\d+(?:\.\d+)?)\s*([dhms])')
+DURATION_UNITS = {'d': 86400, 'h': 3600, 'm': 60, 's': 1}
+
+def parse_duration(text: str) -> Optional[float]:
+    """Convert a PrusaSlicer duration like "1h 2m 3s" to seconds."""
+    parts = DURATION_PART.findall(text)
+    if not parts:
+        return None
+    return sum(float(value) * DURATION_UNITS[unit] for value, unit in parts)
+
+def first_number(text: str) -> Optional[float]:
+    """Return the first value of a (possibly per-extruder, comma separated) setting."""
+    try:
+        return float(text.split(',')[0].strip())
+    except ValueError:
+        return None
+
+def iter_lines(path: Path) -> Iterator[bytes]:
+    """Yield the lines of a file through a read-only memory map."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield from iter(mm.readline, b'')
+
+class GcodeStats:
+    """Totals gathered in one streaming pass over a G-code file.
+
+    Feed it lines with `feed()` and call `finish()` at the end. `on_layer`,
+    if given, is called with (index, z, {feature: extruded mm}) as each
+    layer closes, so callers can work layer by layer in constant memory.
+    """
+    def __init__(self, on_layer: Optional[Callable[[int, Optional[float], Dict[str, float]], None]] = None):
+        self.on_layer = on_layer
+        self.layers = 0
+        self.layer_z = None
+        self.feature = "Unknown"
+        self.features = {}
+        self.layer_features = {}
+        self.ironing_layers = []
+        self.top_layer = None
+        self.top_layer_ironing = 0.0
+        self.move_time = 0.0
+        self.max_nozzle_temp = None
+        self.max_bed_temp = None
+        self.footer = {}
+        self.bbox_min = [math.inf] * 3
+        self.bbox_max = [-math.inf] * 3
+        self.extrusion_z = set()
+
+        # Machine state
+        self.x = self.y = self.z = 0.0
+        self.e = 0.0
+        self.retracted = 0.0  # Filament pulled back and not yet pushed out again
+        self.feedrate = 0.0
+        self.relative_e = False
+
+    def close_layer(self):
+        """Report the finished layer and start collecting the next one."""
+        if self.layer_features:
+            self.top_layer = self.layers
+            self.top_layer_ironing = self.layer_features.get("Ironing", 0.0)
+            if "Ironing" in self.layer_features:
+                self.ironing_layers.append(self.layers)
+        if self.on_layer is not None and self.layers:
+            self.on_layer(self.layers, self.layer_z, self.layer_features)
+        self.layer_features = {}
+
+    def feed(self, line: bytes):
+        """Account for one line of G-code."""
+        if line[:1] == b';':
+            self.comment(line)
+            return
+
+        code = line.split(b';', 1)[0].split()
+        if not code:
+            return
+        command = code[0]
+        if command in (b'G1', b'G0', b'G2', b'G3'):
+            self.move(code)
+        elif command in (b'M104', b'M109', b'M140', b'M190'):
+            for word in code[1:]:
+                if word[:1] == b'S':
+                    value = float(word[1:])
+                    if command in (b'M104', b'M109'):
+                        self.max_nozzle_temp = max(value, self.max_nozzle_temp or value)
+                    else:
+                        self.max_bed_temp = max(value, self.max_bed_temp or value)
+        elif command == b'M83':
+            self.relative_e = True
+        elif command == b'M82':
+            self.relative_e = False
+        elif command == b'G92':
+            for word in code[1:]:
+                if word[:1] == b'E':
+                    self.e = float(word[1:])
+
+    def comment(self, line: bytes):
+        """Track layer changes, feature types and footer values."""
+        if line.startswith(b';LAYER_CHANGE'):
+            self.close_layer()
+            self.layers += 1
+        elif line.startswith(b';Z:'):
+            self.layer_z = float(line[3:])
+        elif line.startswith(b';TYPE:'):
+            self.feature = line[6:].strip().decode('utf-8', 'replace')
+        elif line.startswith(b'; ') and b' = ' in line:
+            key, value = line.split(b' = ', 1)
+            name = FOOTER_KEYS.get(key.rstrip())
+            if name:
+                self.footer[name] = value.strip().decode('utf-8', 'replace')
+
+    def move(self, code: List[bytes]):
+        """Apply a G0-G3 move: travel time, extrusion per feature and bounding box."""
+        # Hot path: compare axis letters as bytes values and keep state in locals
+        x0, y0, z0 = x, y, z = self.x, self.y, self.z
+        de = 0.0
+        for word in code[1:]:
+            axis = word[0]
+            if axis == 88:  # X
+                x = float(word[1:])
+            elif axis == 89:  # Y
+                y = float(word[1:])
+            elif axis == 69:  # E
+                value = float(word[1:])
+                if self.relative_e:
+                    de = value
+                    self.e += value
+                else:
+                    de = value - self.e
+                    self.e = value
+            elif axis == 70:  # F
+                self.feedrate = float(word[1:])
+            elif axis == 90:  # Z
+                z = float(word[1:])
+        self.x, self.y, self.z = x, y, z
+
+        # Arcs are approximated by their chord
+        dx, dy, dz = x - x0, y - y0, z - z0
+        distance = math.sqrt(dx * dx + dy * dy + dz * dz) or abs(de)
+        if self.feedrate > 0:
+            self.move_time += distance * 60 / self.feedrate
+
+        # Retractions and the E-only moves that undo them extrude nothing;
+        # only what an unretract pushes beyond the retracted length counts
+        if de < 0:
+            self.retracted -= de
+        elif de > 0 and x == x0 and y == y0 and self.retracted > 0:
+            restored = min(de, self.retracted)
+            self.retracted -= restored
+            de -= restored
+
+        if de > 0:
+            feature = self.feature
+            self.features[feature] = self.features.get(feature, 0.0) + de
+            self.layer_features[feature] = self.layer_features.get(feature, 0.0) + de
+            self.extrusion_z.add(z)
+            low, high = self.bbox_min, self.bbox_max
+            for axis, lo, hi in ((0, x, x0), (1, y, y0), (2, z, z0)):
+                if lo > hi:
+                    lo, hi = hi, lo
+                if lo < low[axis]:
+                    low[axis] = lo
+                if hi > high[axis]:
+                    high[axis] = hi
+
+    def finish(self):
+        """Close the last layer."""
+        self.close_layer()
+
+    def to_dict(self) -> Dict:
+        """Summarize the file as JSON-serializable values."""
+        filament_mm = first_number(self.footer['filament_mm']) if 'filament_mm' in self.footer else None
+        filament_g = first_number(self.footer['filament_g']) if 'filament_g' in self.footer else None
+        extruded = sum(self.features.values())
+        if filament_g is None and 'filament_diameter' in self.footer and 'filament_density' in self.footer:
+            # Weight from the extruded length when the slicer did not report it
+            radius = first_number(self.footer['filament_diameter']) / 2
+            length = filament_mm if filament_mm is not None else extruded
+            filament_g = math.pi * radius ** 2 * length * first_number(self.footer['filament_density']) / 1000
+
+        ironing = self.features.get("Ironing", 0.0)
+        has_bbox = self.bbox_min[0] != math.inf
+        return {
+            'layers': self.layers or len(self.extrusion_z),
+            'features': {name: round(mm, 3) for name, mm in sorted(self.features.items())},
+            'extruded_mm': round(extruded, 3),
+            'ironing': {
+                'total_mm': round(ironing, 3),
+                'layers': self.ironing_layers,
+                'top_layer': self.top_layer,
+                'top_layer_mm': round(self.top_layer_ironing, 3),
+                'top_only': bool(self.ironing_layers) and self.ironing_layers == [self.top_layer],
+            },
+            'estimated_time_s': parse_duration(self.footer.get('estimated_time', '')),
+            'move_time_s': round(self.move_time, 1),
+            'filament_mm': filament_mm,
+            'filament_g': round(filament_g, 3) if filament_g is not None else None,
+            'max_nozzle_temp': self.max_nozzle_temp,
+            'max_bed_temp': self.max_bed_temp,
+            'bbox': {'min': self.bbox_min, 'max': self.bbox_max} if has_bbox else None,
+        }
+
+def analyze_gcode(path: Path) -> Dict:
+    """Stream through one G-code file and return its statistics."""
+    stats = GcodeStats()
+    for line in iter_lines(path):
+        stats.feed(line)
+    stats.finish()
+    return dict(file=str(path), **stats.to_dict())
+
+def analyze_safely(path: Path) -> Dict:
+    """Analyze a file, reporting errors in the result instead of raising."""
+    try:
+        return analyze_gcode(path)
+    except (OSError, ValueError) as e:
+        return {'file': str(path), 'error': str(e)}
+
+def analyze_batch(paths: List[Path], max_workers: Optional[int] = None) -> Iterator[Dict]:
+    """Analyze many files across a process pool, yielding results in input order."""
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        yield from pool.map(analyze_safely, paths, chunksize=4)
+
+def main():
+    parser = argparse.ArgumentParser(description='Summarize G-code files as JSON, one line per file')
+    parser.add_argument('files', type=Path, nargs='*',
+                      help=f'G-code files (default: every .gcode under {GCODE_DIR})')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                      help='Worker processes for batch mode (default: CPU count)')
+    args = parser.parse_args()
+
+    paths = args.files or sorted(GCODE_DIR.rglob('*.gcode'))
+    if not paths:
+        print(f"Error: No G-code files found under {GCODE_DIR}", file=sys.stderr)
+        return 1
+
+    results = analyze_batch(paths, args.jobs) if len(paths) > 1 else [analyze_safely(paths[0])]
+    failed = 0
+    for result in results:
+        print(json.dumps(result))
+        failed += 'error' in result
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,20 @@
 #!/usr/bin/env python3
 
+import os
 import sys
 import json
 import subprocess
 import platform
 from pathlib import Path
 from get_material_config import get_filament_config, get_latest_config_file
+from artifact_cache import ArtifactStore, CACHE_DIR, cache_key, hash_file, scad_sources_hash, submodule_revision, tool_version
+from profile_index import load_profile_index
+from label_cache import prepare_labels
+from threemf import write_3mf_config
+from tracing import traced, traced_run
 import re
+import hashlib
+import zipfile
 import traceback
 import argparse
 
@@ -177,158 +185,450 @@ def find_prusaslicer():
         print(f"  - {path}", file=sys.stderr)
     return None
 
-def generate_3mf(material, brand, color, printer_model, print_profile=None, temperature=None, layer_height=None):
-    """Generate a 3MF file for the given material configuration.
+def output_3mf_path(material, brand, color, printer_model, print_profile=None):
+    """Return the printer-specific 3MF path generate_3mf() writes for a configuration."""
+    # Create printer-specific name suffix
+    printer_suffix = re.sub(r'[^a-zA-Z0-9_-]', '', printer_model)
+    
+    # For print profile specific output, extract quality/draft
+    profile_suffix = ""
+    if print_profile:
+        match = re.search(r'(QUALITY|DRAFT)', print_profile)
+        if match:
+            profile_suffix = f"_{match.group(1).lower()}"
+    
+    return Path(f"output/3mf/{safe_swatch_name(material, brand, color)}_{printer_suffix}{profile_suffix}.3mf")
+
+def safe_swatch_name(material, brand, color):
+    """Create a filename-safe name for a swatch."""
+    safe_name = f"{brand}_{material}_{color}".replace(" ", "_")
+    return re.sub(r'[^a-zA-Z0-9_-]', '', safe_name)
+
+def render_params(material, brand, color, printer_model=None, temperature=None, layer_height=None):
+    """Resolve the OpenSCAD parameters that define a swatch's geometry.
+    
+    The geometry depends only on these values, so two printer/profile targets
+    with equal parameters can share one render. Profile lookups are only done
+    for values that are not overridden.
+    
+    Returns:
+        dict: OpenSCAD variable -> value, or None if the profile lookup failed
+    """
+    if temperature and layer_height:
+        config = {}
+    else:
+        config = get_filament_config(material, printer_model)
+        if not config:
+            print(f"Error: Could not get configuration for {material} on {printer_model}", file=sys.stderr)
+            return None
+    
+    return {
+        'MATERIAL': material,
+        'BRAND': brand,
+        'COLOR': color,
+        'NOZZLE_TEMP': format_number(temperature or config.get('temperature', 215)),
+        'LAYER_HEIGHT': format_number(layer_height or config.get('layer_height', 0.2)),
+    }
+
+def format_number(value):
+    """Format a numeric parameter canonically (215.0 -> "215", "0.20" -> "0.2")."""
+    return f"{float(value):g}"
+
+def openscad_defines(params):
+    """Turn render parameters into OpenSCAD -D arguments."""
+    defines = []
+    for name, value in params.items():
+        value = f'"{value}"' if name in ('MATERIAL', 'BRAND', 'COLOR') else value
+        defines.extend(["-D", f"{name}={value}"])
+    return defines
+
+def render_key(params):
+    """Return a short stable key identifying a set of render parameters."""
+    encoded = json.dumps(params, sort_keys=True).encode()
+    return hashlib.sha256(encoded).hexdigest()[:12]
+
+# Vendor bundle the print/printer/filament profiles are resolved from
+PROFILE_BUNDLE = Path("slicer-profiles/PrusaResearch/2.1.11.ini")
+
+# Print settings applied on top of every profile
+IRONING_SETTINGS = [
+    "ironing=1",
+    "ironing_type=top",
+    "ironing_flowrate=15",
+]
+
+# Material-independent swatch body, rendered once and shared by every material
+BODY_MESH = Path("output/3mf/base/body.stl")
+
+def base_3mf_path(params):
+    """Return where the base (printer-independent) 3MF for a parameter set is written."""
+    name = safe_swatch_name(params['MATERIAL'], params['BRAND'], params['COLOR'])
+    return Path(f"output/3mf/base/{name}_{render_key(params)}.3mf")
+
+def run_openscad(openscad_path, output, export_format, defines):
+    """Run OpenSCAD on swatch.scad, reporting any failure.
+    
+    Returns:
+        bool: True if the output file was produced
+    """
+    cmd = [
+        str(openscad_path),
+        "-o", str(output),
+        "--export-format", export_format,
+        "--check-parameters", "true",
+        "--check-parameter-ranges", "true",
+        "--hardwarnings",
+        str(Path("swatch/swatch.scad").resolve()),  # Use absolute path
+    ] + defines
+    
+    print(f"Running OpenSCAD: {' '.join(cmd)}", file=sys.stderr)
+    result = traced_run(cmd, name="openscad", outputs=[output])
+    if result.returncode != 0:
+        print(f"Error rendering {output}:", file=sys.stderr)
+        print(f"Command output:", file=sys.stderr)
+        print(result.stdout, file=sys.stderr)
+        print(f"Command error:", file=sys.stderr)
+        print(result.stderr, file=sys.stderr)
+        return False
+    
+    if not Path(output).exists():
+        print(f"Error: OpenSCAD output not found: {output}", file=sys.stderr)
+        return False
+    return True
+
+@traced("render")
+def render_body_mesh(openscad_path, store=None, body_mesh=BODY_MESH):
+    """Render the material-independent swatch body (frame, shelf and test features) to STL.
+    
+    The body only depends on the .scad sources, the BOSL2 revision and the
+    OpenSCAD version, so with an artifact store it is rendered once and then
+    shared by every material's text pass.
+    
+    Returns:
+        Path: The body mesh, or None on failure
+    """
+    body_mesh = Path(body_mesh)
+    body_mesh.parent.mkdir(parents=True, exist_ok=True)
+    defines = ["-D", 'RENDER_MODE="body"']
+    
+    if store is not None:
+        key = cache_key(
+            stage="openscad-body",
+            sources=scad_sources_hash(),
+            bosl2=submodule_revision("BOSL2"),
+            defines=defines,
+            tool=tool_version(openscad_path),
+        )
+        if store.fetch(key, body_mesh, label="openscad-body"):
+            print(f"Using cached swatch body: {body_mesh}", file=sys.stderr)
+            return body_mesh
+    
+    print(f"\nGenerating swatch body...", file=sys.stderr)
+    # Builds running side by side (e.g. shards) may import this path, so only move a complete mesh into place
+    tmp_mesh = body_mesh.with_name(f".{body_mesh.stem}.{os.getpid()}.stl")
+    if not run_openscad(openscad_path, tmp_mesh, "binstl", defines):
+        tmp_mesh.unlink(missing_ok=True)
+        return None
+    os.replace(tmp_mesh, body_mesh)
+    
+    if store is not None:
+        store.store(key, body_mesh, label="openscad-body")
+    return body_mesh
+
+@traced("render")
+def render_base_3mf(openscad_path, params, store=None, body_mesh=None):
+    """Render the base 3MF for a parameter set with OpenSCAD.
+    
+    With a body mesh, only the text is computed: it is cut out of the imported
+    body instead of recomputing the whole swatch CSG. With an artifact store,
+    the render is looked up by the hash of the .scad sources, the BOSL2
+    revision, the body mesh, the -D parameters and the OpenSCAD version before
+    OpenSCAD is launched, and stored afterwards; its text labels are imported
+    from the label mesh cache.
+    
+    Returns:
+        Path: The rendered file, or None on failure
+    """
+    base_3mf = base_3mf_path(params)
+    base_3mf.parent.mkdir(parents=True, exist_ok=True)
+    
+    defines = openscad_defines(params)
+    if body_mesh is not None:
+        defines += ["-D", 'RENDER_MODE="text"']
+    
+    if store is not None:
+        key = cache_key(
+            stage="openscad",
+            sources=scad_sources_hash(),
+            bosl2=submodule_revision("BOSL2"),
+            body=hash_file(body_mesh) if body_mesh is not None else None,
+            defines=defines,
+            tool=tool_version(openscad_path),
+        )
+        if store.fetch(key, base_3mf, label="openscad"):
+            print(f"Using cached base 3MF for {render_key(params)}", file=sys.stderr)
+            return base_3mf
+    
+    print(f"\nGenerating base 3MF...", file=sys.stderr)
+    # The body path varies between checkouts, so it is left out of the cache key
+    body_define = ["-D", f'BODY_FILE="{Path(body_mesh).resolve().as_posix()}"'] if body_mesh is not None else []
+    # Import pre-extruded label meshes instead of tessellating repeated text again
+    label_define = prepare_labels(openscad_path, defines + body_define, store) if store is not None else []
+    if not run_openscad(openscad_path, base_3mf, "3mf", defines + body_define + label_define):
+        return None
+    
+    if store is not None:
+        store.store(key, base_3mf, label="openscad")
+    return base_3mf
+
+def printer_3mf_settings(printer_model=None, print_profile=None, printer_profile=None, filament_profile=None,
+                         bundle=PROFILE_BUNDLE):
+    """Resolve the settings embedded in a printer-specific 3MF.
+    
+    The printer, filament and print profiles are flattened from the profile
+    index, then the ironing overrides are applied on top. The printer profile
+    defaults to printer_model when the bundle has a section of that name.
+    
+    Returns:
+        dict: Setting -> value, or None if a requested profile is unknown
+    """
+    settings = {}
+    if print_profile or printer_profile or filament_profile or printer_model:
+        if not bundle.exists():
+            print(f"Error: Profile bundle not found: {bundle}", file=sys.stderr)
+            return None
+        index = load_profile_index(bundle)
+        if not printer_profile and printer_model and f"printer:{printer_model}" in index:
+            printer_profile = printer_model
+        
+        for section_type, name in (("printer", printer_profile), ("filament", filament_profile),
+                                   ("print", print_profile)):
+            if not name:
+                continue
+            section = f"{section_type}:{name}"
+            if section not in index:
+                print(f"Error: Unknown {section_type} profile: {name}", file=sys.stderr)
+                return None
+            settings.update(index[section])
+            settings[f"{section_type}_settings_id"] = name
+        settings.pop('inherits', None)
+    
+    for setting in IRONING_SETTINGS:
+        key, value = setting.split('=', 1)
+        settings[key] = value
+    return settings
+
+@traced("convert")
+def convert_printer_3mf(base_3mf, printer_3mf, print_profile=None, printer_model=None, printer_profile=None,
+                        filament_profile=None):
+    """Create a printer-specific 3MF with ironing enabled from a base 3MF.
+    
+    The resolved profile settings are written straight into the 3MF's
+    Metadata/Slic3r_PE.config; no PrusaSlicer process is launched.
+    
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    settings = printer_3mf_settings(printer_model, print_profile, printer_profile, filament_profile)
+    if settings is None:
+        return False
+    
+    print(f"\nGenerating printer-specific 3MF with ironing...", file=sys.stderr)
+    try:
+        write_3mf_config(base_3mf, printer_3mf, settings)
+    except (OSError, zipfile.BadZipFile) as e:
+        print(f"Error generating printer-specific 3MF: {e}", file=sys.stderr)
+        return False
+    
+    print(f"3MF file size: {printer_3mf.stat().st_size} bytes")
+    print(f"Generated 3MF file: {printer_3mf}")
+    return True
+
+def generate_3mf_set(material, brand, color, targets, temperature=None, layer_height=None, base_3mf=None,
+                     store=None, body_mesh=None, printer_profile=None, filament_profile=None):
+    """Generate printer-specific 3MF files for several printer/profile targets.
+    
+    Targets whose render parameters are identical share a single OpenSCAD
+    render; its base 3MF is then converted once per target and removed.
+    Renders cut their text out of a shared body mesh, which is rendered first
+    unless one is given.
     
     Args:
         material: Material type (e.g., "PLA", "PETG")
         brand: Brand name (e.g., "Prusament", "Generic")
         color: Color name (e.g., "Galaxy Black", "Natural")
-        printer_model: Printer model (e.g., "MK4S", "MK3S+")
-        print_profile: Print profile name (e.g., "0.20mm QUALITY MK4S")
+        targets: List of (printer_model, print_profile) pairs
         temperature: Optional temperature override
         layer_height: Optional layer height override
+        base_3mf: Optional pre-rendered base 3MF to convert instead of rendering (kept)
+        store: Optional ArtifactStore consulted before launching OpenSCAD
+        body_mesh: Optional pre-rendered swatch body to cut the text out of
+        printer_profile: Optional printer profile embedded instead of one named after the printer
+        filament_profile: Optional filament profile to embed
     
     Returns:
-        bool: True if successful, False otherwise
+        bool: True if every target was generated, False otherwise
     """
     try:
         # Get paths to required executables
-        openscad_path = find_openscad()
-        prusaslicer_path = find_prusaslicer()
-        
-        if not openscad_path or not prusaslicer_path:
+        openscad_path = find_openscad() if base_3mf is None else None
+        if base_3mf is None and not openscad_path:
             return False
             
         # Create output directories if they don't exist
         Path("output/3mf").mkdir(parents=True, exist_ok=True)
         Path("output/gcode").mkdir(parents=True, exist_ok=True)
         
-        # Get material configuration
-        config = get_filament_config(material, printer_model)
-        if not config:
-            print(f"Error: Could not get configuration for {material} on {printer_model}", file=sys.stderr)
-            return False
-            
-        # Override config with provided values
-        if temperature:
-            config['temperature'] = temperature
-            
-        if layer_height:
-            config['layer_height'] = layer_height
-            
-        # Create safe filename with printer model
-        safe_name = f"{brand}_{material}_{color}".replace(" ", "_")
-        safe_name = re.sub(r'[^a-zA-Z0-9_-]', '', safe_name)
-        
-        # Create printer-specific name suffix
-        printer_suffix = re.sub(r'[^a-zA-Z0-9_-]', '', printer_model)
-        
-        # For print profile specific output, extract quality/draft
-        profile_suffix = ""
-        if print_profile:
-            match = re.search(r'(QUALITY|DRAFT)', print_profile)
-            if match:
-                profile_suffix = f"_{match.group(1).lower()}"
+        # Group targets by identical render parameters
+        groups = {}
+        for printer_model, print_profile in targets:
+            params = render_params(material, brand, color, printer_model, temperature, layer_height)
+            if params is None:
+                return False
+            key = render_key(params)
+            groups.setdefault(key, (params, []))[1].append((printer_model, print_profile))
         
-        # Generate base 3MF file
-        base_3mf = Path(f"output/3mf/{safe_name}.3mf")
+        print(f"{len(targets)} target(s) need {len(groups)} distinct render(s)", file=sys.stderr)
         
-        print(f"\nGenerating base 3MF...", file=sys.stderr)
-        base_cmd = [
-            str(openscad_path),
-            "-o", str(base_3mf),
-            "--export-format", "3mf",
-            "--check-parameters", "true",
-            "--check-parameter-ranges", "true",
-            "--hardwarnings",
-            str(Path("swatch/swatch.scad").resolve()),  # Use absolute path
-            "-D", f'MATERIAL="{material}"',
-            "-D", f'BRAND="{brand}"',
-            "-D", f'COLOR="{color}"',
-            "-D", f"NOZZLE_TEMP={config.get('temperature', 215)}",
-            "-D", f"LAYER_HEIGHT={config.get('layer_height', 0.2)}"
-        ]
-        
-        print(f"Running OpenSCAD: {' '.join(base_cmd)}", file=sys.stderr)
-        result = subprocess.run(base_cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            print(f"Error generating base 3MF:", file=sys.stderr)
-            print(f"Command output:", file=sys.stderr)
-            print(result.stdout, file=sys.stderr)
-            print(f"Command error:", file=sys.stderr)
-            print(result.stderr, file=sys.stderr)
-            return False
-            
-        # Generate printer-specific 3MF with ironing enabled
-        printer_3mf = Path(f"output/3mf/{safe_name}_{printer_suffix}{profile_suffix}.3mf")
+        if base_3mf is None and body_mesh is None:
+            body_mesh = render_body_mesh(openscad_path, store)
+            if body_mesh is None:
+                return False
         
-        print(f"\nGenerating printer-specific 3MF with ironing...", file=sys.stderr)
-        printer_cmd = [
-            str(prusaslicer_path),
-            "--export-3mf",
-            "--repair",
-            "--load", str(Path("slicer-profiles/PrusaResearch/2.1.11.ini")),
-            "--print-settings", "ironing=1",
-            "--print-settings", "ironing_type=top",
-            "--print-settings", "ironing_flowrate=15",
-            str(base_3mf),
-            "--output", str(printer_3mf)
-        ]
-        
-        # Add print profile if provided
-        if print_profile:
-            printer_cmd.extend(["--print", print_profile])
-        
-        print(f"Running PrusaSlicer printer-specific conversion: {' '.join(printer_cmd)}", file=sys.stderr)
-        result = subprocess.run(printer_cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            print(f"Error generating printer-specific 3MF:", file=sys.stderr)
-            print(f"Command output:", file=sys.stderr)
-            print(result.stdout, file=sys.stderr)
-            print(f"Command error:", file=sys.stderr)
-            print(result.stderr, file=sys.stderr)
-            return False
-            
-        # Clean up base 3MF
-        base_3mf.unlink()
-            
-        # Verify the file exists
-        if not printer_3mf.exists():
-            print(f"Error: 3MF file not found: {printer_3mf}", file=sys.stderr)
-            return False
+        success = True
+        for params, group_targets in groups.values():
+            rendered = base_3mf or render_base_3mf(openscad_path, params, store, body_mesh)
+            if rendered is None:
+                success = False
+                continue
             
-        # Check file size
-        file_size = printer_3mf.stat().st_size
-        if file_size == 0:
-            print(f"Error: 3MF file is empty: {printer_3mf}", file=sys.stderr)
-            return False
-            
-        print(f"3MF file size: {file_size} bytes")
-        print(f"Generated 3MF file: {printer_3mf}")
+            for printer_model, print_profile in group_targets:
+                printer_3mf = output_3mf_path(material, brand, color, printer_model, print_profile)
+                if not convert_printer_3mf(rendered, printer_3mf, print_profile, printer_model,
+                                           printer_profile, filament_profile):
+                    success = False
             
-        return True
+            # Clean up base 3MF once every target using it was converted
+            if base_3mf is None:
+                rendered.unlink()
+        
+        return success
             
     except Exception as e:
         print(f"Error: {str(e)}", file=sys.stderr)
         traceback.print_exc(file=sys.stderr)
         return False
 
+def generate_3mf(material, brand, color, printer_model, print_profile=None, temperature=None, layer_height=None,
+                 base_3mf=None, store=None, body_mesh=None, printer_profile=None, filament_profile=None):
+    """Generate a 3MF file for the given material configuration.
+    
+    Args:
+        material: Material type (e.g., "PLA", "PETG")
+        brand: Brand name (e.g., "Prusament", "Generic")
+        color: Color name (e.g., "Galaxy Black", "Natural")
+        printer_model: Printer model (e.g., "MK4S", "MK3S+")
+        print_profile: Print profile name (e.g., "0.20mm QUALITY MK4S")
+        temperature: Optional temperature override
+        layer_height: Optional layer height override
+        base_3mf: Optional pre-rendered base 3MF to convert instead of rendering
+        store: Optional ArtifactStore consulted before launching OpenSCAD
+        body_mesh: Optional pre-rendered swatch body to cut the text out of
+        printer_profile: Optional printer profile embedded instead of one named after the printer
+        filament_profile: Optional filament profile to embed
+    
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    return generate_3mf_set(material, brand, color, [(printer_model, print_profile)],
+                            temperature, layer_height, base_3mf, store, body_mesh,
+                            printer_profile, filament_profile)
+
+def generate_base_3mf(material, brand, color, printer_model=None, temperature=None, layer_height=None,
+                      store=None, body_mesh=None):
+    """Render only the base 3MF for a material, keeping it for later conversions.
+    
+    Returns:
+        Path: The base 3MF, or None on failure
+    """
+    try:
+        openscad_path = find_openscad()
+        if not openscad_path:
+            return None
+        params = render_params(material, brand, color, printer_model, temperature, layer_height)
+        if params is None:
+            return None
+        if body_mesh is None:
+            body_mesh = render_body_mesh(openscad_path, store)
+            if body_mesh is None:
+                return None
+        return render_base_3mf(openscad_path, params, store, body_mesh)
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        traceback.print_exc(file=sys.stderr)
+        return None
+
 def parse_args():
     """Parse command-line arguments."""
     parser = argparse.ArgumentParser(description='Generate 3MF swatch models')
-    parser.add_argument('--material', required=True, help='Material type (e.g., "PLA", "PETG")')
-    parser.add_argument('--brand', required=True, help='Brand name (e.g., "Prusament", "Generic")')
-    parser.add_argument('--color', required=True, help='Color name (e.g., "Galaxy Black", "Natural")')
-    parser.add_argument('--printer', required=True, help='Printer model (e.g., "MK4S", "MK3S+")')
+    parser.add_argument('--material', help='Material type (e.g., "PLA", "PETG")')
+    parser.add_argument('--brand', help='Brand name (e.g., "Prusament", "Generic")')
+    parser.add_argument('--color', help='Color name (e.g., "Galaxy Black", "Natural")')
+    parser.add_argument('--printer', help='Printer model (e.g., "MK4S", "MK3S+")')
     parser.add_argument('--profile', help='Print profile name (e.g., "0.20mm QUALITY MK4S")')
+    parser.add_argument('--printer-profile', help='Printer profile to embed (default: the --printer name, if it is one)')
+    parser.add_argument('--filament-profile', help='Filament profile to embed (e.g., "Prusament PLA")')
     parser.add_argument('--temperature', type=float, help='Optional temperature override')
     parser.add_argument('--layer-height', type=float, help='Optional layer height override')
+    parser.add_argument('--base-only', action='store_true',
+                        help='Only render the printer-independent base 3MF and print its path')
+    parser.add_argument('--base', type=Path,
+                        help='Convert this pre-rendered base 3MF instead of rendering one')
+    parser.add_argument('--body-only', action='store_true',
+                        help='Only render the material-independent swatch body mesh and print its path')
+    parser.add_argument('--body', type=Path,
+                        help='Cut the text out of this pre-rendered body mesh instead of rendering one')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always run OpenSCAD instead of using the artifact cache')
+    parser.add_argument('--cache-dir', type=Path, default=CACHE_DIR,
+                        help='Artifact store directory')
     
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.body_only:
+        return args
+    if not (args.material and args.brand and args.color):
+        parser.error("--material, --brand and --color are required unless --body-only is given")
+    if not args.base_only and not args.printer:
+        parser.error("--printer is required unless --base-only is given")
+    return args
 
 if __name__ == '__main__':
     args = parse_args()
+    store = None if args.no_cache else ArtifactStore(args.cache_dir)
+    
+    if args.body_only:
+        openscad_path = find_openscad()
+        body_mesh = render_body_mesh(openscad_path, store) if openscad_path else None
+        if body_mesh is None:
+            sys.exit(1)
+        print(body_mesh)
+        sys.exit(0)
+    
+    if args.base_only:
+        base_3mf = generate_base_3mf(
+            material=args.material,
+            brand=args.brand,
+            color=args.color,
+            printer_model=args.printer,
+            temperature=args.temperature,
+            layer_height=args.layer_height,
+            store=store,
+            body_mesh=args.body
+        )
+        if base_3mf is None:
+            sys.exit(1)
+        print(base_3mf)
+        sys.exit(0)
     
     if not generate_3mf(
         material=args.material,
@@ -337,6 +637,11 @@ if __name__ == '__main__':
         printer_model=args.printer,
         print_profile=args.profile,
         temperature=args.temperature,
-        layer_height=args.layer_height
+        layer_height=args.layer_height,
+        base_3mf=args.base,
+        store=store,
+        body_mesh=args.body,
+        printer_profile=args.printer_profile,
+        filament_profile=args.filament_profile
     ):
-        sys.exit(1) 
\ No newline at end of file
+        sys.exit(1)
@@ -2,9 +2,10 @@
 
 import sys
 import json
-import configparser
+import argparse
 from pathlib import Path
 import re
+from profile_index import load_profile_index, get_resolver
 
 SUPPORTED_PRINTERS = {
     'MK3S': '@MK3.5',  # MK3S uses MK3.5 profiles
@@ -15,9 +16,9 @@ SUPPORTED_PRINTERS = {
     'XLIS': '@XLIS'
 }
 
-def get_latest_config_file():
+def get_latest_config_file(profiles_dir=Path('slicer-profiles/PrusaResearch')):
     """Find the latest PrusaSlicer config file version."""
-    profiles_dir = Path('slicer-profiles/PrusaResearch')
+    profiles_dir = Path(profiles_dir)
     version_pattern = re.compile(r'(\d+\.\d+\.\d+)\.ini$')
     
     latest_version = None
@@ -66,41 +67,69 @@ def find_matching_sections(config, profile_name, printer=None):
 
 def get_inherited_value(config, section_name, key):
     """Get a value from a section, following inheritance."""
-    # Keep track of visited sections to avoid infinite recursion
-    visited = set()
+    return get_resolver(config).get(section_name, key)
+
+def resolve_filament_config(config, filament_profile, printer=None, verbose=True):
+    """Resolve filament configuration against an already loaded profile index.
+
+    Raises ValueError when the profile or its settings cannot be found.
+    """
+    log = (lambda *args: print(*args, file=sys.stderr)) if verbose else (lambda *args: None)
+
+    if printer and printer not in SUPPORTED_PRINTERS:
+        raise ValueError(f"Unsupported printer '{printer}' (supported: {', '.join(SUPPORTED_PRINTERS)})")
+    printer_suffix = SUPPORTED_PRINTERS[printer] if printer else None
+
+    # Find all matching sections
+    matching_sections = find_matching_sections(config, filament_profile, printer)
     
-    def _get_value(section):
-        if section in visited:
-            return None
-        visited.add(section)
+    if not matching_sections:
+        raise ValueError(f"No filament profiles found matching '{filament_profile}'")
         
-        # Get direct value
-        value = config[section].get(key)
-        if value is not None:
-            return value
-            
-        # Check inheritance
-        inherits = config[section].get('inherits')
-        if inherits:
-            # Split multiple inheritance (comma-separated)
-            for parent in inherits.split(';'):
-                parent = parent.strip()
-                # Handle wildcards in parent names
-                if parent.startswith('*') and parent.endswith('*'):
-                    parent_pattern = f'^filament:{parent}$'
-                else:
-                    parent_pattern = f'^filament:{re.escape(parent)}($|\\s@)'
-                
-                # Find all matching parent sections
-                for potential_parent in config.sections():
-                    if re.match(parent_pattern, potential_parent):
-                        value = _get_value(potential_parent)
-                        if value is not None:
-                            return value
+    if len(matching_sections) > 1:
+        log(f"Found multiple matching profiles:")
+        for section in matching_sections:
+            log(f"  - {section}")
+    
+    # Prefer printer-specific profile if available
+    if printer_suffix:
+        printer_specific = [s for s in matching_sections if printer_suffix in s]
+        if printer_specific:
+            section_name = min(printer_specific, key=len)
+        else:
+            section_name = min(matching_sections, key=len)
+    else:
+        section_name = min(matching_sections, key=len)
         
-        return None
+    log(f"Using profile: {section_name}")
     
-    return _get_value(section_name)
+    # Extract temperature setting (inherited values are pre-resolved in the index)
+    temp = config.get(section_name, 'temperature')
+    if temp is None:
+        raise ValueError(f"No temperature setting found in profile '{section_name}' or its inherited profiles")
+        
+    # Get first value if comma-separated
+    temp = temp.split(',')[0].strip()
+    
+    # Find matching print profile for layer height
+    print_profile = f"print:0.20mm QUALITY {printer_suffix}" if printer else "print:0.20mm QUALITY"
+    if print_profile in config:
+        layer_height = config[print_profile].get('layer_height', '0.2')
+        log(f"Using layer height from profile {print_profile}: {layer_height}")
+    else:
+        layer_height = '0.2'  # Default to 0.2mm if profile not found
+        log(f"Print profile {print_profile} not found, using default layer height: {layer_height}")
+    
+    material_config = {
+        'temperature': temp,
+        'layer_height': layer_height
+    }
+    
+    log("Material configuration:")
+    for key, value in material_config.items():
+        log(f"  {key} = {value}")
+        
+    return material_config
 
 def get_filament_config(filament_profile, printer=None):
     """Get filament configuration from PrusaSlicer official profiles."""
@@ -110,77 +139,86 @@ def get_filament_config(filament_profile, printer=None):
         if config_file is None:
             return None
             
-        # Read the config file
-        config = configparser.ConfigParser()
-        config.read(config_file)
-        
-        # Find all matching sections
-        matching_sections = find_matching_sections(config, filament_profile, printer)
+        # Load the compiled profile index (inheritance already flattened)
+        config = load_profile_index(config_file)
         
-        if not matching_sections:
-            print(f"Error: No filament profiles found matching '{filament_profile}'", file=sys.stderr)
-            return None
-            
-        if len(matching_sections) > 1:
-            print(f"Found multiple matching profiles:", file=sys.stderr)
-            for section in matching_sections:
-                print(f"  - {section}", file=sys.stderr)
-        
-        # Prefer printer-specific profile if available
-        if printer and printer in SUPPORTED_PRINTERS:
-            printer_suffix = SUPPORTED_PRINTERS[printer]
-            printer_specific = [s for s in matching_sections if printer_suffix in s]
-            if printer_specific:
-                section_name = min(printer_specific, key=len)
-            else:
-                section_name = min(matching_sections, key=len)
-        else:
-            section_name = min(matching_sections, key=len)
-            
-        print(f"Using profile: {section_name}", file=sys.stderr)
-        
-        # Extract temperature setting with inheritance
-        temp = get_inherited_value(config, section_name, 'temperature')
-        if temp is None:
-            print(f"Error: No temperature setting found in profile '{section_name}' or its inherited profiles", file=sys.stderr)
-            return None
-            
-        # Get first value if comma-separated
-        temp = temp.split(',')[0].strip()
-        
-        # Find matching print profile for layer height
-        print_profile = f"print:0.20mm QUALITY {printer_suffix}" if printer else "print:0.20mm QUALITY"
-        if print_profile in config:
-            layer_height = config[print_profile].get('layer_height', '0.2')
-            print(f"Using layer height from profile {print_profile}: {layer_height}", file=sys.stderr)
-        else:
-            layer_height = '0.2'  # Default to 0.2mm if profile not found
-            print(f"Print profile {print_profile} not found, using default layer height: {layer_height}", file=sys.stderr)
-        
-        material_config = {
-            'temperature': temp,
-            'layer_height': layer_height
-        }
-        
-        print("Material configuration:", file=sys.stderr)
-        for key, value in material_config.items():
-            print(f"  {key} = {value}", file=sys.stderr)
-            
-        return material_config
+        return resolve_filament_config(config, filament_profile, printer)
             
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         return None
 
+def resolve_batch(requests, output, config_file=None):
+    """Resolve JSONL requests against one loaded bundle, streaming JSONL results.
+
+    Each request line is an object with `filament_profile` and optional
+    `printer` and `id`. Each result echoes the request and carries either
+    `config` or `error`. Returns the number of failed requests.
+    """
+    config_file = config_file or get_latest_config_file()
+    if config_file is None:
+        raise FileNotFoundError("No PrusaSlicer config file found")
+    config = load_profile_index(config_file)
+
+    failures = 0
+    for line_number, line in enumerate(requests, 1):
+        line = line.strip()
+        if not line:
+            continue
+
+        result = {'line': line_number}
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict) or 'filament_profile' not in request:
+                raise ValueError("Request must be an object with a 'filament_profile' field")
+            result.update({k: request[k] for k in ('id', 'filament_profile', 'printer') if k in request})
+            if not isinstance(request['filament_profile'], str):
+                raise ValueError("'filament_profile' must be a string")
+            if request.get('printer') is not None and not isinstance(request['printer'], str):
+                raise ValueError("'printer' must be a string")
+            result['config'] = resolve_filament_config(
+                config, request['filament_profile'], request.get('printer'), verbose=False)
+        except (ValueError, KeyError) as e:
+            result['error'] = str(e)
+            failures += 1
+
+        output.write(json.dumps(result) + '\n')
+        output.flush()
+
+    return failures
+
+def parse_args():
+    """Parse command-line arguments."""
+    parser = argparse.ArgumentParser(
+        description='Resolve filament settings from PrusaSlicer official profiles',
+        epilog=f"Supported printers: {', '.join(SUPPORTED_PRINTERS)}")
+    parser.add_argument('filament_profile', nargs='?', help='Filament profile name (e.g., "Generic PLA")')
+    parser.add_argument('printer', nargs='?', help='Printer (e.g., "MK4S")')
+    parser.add_argument('--batch', nargs='?', const='-', metavar='FILE',
+                      help='Resolve JSONL requests from FILE (default: stdin) and write JSONL results to stdout')
+    args = parser.parse_args()
+
+    if not args.batch and not args.filament_profile:
+        parser.error("a filament profile or --batch is required")
+    return args
+
 if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print("Usage: get_material_config.py <filament_profile> [printer]", file=sys.stderr)
-        print("Supported printers:", ", ".join(SUPPORTED_PRINTERS.keys()), file=sys.stderr)
-        sys.exit(1)
+    args = parse_args()
+
+    if args.batch:
+        try:
+            if args.batch == '-':
+                failures = resolve_batch(sys.stdin, sys.stdout)
+            else:
+                with open(args.batch) as f:
+                    failures = resolve_batch(f, sys.stdout)
+        except OSError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        sys.exit(1 if failures else 0)
     
-    printer = sys.argv[2] if len(sys.argv) > 2 else None
-    config = get_filament_config(sys.argv[1], printer)
+    config = get_filament_config(args.filament_profile, args.printer)
     if config:
         print(json.dumps(config))
     else:
-        sys.exit(1) 
\ No newline at end of file
+        sys.exit(1)
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+from artifact_cache import ArtifactStore, CACHE_DIR, cache_key, scad_sources_hash, submodule_revision, tool_version
+from tracing import traced_run
+
+# Where cached label meshes are materialized for OpenSCAD to import
+LABEL_DIR = Path("output/3mf/base/labels")
+SWATCH_SCAD = Path("swatch/swatch.scad")
+LABEL_MESH_SCAD = Path("swatch/common/label_mesh.scad")
+
+# One token of an echoed OpenSCAD value
+SCAD_TOKEN = re.compile(r'\s*(?:"((?:[^"\\]|\\.)*)"|([-+]?(?:inf|nan|(?:\d+\.?\d*|\.\d+)(?:e[-+]?\d+)?))'
+                        r'|(true|false|undef)|([\[\],]))')
+SCAD_ESCAPES = {'n': "\n", 't': "\t", 'r': "\r"}
+SCAD_CONSTANTS = {'true': True, 'false': False, 'undef': None}
+
+def parse_scad_value(text: str):
+    """Parse a value as OpenSCAD's echo() prints it: strings, numbers, booleans, undef and vectors."""
+    tokens = []
+    pos = 0
+    while text[pos:].strip():
+        match = SCAD_TOKEN.match(text, pos)
+        if not match:
+            raise ValueError(f"Unexpected {text[pos:].strip()[:20]!r}")
+        tokens.append(match)
+        pos = match.end()
+
+    def _value(i):
+        if i >= len(tokens):
+            raise ValueError("Unexpected end of value")
+        string, number, constant, punct = tokens[i].groups()
+        if string is not None:
+            return re.sub(r'\\(.)', lambda m: SCAD_ESCAPES.get(m.group(1), m.group(1)), string), i + 1
+        if number is not None:
+            return float(number), i + 1
+        if constant is not None:
+            return SCAD_CONSTANTS[constant], i + 1
+        if punct != '[':
+            raise ValueError(f"Unexpected {punct!r}")
+        items = []
+        i += 1
+        while i < len(tokens) and tokens[i].group(4) != ']':
+            item, i = _value(i)
+            items.append(item)
+            if i < len(tokens) and tokens[i].group(4) == ',':
+                i += 1
+        if i >= len(tokens):
+            raise ValueError("Unterminated vector")
+        return items, i + 1
+
+    value, end = _value(0)
+    if end != len(tokens):
+        raise ValueError("Trailing tokens after value")
+    return value
+
+def format_scad_value(value) -> str:
+    """Write a parsed value as an OpenSCAD literal that evaluates to the same value."""
+    if value is None:
+        return "undef"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(int(value)) if float(value).is_integer() else repr(float(value))
+    if isinstance(value, str):
+        return json.dumps(value, ensure_ascii=False)
+    return "[" + ", ".join(format_scad_value(v) for v in value) + "]"
+
+def parse_label_echoes(output: str) -> Dict[str, list]:
+    """Extract label keys and arguments from the ECHO lines of a LABEL_COLLECT pass.
+
+    label.scad only echoes labels whose numbers echo() prints exactly, so the
+    arguments render the same mesh when passed back to OpenSCAD.
+    """
+    labels = {}
+    for line in output.splitlines():
+        if not line.startswith('ECHO: "LABEL", '):
+            continue
+        try:
+            _, key, args = parse_scad_value(f"[{line[len('ECHO: '):]}]")
+        except ValueError:
+            print(f"Warning: Could not parse label echo: {line}", file=sys.stderr)
+            continue
+        labels[key] = args
+    return labels
+
+def collect_labels(openscad_path, defines: List[str]) -> Optional[Dict[str, list]]:
+    """Evaluate swatch.scad without rendering and return the labels it would extrude."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        echo_file = Path(tmp_dir) / "labels.echo"
+        cmd = [str(openscad_path), "-o", str(echo_file), str(SWATCH_SCAD.resolve()),
+               "-D", "LABEL_COLLECT=true"] + defines
+        result = traced_run(cmd, name="openscad-labels")
+        if result.returncode != 0 or not echo_file.exists():
+            print(f"Error collecting labels: {result.stderr}", file=sys.stderr)
+            return None
+        return parse_label_echoes(echo_file.read_text())
+
+def label_cache_key(openscad_path, args: list) -> str:
+    """Return the content address of a label mesh."""
+    return cache_key(
+        stage="openscad-label",
+        args=args,
+        sources=scad_sources_hash(),
+        bosl2=submodule_revision("BOSL2"),
+        tool=tool_version(openscad_path),
+    )
+
+def render_label_mesh(openscad_path, args: list, dest: Path) -> bool:
+    """Extrude one label to STL."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    # Concurrent renders may import this path, so only move complete meshes into place
+    tmp_dest = dest.with_name(f".{dest.stem}.{os.getpid()}.stl")
+    cmd = [str(openscad_path), "-o", str(tmp_dest), "--export-format", "binstl",
+           str(LABEL_MESH_SCAD.resolve()), "-D", f"LABEL_ARGS={format_scad_value(args)}"]
+    result = traced_run(cmd, name="openscad-label", outputs=[tmp_dest])
+    if result.returncode != 0 or not tmp_dest.exists():
+        print(f"Error extruding label {args[0]!r}: {result.stderr}", file=sys.stderr)
+        tmp_dest.unlink(missing_ok=True)
+        return False
+    os.replace(tmp_dest, dest)
+    return True
+
+def prepare_labels(openscad_path, defines: List[str], store: ArtifactStore,
+                   label_dir: Path = LABEL_DIR) -> List[str]:
+    """Make sure every label of a render has a mesh and return the -D LABEL_CACHE argument.
+
+    Meshes are served from label_dir or the artifact store and only extruded
+    when neither has them. Labels that fail to extrude are left out, so the
+    render falls back to text3d() for them.
+    """
+    labels = collect_labels(openscad_path, defines)
+    if not labels:
+        return []
+
+    entries = []
+    for key, args in labels.items():
+        mesh_key = label_cache_key(openscad_path, args)
+        mesh = label_dir / f"{mesh_key[:16]}.stl"
+        if not mesh.exists() and not store.fetch(mesh_key, mesh, label="openscad-label"):
+            if not render_label_mesh(openscad_path, args, mesh):
+                continue
+            store.store(mesh_key, mesh, label="openscad-label")
+        entries.append([key, mesh.resolve().as_posix()])
+
+    print(f"Using {len(entries)}/{len(labels)} cached label meshes", file=sys.stderr)
+    return ["-D", f"LABEL_CACHE={json.dumps(entries)}"]
+
+def main():
+    parser = argparse.ArgumentParser(description='Pre-extrude the text labels of a swatch')
+    parser.add_argument('--material', required=True, help='Material type (e.g., "PLA", "PETG")')
+    parser.add_argument('--brand', required=True, help='Brand name (e.g., "Prusament", "Generic")')
+    parser.add_argument('--color', required=True, help='Color name (e.g., "Galaxy Black", "Natural")')
+    parser.add_argument('--cache-dir', type=Path, default=CACHE_DIR, help='Artifact store directory')
+    args = parser.parse_args()
+
+    from generate_3mf import find_openscad
+    openscad_path = find_openscad()
+    if not openscad_path:
+        return 1
+    defines = ["-D", f'MATERIAL="{args.material}"', "-D", f'BRAND="{args.brand}"', "-D", f'COLOR="{args.color}"']
+    label_define = prepare_labels(openscad_path, defines, ArtifactStore(args.cache_dir))
+    if not label_define:
+        return 1
+    for key, path in json.loads(label_define[1][len("LABEL_CACHE="):]):
+        print(f"{path}\t{key}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
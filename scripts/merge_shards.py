@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from build_matrix import MANIFEST
+
+def target_name(target: Dict) -> str:
+    """Name a target by the matrix cell it stands for."""
+    return f"{target['brand']} {target['material']} {target['color']} / {target['printer']} / {target['print_profile']}"
+
+def merge_manifests(manifests: List[Dict], check_files: bool = False) -> Tuple[Dict, List[str]]:
+    """Check that shard manifests are complete and non-overlapping, and merge them.
+
+    Every shard of one partition must be present exactly once, every target
+    must come from exactly one shard and be built, and together the shards
+    must cover the whole matrix.
+
+    Returns:
+        The release manifest, and the problems found (empty when it is valid)
+    """
+    if not manifests:
+        return {}, ["No shard manifests"]
+    if any('shard' not in m for m in manifests):
+        return {}, ["Not a shard manifest (built without --shard)"]
+
+    errors = []
+    shards = [m['shard'] for m in manifests]
+    count = shards[0]['count']
+    if any(s['count'] != count for s in shards):
+        errors.append(f"Shard counts differ: {sorted({s['count'] for s in shards})}")
+    if len({s['partition'] for s in shards}) > 1:
+        errors.append("Shards were partitioned differently; give every shard the same --shard-history")
+    if len({s['total_targets'] for s in shards}) > 1:
+        errors.append("Shards expanded different matrices (materials, printers or profiles differ)")
+
+    indexes = [s['index'] for s in shards]
+    for index in sorted(set(indexes)):
+        if indexes.count(index) > 1:
+            errors.append(f"Shard {index}/{count} given {indexes.count(index)} times")
+    for index in range(1, count + 1):
+        if index not in indexes:
+            errors.append(f"Shard {index}/{count} missing")
+
+    targets = []
+    owners = {}
+    class_shards = {}
+    for manifest in manifests:
+        index = manifest['shard']['index']
+        if len(manifest['targets']) != manifest['shard']['targets']:
+            errors.append(f"Shard {index}/{count} lists {len(manifest['targets'])} of its "
+                          f"{manifest['shard']['targets']} targets")
+        for target in manifest['targets']:
+            name = target_name(target)
+            if name in owners:
+                errors.append(f"{name} built by shards {owners[name]} and {index}")
+                continue
+            owners[name] = index
+            class_shards.setdefault(target['class'], set()).add(index)
+            targets.append(target)
+            if target['status'] != "done":
+                errors.append(f"{name}: {target['status']}")
+            elif check_files:
+                for key in ('3mf', 'gcode'):
+                    if not Path(target[key]).exists():
+                        errors.append(f"{name}: {target[key]} not found")
+
+    for target_class, indexes in sorted(class_shards.items()):
+        if len(indexes) > 1:
+            errors.append(f"Class {target_class} split over shards {sorted(indexes)}")
+    total = shards[0]['total_targets']
+    if len(targets) != total:
+        errors.append(f"{len(targets)} of {total} targets built")
+
+    merged = {
+        'classes': len(class_shards),
+        'shards': count,
+        'targets': sorted(targets, key=target_name),
+    }
+    return merged, errors
+
+def main():
+    parser = argparse.ArgumentParser(description='Check and merge the manifests of a sharded build')
+    parser.add_argument('manifests', type=Path, nargs='*',
+                      help='Shard manifests (default: output/manifest.shard-*.json)')
+    parser.add_argument('--output', type=Path, default=MANIFEST, help='Release manifest to write')
+    parser.add_argument('--check-files', action='store_true',
+                      help='Also check that every target\'s 3MF and G-code exist')
+    args = parser.parse_args()
+
+    paths = args.manifests or sorted(MANIFEST.parent.glob("manifest.shard-*.json"))
+    manifests = []
+    for path in paths:
+        try:
+            with open(path) as f:
+                manifests.append(json.load(f))
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Error reading {path}: {e}", file=sys.stderr)
+            return 1
+
+    merged, errors = merge_manifests(manifests, args.check_files)
+    if errors:
+        print(f"❌ {len(paths)} shard manifests do not merge:", file=sys.stderr)
+        for error in errors:
+            print(f"  - {error}", file=sys.stderr)
+        return 1
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(merged, f, indent=2)
+    print(f"✅ Merged {merged['shards']} shards: {len(merged['targets'])} targets in "
+          f"{merged['classes']} classes, written to {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import sys
+import xml.etree.ElementTree as ET
+import zipfile
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+from threemf import MODEL_ENTRY
+from validate import CORE_NS, SLIC3R_NS
+
+# Triangles with a smaller area (mm^2) are degenerate
+AREA_EPSILON = 1e-12
+
+class MeshReport:
+    """Integrity counts for one mesh object."""
+    def __init__(self, object_id: str, vertices: int, triangles: int):
+        self.object_id = object_id
+        self.vertices = vertices
+        self.triangles = triangles
+        self.bad_indices = 0
+        self.degenerate = 0
+        self.duplicate = 0
+        self.boundary_edges = 0
+        self.nonmanifold_edges = 0
+        self.inconsistent_edges = 0
+
+    @property
+    def watertight(self) -> bool:
+        return self.boundary_edges == 0
+
+    @property
+    def manifold(self) -> bool:
+        return self.nonmanifold_edges == 0
+
+    def errors(self) -> List[str]:
+        """Describe every problem found in the mesh."""
+        checks = [
+            (self.triangles == 0, "has no triangles"),
+            (self.bad_indices, f"{self.bad_indices} triangles reference missing vertices"),
+            (self.degenerate, f"{self.degenerate} degenerate triangles"),
+            (self.duplicate, f"{self.duplicate} duplicate triangles"),
+            (self.boundary_edges, f"{self.boundary_edges} open edges (not watertight)"),
+            (self.nonmanifold_edges, f"{self.nonmanifold_edges} non-manifold edges"),
+            (self.inconsistent_edges, f"{self.inconsistent_edges} edges with inconsistent winding"),
+        ]
+        return [f"Object {self.object_id}: {message}" for failed, message in checks if failed]
+
+    def to_dict(self) -> Dict:
+        return {
+            'object_id': self.object_id,
+            'vertices': self.vertices,
+            'triangles': self.triangles,
+            'bad_indices': self.bad_indices,
+            'degenerate': self.degenerate,
+            'duplicate': self.duplicate,
+            'boundary_edges': self.boundary_edges,
+            'nonmanifold_edges': self.nonmanifold_edges,
+            'inconsistent_edges': self.inconsistent_edges,
+        }
+
+def load_meshes(source, skip_modifiers: bool = False) -> Dict[str, tuple]:
+    """Read every object mesh of a 3MF model into (vertices, triangles) arrays.
+
+    Vertices are float64 (n, 3) and triangles int64 (m, 3). Like
+    validate.visit_model(), each element is detached from its parent once
+    closed, so only the arrays are kept in memory. With skip_modifiers,
+    PrusaSlicer modifier volumes are left out.
+    """
+    meshes = {}
+    object_id = None
+    skipping = False
+    vertices = []
+    triangles = []
+    elements = []
+    for event, element in ET.iterparse(source, events=('start', 'end')):
+        tag = element.tag
+        if event == 'start':
+            if tag == CORE_NS + 'object':
+                object_id = element.get('id', str(len(meshes) + 1))
+                skipping = skip_modifiers and element.get(SLIC3R_NS + 'modifier') == '1'
+                vertices, triangles = [], []
+            elements.append(element)
+            continue
+
+        elements.pop()
+        if skipping:
+            pass  # Modifier volume
+        elif tag == CORE_NS + 'vertex':
+            vertices.extend((element.get('x'), element.get('y'), element.get('z')))
+        elif tag == CORE_NS + 'triangle':
+            triangles.extend((element.get('v1'), element.get('v2'), element.get('v3')))
+        elif tag == CORE_NS + 'mesh':
+            meshes[object_id] = (
+                np.array(vertices, dtype=np.float64).reshape(-1, 3),
+                np.array(triangles, dtype=np.int64).reshape(-1, 3),
+            )
+            vertices, triangles = [], []
+        element.clear()
+        if elements:
+            elements[-1].remove(element)
+    return meshes
+
+def check_mesh(object_id: str, vertices: np.ndarray, triangles: np.ndarray) -> MeshReport:
+    """Run every integrity check on one mesh in a single batched pass."""
+    report = MeshReport(object_id, len(vertices), len(triangles))
+    if len(triangles) == 0:
+        return report
+
+    # Out-of-range indices make every other check meaningless for those triangles
+    in_range = np.all((triangles >= 0) & (triangles < len(vertices)), axis=1)
+    report.bad_indices = int(np.count_nonzero(~in_range))
+    triangles = triangles[in_range]
+
+    # Degenerate: repeated vertex indices or (near) zero area
+    a, b, c = (vertices[triangles[:, i]] for i in range(3))
+    area2 = np.linalg.norm(np.cross(b - a, c - a), axis=1)
+    repeated = ((triangles[:, 0] == triangles[:, 1]) | (triangles[:, 1] == triangles[:, 2])
+                | (triangles[:, 0] == triangles[:, 2]))
+    report.degenerate = int(np.count_nonzero(repeated | (area2 <= 2 * AREA_EPSILON)))
+
+    # Duplicates: the same vertex set regardless of order or winding
+    _, counts = np.unique(np.sort(triangles, axis=1), axis=0, return_counts=True)
+    report.duplicate = int(np.sum(counts[counts > 1] - 1))
+
+    # Edges, each encoded as one int64 so counting is a single np.unique
+    n = np.int64(max(len(vertices), 1))
+    start = triangles.reshape(-1)
+    end = triangles[:, [1, 2, 0]].reshape(-1)
+    directed = start * n + end
+    undirected = np.minimum(start, end) * n + np.maximum(start, end)
+
+    edges, edge_counts = np.unique(undirected, return_counts=True)
+    report.boundary_edges = int(np.count_nonzero(edge_counts == 1))
+    report.nonmanifold_edges = int(np.count_nonzero(edge_counts > 2))
+
+    # Consistent winding: the two faces of a manifold edge traverse it in opposite directions
+    directed_edges, directed_counts = np.unique(directed, return_counts=True)
+    repeated_directed = directed_edges[directed_counts > 1]
+    repeated_undirected = np.unique(np.minimum(repeated_directed // n, repeated_directed % n) * n
+                                    + np.maximum(repeated_directed // n, repeated_directed % n))
+    manifold_edges = edges[edge_counts == 2]
+    report.inconsistent_edges = int(np.count_nonzero(np.isin(manifold_edges, repeated_undirected)))
+    return report
+
+def check_3mf(path: Path) -> List[MeshReport]:
+    """Check every mesh object in a 3MF file."""
+    with zipfile.ZipFile(path) as archive:
+        with archive.open(MODEL_ENTRY) as model:
+            meshes = load_meshes(model)
+    return [check_mesh(object_id, vertices, triangles) for object_id, (vertices, triangles) in meshes.items()]
+
+def mesh_errors(path: Path) -> List[str]:
+    """Return every mesh problem in a 3MF file, or a single error if it cannot be read."""
+    try:
+        reports = check_3mf(path)
+    except (OSError, KeyError, zipfile.BadZipFile, ET.ParseError, ValueError) as e:
+        return [f"Could not read meshes from {path}: {e}"]
+    return report_errors(reports)
+
+def report_errors(reports: List[MeshReport]) -> List[str]:
+    """Collect the errors of every mesh report."""
+    if not reports:
+        return ["No meshes found"]
+    errors = []
+    for report in reports:
+        errors.extend(report.errors())
+    return errors
+
+def main():
+    parser = argparse.ArgumentParser(description='Check 3MF meshes for manifoldness, watertightness and winding')
+    parser.add_argument('files', type=Path, nargs='+', help='3MF files to check')
+    parser.add_argument('--json', action='store_true', help='Print the per-object counts as JSON lines')
+    args = parser.parse_args()
+
+    failed = 0
+    for path in args.files:
+        try:
+            reports = check_3mf(path)
+            errors = report_errors(reports)
+        except (OSError, KeyError, zipfile.BadZipFile, ET.ParseError, ValueError) as e:
+            reports = []
+            errors = [f"Could not read meshes from {path}: {e}"]
+
+        if args.json:
+            print(json.dumps({'file': str(path), 'errors': errors, 'objects': [r.to_dict() for r in reports]}))
+        elif errors:
+            print(f"❌ {path}")
+            for error in errors:
+                print(f"  - {error}")
+        else:
+            print(f"✅ {path}")
+        failed += bool(errors)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,9 +7,20 @@ import shutil
 import subprocess
 import sys
 import platform
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Set, Tuple
 from enum import Enum, auto
+from xml.etree.ElementTree import ParseError
+from artifact_cache import (ArtifactStore, cache_key, hash_file, hash_path, scad_sources_hash,
+                            submodule_revision, tool_version)
+from threemf import MODEL_ENTRY, check_xml_entry, repackage_3mf
+from conformance import check_3mf_conformance
+from mesh_check import mesh_errors
+from run_ledger import LEDGER_FILE, RunLedger
+from tracing import TRACE_FILE, configure, export_chrome_trace, span, traced_run
 
 def find_openscad():
     """Find OpenSCAD executable with preference for nightly builds."""
@@ -161,6 +172,49 @@ class PipelineStage(Enum):
     MODIFIER = auto()
     VALIDATION = auto()
 
+# Stage dependency graph: the SwatchPipeline method running each stage, and the
+# stages whose outputs it takes as arguments (in order)
+STAGE_GRAPH: Dict[PipelineStage, Tuple[str, Tuple[PipelineStage, ...]]] = {
+    PipelineStage.BASE_MODEL: ("generate_base_model", ()),
+    PipelineStage.MODEL_FILE: ("create_model_file", (PipelineStage.BASE_MODEL,)),
+    PipelineStage.METADATA: ("generate_metadata", ()),
+    PipelineStage.BASE_3MF: ("assemble_base_3mf", (PipelineStage.MODEL_FILE, PipelineStage.METADATA)),
+    PipelineStage.MODIFIER: ("add_modifier", (PipelineStage.BASE_3MF,)),
+    PipelineStage.VALIDATION: ("validate_final_model", (PipelineStage.MODIFIER,)),
+}
+
+# Config keys each stage reads (including those naming its output file)
+STAGE_CONFIG_KEYS: Dict[PipelineStage, Tuple[str, ...]] = {
+    PipelineStage.BASE_MODEL: ("material", "brand", "color", "nozzle_temp"),
+    PipelineStage.MODEL_FILE: (),
+    PipelineStage.METADATA: ("material", "brand", "color", "nozzle_temp"),
+    PipelineStage.BASE_3MF: ("material", "brand", "color"),
+    PipelineStage.MODIFIER: ("material", "brand", "color"),
+    PipelineStage.VALIDATION: ("material", "brand", "color"),
+}
+
+# Scripts implementing each stage, relative to this file
+STAGE_SCRIPTS: Dict[PipelineStage, Tuple[str, ...]] = {
+    PipelineStage.BASE_MODEL: (),
+    PipelineStage.MODEL_FILE: ("threemf.py",),
+    PipelineStage.METADATA: (),
+    PipelineStage.BASE_3MF: ("threemf.py",),
+    PipelineStage.MODIFIER: ("modify_3mf.py",),
+    PipelineStage.VALIDATION: ("mesh_check.py", "conformance.py"),
+}
+
+def stage_descendants(stage: PipelineStage) -> Set[PipelineStage]:
+    """Return a stage and every stage that depends on it, directly or transitively."""
+    found = {stage}
+    changed = True
+    while changed:
+        changed = False
+        for child, (_, inputs) in STAGE_GRAPH.items():
+            if child not in found and found.intersection(inputs):
+                found.add(child)
+                changed = True
+    return found
+
 class StageStatus:
     """Track status and outputs of a pipeline stage."""
     def __init__(self, stage: PipelineStage):
@@ -168,15 +222,30 @@ class StageStatus:
         self.completed = False
         self.output_file = None
         self.timestamp = None
+        self.fingerprint = None
+
+def job_name(config: Dict) -> str:
+    """Name a swatch's pipeline run in the ledger."""
+    return f"{config['material']}_{config['brand']}_{config['color']}"
 
 class SwatchPipeline:
-    def __init__(self, config: Dict, work_dir: Optional[Path] = None):
-        """Initialize the pipeline with configuration."""
+    def __init__(self, config: Dict, work_dir: Optional[Path] = None, store: Optional[ArtifactStore] = None,
+                 ledger: Optional[RunLedger] = None, run_id: Optional[int] = None,
+                 validation_dir: Optional[Path] = None, resume: bool = True):
+        """Initialize the pipeline with configuration.
+
+        Stage outputs are written under validation_dir. With resume, stages
+        recorded as done in the run ledger are restored instead of rerun.
+        """
         self.config = config
+        self.store = store
         self.work_dir = Path(work_dir) if work_dir else Path("tests/tmp")
-        self.validation_dir = Path("tests/validation")
+        self.validation_dir = Path(validation_dir) if validation_dir else Path("tests/validation")
         self.fixtures_dir = Path("tests/fixtures")
-        self.checkpoint_file = self.work_dir / "checkpoint.json"
+        self.ledger = ledger or RunLedger()
+        self.run_id = run_id
+        self.job = job_name(config)
+        self.fingerprints = {}  # Input fingerprints of the stages in this run
         
         # Find required executables
         self.openscad_path = find_openscad()
@@ -206,58 +275,67 @@ class SwatchPipeline:
         for subdir in ["base", "modifier", "pipeline"]:
             (self.validation_dir / subdir).mkdir(exist_ok=True)
             
-        # Load checkpoint if exists
-        self.load_checkpoint()
-
-    def save_checkpoint(self):
-        """Save current pipeline state to checkpoint file."""
-        checkpoint = {
-            "config": self.config,
-            "stages": {
-                stage.name: {
-                    "completed": status.completed,
-                    "output_file": str(status.output_file) if status.output_file else None,
-                    "timestamp": status.timestamp
-                }
-                for stage, status in self.stages.items()
-            }
-        }
-        with open(self.checkpoint_file, 'w') as f:
-            json.dump(checkpoint, f, indent=2)
+        # Record the job so a later run can resume it, then load its checkpoint
+        self.ledger.register_job(self.job, self.config, run_id)
+        if resume:
+            self.load_checkpoint()
+
+    def save_checkpoint(self, stage: PipelineStage):
+        """Record a completed stage in the run ledger."""
+        status = self.stages[stage]
+        self.ledger.record(self.job, stage.name, "done", fingerprint=status.fingerprint,
+                           artifact=status.output_file, exit_status=0, run_id=self.run_id)
 
     def load_checkpoint(self):
-        """Load pipeline state from checkpoint file if it exists."""
-        if not self.checkpoint_file.exists():
-            return
-            
-        try:
-            with open(self.checkpoint_file) as f:
-                checkpoint = json.load(f)
-                
-            # Verify config matches
-            if checkpoint["config"] != self.config:
-                print("Warning: Checkpoint config differs from current config, ignoring checkpoint")
-                return
-                
-            # Restore stage status
-            for stage_name, stage_data in checkpoint["stages"].items():
-                stage = PipelineStage[stage_name]
-                self.stages[stage].completed = stage_data["completed"]
-                self.stages[stage].output_file = Path(stage_data["output_file"]) if stage_data["output_file"] else None
-                self.stages[stage].timestamp = stage_data["timestamp"]
-                
-            print("Restored pipeline state from checkpoint")
-        except Exception as e:
-            print(f"Warning: Failed to load checkpoint: {e}")
+        """Restore the stage states recorded in the run ledger."""
+        recorded = self.ledger.stages(self.job)
+        for stage_name, row in recorded.items():
+            if stage_name not in PipelineStage.__members__:
+                continue
+            # Fingerprints decide which completed stages are still valid
+            status = self.stages[PipelineStage[stage_name]]
+            status.completed = row["status"] == "done"
+            status.output_file = Path(row["artifact"]) if row["artifact"] else None
+            status.timestamp = row["finished"]
+            status.fingerprint = row["fingerprint"]
+        if recorded:
+            print(f"Restored {self.job} from the run ledger")
+
+    def stage_fingerprint(self, stage: PipelineStage, upstream: Dict[PipelineStage, Path],
+                          deep_check: bool = False) -> str:
+        """Fingerprint a stage's exact inputs: config subset, upstream outputs, sources and tools."""
+        _, inputs = STAGE_GRAPH[stage]
+        scripts_dir = Path(__file__).parent
+        parts = {
+            'stage': stage.name,
+            'config': {key: self.config.get(key) for key in STAGE_CONFIG_KEYS[stage]},
+            'inputs': {s.name: hash_path(upstream[s]) if upstream[s] and Path(upstream[s]).exists() else None
+                       for s in inputs},
+            # A missing script fingerprints as None; the stage itself then reports the error
+            'scripts': {name: hash_file(scripts_dir / name) if (scripts_dir / name).exists() else None
+                        for name in STAGE_SCRIPTS[stage]},
+        }
+        if stage == PipelineStage.BASE_MODEL:
+            parts.update(sources=scad_sources_hash(), bosl2=submodule_revision("BOSL2"),
+                         tool=tool_version(self.openscad_path))
+        elif stage == PipelineStage.VALIDATION:
+            # The dimensional check reads its targets from the .scad sources
+            parts.update(sources=scad_sources_hash(), deep_check=deep_check,
+                         tool=tool_version(self.prusaslicer_path) if deep_check else None)
+        return cache_key(**parts)
 
     def should_run_stage(self, stage: PipelineStage, force: bool = False) -> bool:
-        """Determine if a stage should be run based on checkpoint state."""
+        """Determine if a stage should be run based on checkpoint state and input fingerprint."""
         if force:
             return True
             
         status = self.stages[stage]
         if not status.completed:
             return True
+
+        if status.fingerprint is None or status.fingerprint != self.fingerprints.get(stage):
+            print(f"{stage.name} inputs changed")
+            return True
             
         if status.output_file and not status.output_file.exists():
             return True
@@ -266,11 +344,35 @@ class SwatchPipeline:
 
     def mark_stage_complete(self, stage: PipelineStage, output_file: Optional[Path] = None):
         """Mark a stage as complete and save checkpoint."""
-        import time
         self.stages[stage].completed = True
         self.stages[stage].output_file = output_file
         self.stages[stage].timestamp = time.time()
-        self.save_checkpoint()
+        self.stages[stage].fingerprint = self.fingerprints.get(stage)
+        self.save_checkpoint(stage)
+
+    def run_stage(self, stage: PipelineStage, upstream: Dict[PipelineStage, Path],
+                  force: bool = False, deep_check: bool = False):
+        """Run one stage on the outputs of the stages it depends on."""
+        method, inputs = STAGE_GRAPH[stage]
+        self.fingerprints[stage] = self.stage_fingerprint(stage, upstream, deep_check)
+        options = {'deep_check': deep_check} if stage == PipelineStage.VALIDATION else {}
+
+        # Record how the stage ended; a stage skipped on its checkpoint keeps its earlier record
+        completed_at = self.stages[stage].timestamp
+        start = time.time()
+        try:
+            result = getattr(self, method)(*(upstream[s] for s in inputs), force=force, **options)
+        except Exception as e:
+            self.ledger.record(self.job, stage.name, "failed", duration=time.time() - start,
+                               exit_status=1, message=str(e), run_id=self.run_id)
+            raise
+        if result is False:
+            self.ledger.record(self.job, stage.name, "failed", duration=time.time() - start,
+                               exit_status=1, message="validation failed", run_id=self.run_id)
+        elif self.stages[stage].timestamp != completed_at:
+            self.ledger.record(self.job, stage.name, "done", duration=time.time() - start,
+                               run_id=self.run_id)
+        return result
 
     def generate_base_model(self, force: bool = False) -> Path:
         """Phase 1, Stage 1: Generate base 3D model using OpenSCAD."""
@@ -301,7 +403,22 @@ class SwatchPipeline:
             "-D", f"NOZZLE_TEMP={self.config['nozzle_temp']}"
         ]
         
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        # Consult the artifact store before launching OpenSCAD
+        key = None
+        if self.store is not None:
+            key = cache_key(
+                stage="openscad",
+                sources=scad_sources_hash(),
+                bosl2=submodule_revision("BOSL2"),
+                args=cmd[3:],
+                tool=tool_version(self.openscad_path),
+            )
+            if self.store.fetch(key, output_file, label="openscad"):
+                print(f"Base model restored from artifact cache: {output_file}")
+                self.mark_stage_complete(stage, output_file)
+                return output_file
+        
+        result = traced_run(cmd, name="openscad", outputs=[output_file])
         if result.returncode != 0:
             print(f"Error generating base model: {result.stderr}", file=sys.stderr)
             raise RuntimeError("Base model generation failed")
@@ -309,12 +426,18 @@ class SwatchPipeline:
         if not output_file.exists():
             raise FileNotFoundError(f"Expected output file {output_file} not found")
             
+        if key is not None:
+            self.store.store(key, output_file, label="openscad")
         print(f"Base model generated: {output_file}")
         self.mark_stage_complete(stage, output_file)
         return output_file
 
     def create_model_file(self, base_model: Path, force: bool = False) -> Path:
-        """Phase 1, Stage 2: Extract and validate model file structure."""
+        """Phase 1, Stage 2: Validate the model file structure inside the base 3MF.
+        
+        The model is checked in place; the returned 3MF is the archive
+        holding the validated 3D/3dmodel.model.
+        """
         stage = PipelineStage.MODEL_FILE
         
         if not self.should_run_stage(stage, force):
@@ -323,28 +446,21 @@ class SwatchPipeline:
             
         print("Creating model file...")
         
-        extract_dir = self.work_dir / "model_extract"
-        extract_dir.mkdir(exist_ok=True)
-        
-        # Extract the 3MF
-        subprocess.run(["unzip", "-o", str(base_model), "-d", str(extract_dir)], 
-                     capture_output=True)
-        
-        model_file = extract_dir / "3D" / "3dmodel.model"
-        if not model_file.exists():
-            raise FileNotFoundError("Model file not found in 3MF")
-            
-        # Validate XML structure
-        result = subprocess.run(["xmllint", "--format", str(model_file)],
-                              capture_output=True, text=True)
-        if result.returncode != 0:
-            print(f"XML validation failed: {result.stderr}", file=sys.stderr)
+        try:
+            with zipfile.ZipFile(base_model) as archive:
+                if MODEL_ENTRY not in archive.namelist():
+                    raise FileNotFoundError("Model file not found in 3MF")
+                    
+                # Validate XML structure
+                check_xml_entry(archive, MODEL_ENTRY)
+        except (zipfile.BadZipFile, ParseError) as e:
+            print(f"XML validation failed: {e}", file=sys.stderr)
             raise ValueError("Invalid XML structure")
             
-        self.mark_stage_complete(stage, model_file)
-        return model_file
+        self.mark_stage_complete(stage, base_model)
+        return base_model
 
-    def generate_metadata(self, base_model: Path, force: bool = False) -> Path:
+    def generate_metadata(self, force: bool = False) -> Path:
         """Phase 1, Stage 3: Generate and validate metadata."""
         stage = PipelineStage.METADATA
         
@@ -380,10 +496,9 @@ temperature = {self.config['nozzle_temp']}
         
         output_file = self.validation_dir / "base" / f"{self.config['material']}_{self.config['brand']}_{self.config['color']}_assembled.3mf"
         
-        # Create new 3MF
-        with subprocess.Popen(["zip", "-r", str(output_file), "."], 
-                            cwd=self.work_dir) as proc:
-            proc.wait()
+        # Copy the model archive and add the metadata files under Metadata/
+        metadata = {f"Metadata/{path.name}": path for path in sorted(Path(metadata_dir).iterdir()) if path.is_file()}
+        repackage_3mf(model_file, output_file, metadata)
             
         if not output_file.exists():
             raise FileNotFoundError("Failed to create 3MF archive")
@@ -411,7 +526,7 @@ temperature = {self.config['nozzle_temp']}
             "--work-dir", str(self.work_dir / "modifier")
         ]
         
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = traced_run(cmd, name="modify_3mf", outputs=[output_file])
         if result.returncode != 0:
             print(f"Error adding modifier: {result.stderr}", file=sys.stderr)
             raise RuntimeError("Modifier addition failed")
@@ -419,8 +534,8 @@ temperature = {self.config['nozzle_temp']}
         self.mark_stage_complete(stage, output_file)
         return output_file
 
-    def validate_final_model(self, modified_3mf: Path, force: bool = False) -> bool:
-        """Validate the final model using PrusaSlicer."""
+    def validate_final_model(self, modified_3mf: Path, force: bool = False, deep_check: bool = False) -> bool:
+        """Validate the final model's meshes, optionally also loading it in PrusaSlicer."""
         stage = PipelineStage.VALIDATION
         
         if not self.should_run_stage(stage, force):
@@ -429,7 +544,27 @@ temperature = {self.config['nozzle_temp']}
             
         print("Validating final model...")
         
-        # Export to 3MF to verify structure
+        # Check manifoldness, watertightness, degenerate/duplicate triangles and winding
+        errors = mesh_errors(modified_3mf)
+        if errors:
+            print("Mesh check failed:", file=sys.stderr)
+            for error in errors:
+                print(f"  - {error}", file=sys.stderr)
+            return False
+
+        # Check the printed dimensions against the constants in the .scad sources;
+        # advisory until it is verified against a real render (see conformance.py)
+        errors, _ = check_3mf_conformance(modified_3mf)
+        if errors:
+            print("Warning: dimensional check found deviations:", file=sys.stderr)
+            for error in errors:
+                print(f"  - {error}", file=sys.stderr)
+            
+        if not deep_check:
+            self.mark_stage_complete(stage, modified_3mf)
+            return True
+        
+        # Deep check: export to 3MF with PrusaSlicer to verify it loads
         verify_file = self.validation_dir / "pipeline" / f"{self.config['material']}_{self.config['brand']}_{self.config['color']}_verified.3mf"
         
         cmd = [
@@ -439,7 +574,7 @@ temperature = {self.config['nozzle_temp']}
             str(modified_3mf)
         ]
         
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = traced_run(cmd, name="prusa-slicer", outputs=[verify_file])
         success = result.returncode == 0
         
         if success:
@@ -447,104 +582,157 @@ temperature = {self.config['nozzle_temp']}
             
         return success
 
-    def cleanup(self, keep_checkpoint: bool = True):
-        """Clean up temporary files."""
+    def cleanup(self):
+        """Clean up temporary files; the checkpoint lives in the run ledger."""
         if self.work_dir.exists():
-            temp_checkpoint = None
-            if keep_checkpoint and self.checkpoint_file.exists():
-                # Move checkpoint to temp location
-                temp_checkpoint = Path(str(self.checkpoint_file) + '.tmp')
-                shutil.copy2(self.checkpoint_file, temp_checkpoint)
-                
-            # Remove work directory
             shutil.rmtree(self.work_dir)
-            
-            if keep_checkpoint and temp_checkpoint:
-                # Restore checkpoint
-                self.work_dir.mkdir(parents=True, exist_ok=True)
-                shutil.move(temp_checkpoint, self.checkpoint_file)
+
+def run_pipelines(pipelines: List[SwatchPipeline], max_workers: int = 1, force: bool = False,
+                  from_stage: Optional[PipelineStage] = None, deep_check: bool = False) -> List[bool]:
+    """Run the stage graph of every pipeline, overlapping independent stages.
+
+    A stage starts once the stages it depends on have finished, so independent
+    stages of one swatch run concurrently, as do the stages of different
+    swatches. `from_stage` invalidates that stage and its descendants; other
+    stages are skipped when their checkpoint is still valid. A failed stage
+    skips its descendants in the same pipeline only.
+
+    Returns:
+        Whether each pipeline completed
+    """
+    invalidated = stage_descendants(from_stage) if from_stage else set()
+    outputs = [{} for _ in pipelines]
+    waiting = {(i, stage): set(inputs) for i in range(len(pipelines)) for stage, (_, inputs) in STAGE_GRAPH.items()}
+    succeeded = [True] * len(pipelines)
+
+    def _run(i, stage):
+        with span(stage.name, "stage", parent=root, job=pipelines[i].job) as current:
+            result = pipelines[i].run_stage(stage, outputs[i], force=force or stage in invalidated,
+                                            deep_check=deep_check)
+            if isinstance(result, Path):
+                current.add_outputs(result)
+            elif result is False:
+                current.status = "failed"
+            return result
+
+    with span("run_pipelines", "pipeline", swatches=len(pipelines)) as root, \
+            ThreadPoolExecutor(max_workers=max_workers) as pool:
+        running = {}
+
+        def _submit_ready():
+            for node in [n for n, deps in waiting.items() if not deps]:
+                del waiting[node]
+                running[pool.submit(_run, *node)] = node
+
+        _submit_ready()
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, stage = running.pop(future)
+                try:
+                    result, reason = future.result(), "validation failed"
+                except Exception as e:
+                    result, reason = False, str(e)
+                if result is False:
+                    print(f"Pipeline {i + 1} failed in {stage.name}: {reason}", file=sys.stderr)
+                    succeeded[i] = False
+                    for skipped in stage_descendants(stage) - {stage}:
+                        waiting.pop((i, skipped), None)
+                    continue
+
+                outputs[i][stage] = result
+                for (j, _), deps in waiting.items():
+                    if j == i:
+                        deps.discard(stage)
+            _submit_ready()
+
+    return succeeded
 
 def main():
     parser = argparse.ArgumentParser(description='Swatch generation pipeline')
-    parser.add_argument('--config', '-c', required=True, help='Configuration file')
+    parser.add_argument('--config', '-c', nargs='+', default=[], help='Configuration file(s)')
+    parser.add_argument('--resume', action='store_true',
+                      help='Also rerun every job in the run ledger that has not completed')
+    parser.add_argument('--ledger', type=Path, default=LEDGER_FILE, help='Run ledger database')
     parser.add_argument('--work-dir', '-w', help='Working directory')
     parser.add_argument('--keep-temp', action='store_true', help='Keep temporary files')
     parser.add_argument('--force', '-f', action='store_true', help='Force all stages to run')
     parser.add_argument('--from-stage', choices=[s.name for s in PipelineStage], 
-                      help='Start from specific stage')
+                      help='Rerun this stage and every stage depending on it')
+    parser.add_argument('--jobs', '-j', type=int, default=os.cpu_count() or 1,
+                      help='Maximum number of stages running at once (default: CPU count)')
     parser.add_argument('--skip-dependency-check', action='store_true',
                       help='Skip checking for external dependencies')
+    parser.add_argument('--no-cache', action='store_true',
+                      help='Always run OpenSCAD instead of using the artifact cache')
+    parser.add_argument('--deep-check', action='store_true',
+                      help='Also load the final model in PrusaSlicer after the mesh check')
+    parser.add_argument('--trace', type=Path, nargs='?', const=TRACE_FILE,
+                      help=f'Record stage and subprocess spans (default file: {TRACE_FILE})')
     args = parser.parse_args()
 
+    if not args.config and not args.resume:
+        parser.error("give --config and/or --resume")
+
     if not args.skip_dependency_check and not check_dependencies():
         print("Missing required dependencies. Please install them and try again.", file=sys.stderr)
         return 1
 
-    try:
-        with open(args.config) as f:
-            config = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError) as e:
-        print(f"Error reading config: {e}", file=sys.stderr)
-        return 1
+    configs = {}
+    for config_file in args.config:
+        try:
+            with open(config_file) as f:
+                config = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError) as e:
+            print(f"Error reading config {config_file}: {e}", file=sys.stderr)
+            return 1
+        configs[job_name(config)] = config
+
+    ledger = RunLedger(args.ledger)
+    if args.resume:
+        # Every recorded job with a stage that has not completed
+        recorded = ledger.jobs()
+        pending = ledger.pending([stage.name for stage in PipelineStage])
+        print(f"Resuming {len(pending)} of {len(recorded)} jobs from {args.ledger}")
+        for job in pending:
+            configs.setdefault(job, recorded[job])
 
-    pipeline = SwatchPipeline(config, args.work_dir)
+    if args.trace:
+        configure(args.trace)
 
+    # Each swatch gets its own scratch directory when several are built together
+    work_dir = Path(args.work_dir) if args.work_dir else Path("tests/tmp")
+    store = None if args.no_cache else ArtifactStore()
+    run_id = ledger.start_run(sys.argv)
     try:
-        # Determine which stages to run
-        start_stage = PipelineStage[args.from_stage] if args.from_stage else PipelineStage.BASE_MODEL
-        force_remaining = False
-        
-        # Phase 1: Base Model Generation
-        if force_remaining or start_stage == PipelineStage.BASE_MODEL:
-            base_model = pipeline.generate_base_model(args.force)
-            force_remaining = True
-        else:
-            base_model = pipeline.stages[PipelineStage.BASE_MODEL].output_file
-            
-        if force_remaining or start_stage == PipelineStage.MODEL_FILE:
-            model_file = pipeline.create_model_file(base_model, args.force)
-            force_remaining = True
-        else:
-            model_file = pipeline.stages[PipelineStage.MODEL_FILE].output_file
-            
-        if force_remaining or start_stage == PipelineStage.METADATA:
-            metadata_dir = pipeline.generate_metadata(base_model, args.force)
-            force_remaining = True
-        else:
-            metadata_dir = pipeline.stages[PipelineStage.METADATA].output_file
-            
-        if force_remaining or start_stage == PipelineStage.BASE_3MF:
-            base_3mf = pipeline.assemble_base_3mf(model_file, metadata_dir, args.force)
-            force_remaining = True
-        else:
-            base_3mf = pipeline.stages[PipelineStage.BASE_3MF].output_file
-
-        # Phase 2: Modifier Addition
-        if force_remaining or start_stage == PipelineStage.MODIFIER:
-            modified_3mf = pipeline.add_modifier(base_3mf, args.force)
-            force_remaining = True
-        else:
-            modified_3mf = pipeline.stages[PipelineStage.MODIFIER].output_file
-
-        # Validation
-        if force_remaining or start_stage == PipelineStage.VALIDATION:
-            if pipeline.validate_final_model(modified_3mf, args.force):
-                print("Pipeline completed successfully!")
-                return 0
-            else:
-                print("Validation failed!", file=sys.stderr)
-                return 1
-        else:
-            print("Pipeline completed successfully (using checkpoints)!")
-            return 0
-
-    except Exception as e:
+        pipelines = [
+            SwatchPipeline(config, work_dir / job if len(configs) > 1 else work_dir, store, ledger, run_id)
+            for job, config in configs.items()
+        ]
+    except RuntimeError as e:
         print(f"Pipeline failed: {e}", file=sys.stderr)
+        ledger.finish_run(run_id, False)
         return 1
 
+    succeeded = []
+    try:
+        from_stage = PipelineStage[args.from_stage] if args.from_stage else None
+        succeeded = run_pipelines(pipelines, max(1, args.jobs), args.force, from_stage, args.deep_check)
     finally:
+        ledger.finish_run(run_id, bool(succeeded) and all(succeeded))
         if not args.keep_temp:
-            pipeline.cleanup(keep_checkpoint=True)
+            for pipeline in pipelines:
+                pipeline.cleanup()
+        if args.trace:
+            print(f"Trace written to {args.trace} and {export_chrome_trace(args.trace)}")
+
+    for job, ok in zip(configs, succeeded):
+        if not ok:
+            print(f"Pipeline failed: {job}", file=sys.stderr)
+    if all(succeeded):
+        print("Pipeline completed successfully!")
+        return 0
+    return 1
 
 if __name__ == '__main__':
-    sys.exit(main()) 
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+
+import configparser
+import hashlib
+import os
+import pickle
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# Compiled indexes live here, one file per vendor bundle content hash
+INDEX_DIR = Path('.cache/profile-index')
+
+# Bump when the on-disk layout or the flattening rules change
+INDEX_FORMAT = 1
+
+# Section types that get flattened into the index
+INDEXED_TYPES = ('filament', 'print', 'printer')
+
+# Indexes already loaded by this process, keyed by content hash
+_loaded_indexes = {}
+
+# Content hashes already computed by this process, keyed by (path, mtime, size)
+_file_digests = {}
+
+class ProfileIndex:
+    """Filament, print and printer sections of one vendor bundle with inheritance flattened."""
+    def __init__(self, digest: str, sections: Dict[str, Dict[str, str]]):
+        self.digest = digest
+        self._sections = sections
+
+    def sections(self) -> List[str]:
+        """Return section names in bundle order, like ConfigParser.sections()."""
+        return list(self._sections)
+
+    def __contains__(self, section: str) -> bool:
+        return section in self._sections
+
+    def __getitem__(self, section: str) -> Dict[str, str]:
+        return self._sections[section]
+
+    def __len__(self) -> int:
+        return len(self._sections)
+
+    def get(self, section: str, key: str, default: Optional[str] = None) -> Optional[str]:
+        """Get a fully inherited value from a section."""
+        return self._sections[section].get(key, default)
+
+def hash_config_file(config_file: Path) -> str:
+    """Return the SHA-256 of a vendor bundle, memoized per file version."""
+    config_file = Path(config_file)
+    stat = config_file.stat()
+    memo_key = (str(config_file.resolve()), stat.st_mtime_ns, stat.st_size)
+    if memo_key in _file_digests:
+        return _file_digests[memo_key]
+
+    digest = hashlib.sha256()
+    with open(config_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+
+    _file_digests[memo_key] = digest.hexdigest()
+    return _file_digests[memo_key]
+
+def read_config_file(config_file: Path) -> configparser.ConfigParser:
+    """Parse a vendor bundle with raw values (PrusaSlicer values contain '%')."""
+    config = configparser.ConfigParser(interpolation=None, strict=False)
+    config.read(config_file)
+    return config
+
+def parent_section_pattern(parent: str, section_type: str = 'filament') -> str:
+    """Build the regex matching the section(s) an `inherits` entry refers to."""
+    # Wildcard parents such as *PLA* name a literal abstract section
+    if parent.startswith('*') and parent.endswith('*'):
+        return f'^{section_type}:{re.escape(parent)}$'
+    return f'^{section_type}:{re.escape(parent)}($|\\s@)'
+
+class InheritanceResolver:
+    """Resolve `inherits` chains through a parent-name map and memoized merges.
+
+    Parents resolve to the same sections as parent_section_pattern(): the
+    exact section, plus for non-wildcard names any "<name> @<suffix>" variant,
+    in bundle order. Values are looked up depth-first and the first section
+    that defines a key wins.
+    """
+    def __init__(self, config):
+        self.config = config
+        self._merged = {}
+        self._resolving = set()
+        self._cycles = 0
+
+        # (section type, parent name) -> sections it refers to, in bundle order
+        self._parents = {}
+        for section in config.sections():
+            if ':' not in section:
+                continue
+            section_type, name = section.split(':', 1)
+            self._parents.setdefault((section_type, name), []).append(section)
+            # "Generic PLA @MK4S" is also reachable as a "Generic PLA" parent
+            for match in re.finditer(r'\s@', name):
+                prefix = name[:match.start()]
+                if not (prefix.startswith('*') and prefix.endswith('*')):
+                    self._parents.setdefault((section_type, prefix), []).append(section)
+
+    def parent_sections(self, section_type: str, parent: str) -> List[str]:
+        """Return the sections an `inherits` entry refers to."""
+        return self._parents.get((section_type, parent), [])
+
+    def merged(self, section: str) -> Dict[str, str]:
+        """Return all values of a section with inheritance applied."""
+        if section in self._merged:
+            return self._merged[section]
+        if section in self._resolving:
+            # Inheritance cycle: the section is already being merged further up
+            self._cycles += 1
+            return {}
+
+        cycles = self._cycles
+        self._resolving.add(section)
+        merged = dict(self.config[section].items())
+        inherits = merged.get('inherits')
+        if inherits:
+            section_type = section.split(':', 1)[0]
+            for parent in inherits.split(';'):
+                for parent_section in self.parent_sections(section_type, parent.strip()):
+                    for key, value in self.merged(parent_section).items():
+                        merged.setdefault(key, value)
+        self._resolving.discard(section)
+
+        # Merges cut short by a cycle depend on where the walk started
+        if self._cycles == cycles:
+            self._merged[section] = merged
+        return merged
+
+    def get(self, section: str, key: str) -> Optional[str]:
+        """Get a value from a section, following inheritance."""
+        return self.merged(section).get(key)
+
+def get_resolver(config) -> InheritanceResolver:
+    """Return the inheritance resolver for a parsed config, built once per config."""
+    # Kept on the config itself so it lives and dies with it (ConfigParser is unhashable)
+    resolver = getattr(config, '_inheritance_resolver', None)
+    if resolver is None:
+        resolver = InheritanceResolver(config)
+        config._inheritance_resolver = resolver
+    return resolver
+
+def flatten_sections(config: configparser.ConfigParser) -> Dict[str, Dict[str, str]]:
+    """Resolve inheritance for every indexed section."""
+    resolver = get_resolver(config)
+    return {
+        section: resolver.merged(section)
+        for section in config.sections()
+        if ':' in section and section.split(':', 1)[0] in INDEXED_TYPES
+    }
+
+def index_path(digest: str, index_dir: Path = INDEX_DIR) -> Path:
+    """Return the on-disk location of the index for a bundle hash."""
+    return Path(index_dir) / f"{digest}.v{INDEX_FORMAT}.pickle"
+
+def build_profile_index(config_file: Path, index_dir: Path = INDEX_DIR) -> ProfileIndex:
+    """Parse a vendor bundle, flatten it and persist the compiled index."""
+    digest = hash_config_file(config_file)
+
+    start = time.time()
+    index = ProfileIndex(digest, flatten_sections(read_config_file(config_file)))
+    print(f"Compiled profile index for {config_file} "
+          f"({len(index)} sections, {time.time() - start:.2f}s)", file=sys.stderr)
+
+    # Write atomically so concurrent builds never see a partial index
+    path = index_path(digest, index_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+    with open(tmp_path, 'wb') as f:
+        # Pickle keeps values shared between inherited sections deduplicated
+        pickle.dump({'digest': digest, 'sections': index._sections}, f,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+    _loaded_indexes[digest] = index
+    return index
+
+def load_profile_index(config_file: Path, index_dir: Path = INDEX_DIR) -> ProfileIndex:
+    """Load the compiled index for a vendor bundle, building it on first use."""
+    digest = hash_config_file(config_file)
+    if digest in _loaded_indexes:
+        return _loaded_indexes[digest]
+
+    path = index_path(digest, index_dir)
+    if path.exists():
+        try:
+            with open(path, 'rb') as f:
+                payload = pickle.load(f)
+            index = ProfileIndex(payload['digest'], payload['sections'])
+            _loaded_indexes[digest] = index
+            return index
+        except Exception as e:
+            print(f"Warning: Failed to load profile index {path}: {e}", file=sys.stderr)
+
+    return build_profile_index(config_file, index_dir)
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: profile_index.py <vendor_bundle.ini>", file=sys.stderr)
+        sys.exit(1)
+
+    index = build_profile_index(Path(sys.argv[1]))
+    print(f"{index.digest} {index_path(index.digest)}")
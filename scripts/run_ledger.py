@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Default location of the shared run ledger
+LEDGER_FILE = Path('.cache/ledger.db')
+
+# How long a writer waits for another process's transaction (seconds)
+BUSY_TIMEOUT = 60.0
+
+# Journal modes: WAL needs shared memory, so it only works for processes on
+# one host; a database shared by several hosts over a network file system
+# needs the rollback journal
+LOCAL_JOURNAL = "WAL"
+SHARED_JOURNAL = "DELETE"
+
+# Weight of the newest run in a duration history's moving average, once it has enough runs
+HISTORY_WEIGHT = 0.3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    command TEXT,
+    started REAL,
+    finished REAL,
+    status TEXT
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    job TEXT PRIMARY KEY,
+    config TEXT,
+    run_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS stages (
+    job TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    status TEXT NOT NULL,
+    fingerprint TEXT,
+    artifact TEXT,
+    finished REAL,
+    duration REAL,
+    exit_status INTEGER,
+    message TEXT,
+    run_id INTEGER,
+    PRIMARY KEY (job, stage)
+);
+CREATE TABLE IF NOT EXISTS durations (
+    stage TEXT NOT NULL,
+    printer TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    text_bucket INTEGER NOT NULL,
+    runs INTEGER NOT NULL,
+    mean REAL NOT NULL,
+    PRIMARY KEY (stage, printer, profile, text_bucket)
+);
+"""
+
+def connect(path: Path, journal_mode: str = LOCAL_JOURNAL) -> sqlite3.Connection:
+    """Open a database for short IMMEDIATE write transactions from many processes.
+
+    In WAL mode readers never block the writer. With the rollback journal
+    (SHARED_JOURNAL) every commit is synced, since other hosts read the file.
+    """
+    db = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+    db.row_factory = sqlite3.Row
+    db.execute(f"PRAGMA journal_mode={journal_mode}")
+    db.execute("PRAGMA synchronous=NORMAL" if journal_mode == LOCAL_JOURNAL else "PRAGMA synchronous=FULL")
+    return db
+
+class Transaction:
+    """BEGIN IMMEDIATE ... COMMIT, rolled back on error."""
+    def __init__(self, db: sqlite3.Connection):
+        self.db = db
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+class RunLedger:
+    """Transactional record of every job and stage across runs and processes.
+
+    Backed by one SQLite database, in WAL mode unless it is shared by several
+    hosts, so any number of worker processes can update it. Each thread gets
+    its own connection; every write is a short IMMEDIATE transaction.
+    """
+    def __init__(self, path: Path = LEDGER_FILE, journal_mode: str = LOCAL_JOURNAL):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.journal_mode = journal_mode
+        self._local = threading.local()
+        self.connection().executescript(SCHEMA)
+
+    def connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = connect(self.path, self.journal_mode)
+        return db
+
+    def transaction(self):
+        """Return a context manager holding the write lock for its duration."""
+        return Transaction(self.connection())
+
+    def start_run(self, command: List[str]) -> int:
+        """Record the start of a run and return its id."""
+        with self.transaction() as db:
+            cursor = db.execute("INSERT INTO runs (command, started, status) VALUES (?, ?, 'running')",
+                                (json.dumps(command), time.time()))
+            return cursor.lastrowid
+
+    def finish_run(self, run_id: int, succeeded: bool):
+        """Record the end of a run."""
+        with self.transaction() as db:
+            db.execute("UPDATE runs SET finished = ?, status = ? WHERE id = ?",
+                       (time.time(), "done" if succeeded else "failed", run_id))
+
+    def register_job(self, job: str, config: Dict, run_id: Optional[int] = None):
+        """Record a job and the configuration needed to rerun it."""
+        with self.transaction() as db:
+            db.execute("INSERT INTO jobs (job, config, run_id) VALUES (?, ?, ?) "
+                       "ON CONFLICT (job) DO UPDATE SET config = excluded.config, run_id = excluded.run_id",
+                       (job, json.dumps(config, sort_keys=True), run_id))
+
+    def record(self, job: str, stage: str, status: str, fingerprint: Optional[str] = None,
+               artifact: Optional[str] = None, duration: Optional[float] = None,
+               exit_status: Optional[int] = None, message: Optional[str] = None,
+               run_id: Optional[int] = None):
+        """Record a stage outcome; fields passed as None keep their previous value."""
+        with self.transaction() as db:
+            db.execute(
+                "INSERT INTO stages (job, stage, status, fingerprint, artifact, finished, duration,"
+                " exit_status, message, run_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (job, stage) DO UPDATE SET status = excluded.status,"
+                " fingerprint = COALESCE(excluded.fingerprint, fingerprint),"
+                " artifact = COALESCE(excluded.artifact, artifact),"
+                " finished = excluded.finished,"
+                " duration = COALESCE(excluded.duration, duration),"
+                " exit_status = COALESCE(excluded.exit_status, exit_status),"
+                " message = excluded.message,"
+                " run_id = COALESCE(excluded.run_id, run_id)",
+                (job, stage, status, fingerprint, str(artifact) if artifact is not None else None,
+                 time.time(), duration, exit_status, message, run_id))
+
+    def stages(self, job: str) -> Dict[str, Dict]:
+        """Return the recorded state of every stage of a job, by stage name."""
+        rows = self.connection().execute("SELECT * FROM stages WHERE job = ?", (job,))
+        return {row['stage']: dict(row) for row in rows}
+
+    def jobs(self) -> Dict[str, Dict]:
+        """Return the configuration of every recorded job."""
+        rows = self.connection().execute("SELECT job, config FROM jobs ORDER BY job")
+        return {row['job']: json.loads(row['config']) for row in rows}
+
+    def pending(self, expected_stages: List[str]) -> Dict[str, List[str]]:
+        """Return, per job, the expected stages that have not completed."""
+        done = {}
+        for row in self.connection().execute("SELECT job, stage FROM stages WHERE status = 'done'"):
+            done.setdefault(row['job'], set()).add(row['stage'])
+        left = {}
+        for job in self.jobs():
+            missing = [stage for stage in expected_stages if stage not in done.get(job, set())]
+            if missing:
+                left[job] = missing
+        return left
+
+    def record_duration(self, stage: str, printer: str, profile: str, text_bucket: int, duration: float):
+        """Add a run time to the history of its (stage, printer, profile, text length bucket).
+
+        The mean is exact for the first runs and then an exponential moving
+        average, so it follows tool upgrades and machine changes.
+        """
+        with self.transaction() as db:
+            db.execute(
+                "INSERT INTO durations (stage, printer, profile, text_bucket, runs, mean) VALUES (?, ?, ?, ?, 1, ?) "
+                "ON CONFLICT (stage, printer, profile, text_bucket) DO UPDATE SET"
+                " mean = mean + (excluded.mean - mean) * MAX(1.0 / (runs + 1), ?),"
+                " runs = runs + 1",
+                (stage, printer, profile, text_bucket, duration, HISTORY_WEIGHT))
+
+    def durations(self) -> Dict[Tuple[str, str, str, int], float]:
+        """Return the mean run time of every (stage, printer, profile, text length bucket) seen."""
+        rows = self.connection().execute("SELECT * FROM durations")
+        return {(row['stage'], row['printer'], row['profile'], row['text_bucket']): row['mean'] for row in rows}
+
+    def summary(self) -> Dict[str, int]:
+        """Count stages by status."""
+        rows = self.connection().execute("SELECT status, COUNT(*) AS n FROM stages GROUP BY status")
+        return {row['status']: row['n'] for row in rows}
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect the run ledger')
+    parser.add_argument('command', choices=['summary', 'jobs', 'show', 'durations'],
+                      help='What to print (durations: the duration history as JSON)')
+    parser.add_argument('job', nargs='?', help='Job to show')
+    parser.add_argument('--ledger', type=Path, default=LEDGER_FILE, help='Ledger database')
+    args = parser.parse_args()
+
+    if not args.ledger.exists():
+        print(f"Error: No ledger at {args.ledger}", file=sys.stderr)
+        return 1
+    ledger = RunLedger(args.ledger)
+
+    if args.command == 'summary':
+        for status, count in sorted(ledger.summary().items()):
+            print(f"{status:10} {count}")
+    elif args.command == 'durations':
+        entries = [{'stage': stage, 'printer': printer, 'profile': profile, 'text_bucket': bucket, 'mean': mean}
+                   for (stage, printer, profile, bucket), mean in sorted(ledger.durations().items())]
+        print(json.dumps(entries, indent=2))
+    elif args.command == 'jobs':
+        for job in ledger.jobs():
+            stages = ledger.stages(job)
+            done = sum(1 for s in stages.values() if s['status'] == 'done')
+            print(f"{job}: {done}/{len(stages)} stages done")
+    else:
+        if not args.job:
+            print("Error: show needs a job", file=sys.stderr)
+            return 1
+        for stage, row in ledger.stages(args.job).items():
+            duration = f"{row['duration']:.1f}s" if row['duration'] is not None else "-"
+            print(f"{stage:12} {row['status']:8} {duration:>8}  {row['artifact'] or ''}")
+            if row['message']:
+                print(f"{'':12} {row['message']}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
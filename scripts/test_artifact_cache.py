@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+import unittest
+import os
+import sys
+import tempfile
+from pathlib import Path
+from artifact_cache import ArtifactStore, cache_key, hash_path
+
+class TestArtifactStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tmp_dir = Path(self.tmp.name)
+        self.store = ArtifactStore(self.tmp_dir / "cache", max_bytes=250)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def artifact(self, name: str, size: int = 100) -> Path:
+        """Write a file of the given size."""
+        path = self.tmp_dir / name
+        path.write_bytes(name.encode()[:1] * size)
+        return path
+
+    def test_miss_then_hit(self):
+        """Test that a stored artifact is fetched back byte for byte."""
+        dest = self.tmp_dir / "out" / "base.3mf"
+        self.assertFalse(self.store.fetch("a" * 64, dest, label="openscad"))
+        self.assertFalse(dest.exists())
+
+        self.store.store("a" * 64, self.artifact("base.3mf"), label="openscad")
+        self.assertTrue(self.store.fetch("a" * 64, dest, label="openscad"))
+        self.assertEqual(dest.read_bytes(), self.artifact("base.3mf").read_bytes())
+        self.assertEqual(list(dest.parent.iterdir()), [dest])
+
+    def test_lru_eviction(self):
+        """Test that the least recently used objects are evicted to fit the size bound."""
+        for i, key in enumerate(("a" * 64, "b" * 64)):
+            self.store.store(key, self.artifact(f"{key[0]}.bin"))
+            os.utime(self.store.object_path(key), (1000 + i, 1000 + i))
+        # Using the older object makes the other one the eviction candidate
+        self.assertTrue(self.store.fetch("a" * 64, self.tmp_dir / "a.out"))
+        self.store.store("c" * 64, self.artifact("c.bin"))
+
+        self.assertEqual(sorted(e['key'][0] for e in self.store.entries()), ["a", "c"])
+        os.utime(self.store.object_path("c" * 64), (3000, 3000))
+        os.utime(self.store.object_path("a" * 64), (2000, 2000))
+        self.assertEqual(self.store.evict(max_bytes=100), 100)
+        self.assertEqual([e['key'][0] for e in self.store.entries()], ["c"])
+
+    def test_stats(self):
+        """Test object counts, sizes and hit rates overall and per label."""
+        self.store.fetch("a" * 64, self.tmp_dir / "x", label="openscad")
+        self.store.store("a" * 64, self.artifact("a.bin"), label="openscad")
+        self.store.fetch("a" * 64, self.tmp_dir / "x", label="openscad")
+        self.store.fetch("b" * 64, self.tmp_dir / "y", label="prusaslicer")
+
+        stats = self.store.stats()
+        self.assertEqual((stats['objects'], stats['bytes'], stats['max_bytes']), (1, 100, 250))
+        self.assertEqual(stats['hit_rate'], 1 / 3)
+        self.assertEqual(stats['events'], {'hit': 1, 'miss': 2, 'store': 1, 'evict': 0})
+        self.assertEqual(stats['by_label'], {'openscad': {'hit': 1, 'miss': 1}, 'prusaslicer': {'hit': 0, 'miss': 1}})
+
+    def test_keys(self):
+        """Test that keys ignore argument order and change with any part."""
+        self.assertEqual(cache_key(stage="openscad", args=["-D", "A=1"]),
+                         cache_key(args=["-D", "A=1"], stage="openscad"))
+        self.assertNotEqual(cache_key(stage="openscad", args=["-D", "A=1"]),
+                            cache_key(stage="openscad", args=["-D", "A=2"]))
+
+        tree = self.tmp_dir / "tree"
+        (tree / "sub").mkdir(parents=True)
+        (tree / "sub" / "a.scad").write_text("cube(1);")
+        before = hash_path(tree)
+        (tree / "sub" / "a.scad").write_text("cube(2);")
+        self.assertNotEqual(hash_path(tree), before)
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    suite = unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
+    result = runner.run(suite)
+    sys.exit(not result.wasSuccessful())
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+import unittest
+import struct
+import sys
+import tempfile
+import zlib
+from pathlib import Path
+from bgcode import BgcodeError, extract_thumbnails, read_metadata, verify_bgcode
+
+def block(block_type: int, payload: bytes, params: bytes = b'\0\0', deflate: bool = False) -> bytes:
+    """Encode one block with its CRC32."""
+    if deflate:
+        data = zlib.compress(payload)
+        header = struct.pack('<HHII', block_type, 1, len(payload), len(data))
+    else:
+        data = payload
+        header = struct.pack('<HHI', block_type, 0, len(payload))
+    return header + params + data + struct.pack('<I', zlib.crc32(header + params + data))
+
+def bgcode_file() -> bytes:
+    """Return a small file with metadata, a thumbnail and two G-code blocks."""
+    return (b'GCDE' + struct.pack('<IH', 1, 1)
+            + block(0, b'Producer=PrusaSlicer 2.8.1\n')
+            + block(3, b'printer_model=MK4S\nfilament_type=PLA\n', deflate=True)
+            + block(5, b'\x89PNG fake', params=struct.pack('<HHH', 0, 16, 12))
+            + block(4, b'estimated printing time (normal mode)=25m 3s\n', deflate=True)
+            + block(1, b'G1 X10 Y10 E1\n' * 100, deflate=True)
+            + block(1, b'G1 X20 Y20 E1\n'))
+
+class TestBgcode(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tmp_dir = Path(self.tmp.name)
+        self.path = self.tmp_dir / "swatch.bgcode"
+        self.path.write_bytes(bgcode_file())
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_verify(self):
+        """Test that blocks are counted and checksums verified."""
+        result = verify_bgcode(self.path)
+        self.assertEqual(result['blocks'], {'file_metadata': 1, 'printer_metadata': 1, 'thumbnail': 1,
+                                            'print_metadata': 1, 'gcode': 2})
+        self.assertEqual(result['gcode_bytes'], len(b'G1 X10 Y10 E1\n') * 101)
+
+    def test_corruption_detected(self):
+        """Test that a flipped payload byte and a truncated file are reported."""
+        data = bytearray(bgcode_file())
+        data[-10] ^= 0xFF
+        self.path.write_bytes(bytes(data))
+        with self.assertRaisesRegex(BgcodeError, "Checksum mismatch in gcode block"):
+            verify_bgcode(self.path)
+
+        self.path.write_bytes(bgcode_file()[:-3])
+        with self.assertRaisesRegex(BgcodeError, "Truncated"):
+            verify_bgcode(self.path)
+
+        self.path.write_bytes(b'; ASCII G-code\n')
+        with self.assertRaisesRegex(BgcodeError, "Not a binary G-code file"):
+            verify_bgcode(self.path)
+
+    def test_metadata(self):
+        """Test that plain and deflated metadata blocks are decoded."""
+        metadata = read_metadata(self.path)
+        self.assertEqual(metadata['printer_metadata'], {'printer_model': "MK4S", 'filament_type': "PLA"})
+        self.assertEqual(metadata['print_metadata']['estimated printing time (normal mode)'], "25m 3s")
+        self.assertEqual(metadata['file_metadata'], {'Producer': "PrusaSlicer 2.8.1"})
+
+    def test_thumbnails(self):
+        """Test that thumbnails are written with their size and format."""
+        written = extract_thumbnails(self.path, self.tmp_dir / "thumbs")
+        self.assertEqual([p.name for p in written], ["swatch_16x12.png"])
+        self.assertEqual(written[0].read_bytes(), b'\x89PNG fake')
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    suite = unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
+    result = runner.run(suite)
+    sys.exit(not result.wasSuccessful())
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+
+import unittest
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+import argparse
+from build_matrix import (BuildJob, DEFAULT_STAGE_COSTS, JobResult, estimate_cost, expand_matrix, history_key,
+                          material_temperature, materialize_aliases, parse_shard, partition_groups, printer_model,
+                          record_result, render_groups, run_jobs, schedule_priorities, write_manifest)
+import profile_index
+from profile_index import load_profile_index
+from run_ledger import RunLedger
+
+BUNDLE = """\
+[vendor]
+name = Prusa Research
+config_version = 2.1.11
+
+[filament:Generic PLA]
+filament_type = PLA
+temperature = 215
+
+[filament:Generic PLA @MK4S]
+inherits = Generic PLA
+temperature = 220
+
+[print:0.20mm QUALITY MK4S]
+layer_height = 0.2
+
+[print:0.20mm QUALITY XL]
+layer_height = 0.2
+
+[printer:Original Prusa MK4S]
+printer_model = MK4S
+
+[printer:Original Prusa XL]
+printer_model = XL
+"""
+
+def job(job_id: str, stage: str, printer: str = "", brand: str = "Generic", depends_on=None,
+        command=None) -> BuildJob:
+    """Return a job for a Generic PLA Red swatch."""
+    meta = {'material': "PLA", 'brand': brand, 'color': "Red"}
+    if printer:
+        meta.update(printer=printer, print_profile=f"0.20mm QUALITY {printer}")
+    return BuildJob(job_id, stage, command or ["true"], [], depends_on=depends_on, meta=meta)
+
+def material(temperature: str = "") -> dict:
+    """Return a Generic PLA Red material row."""
+    return {'material': "PLA", 'brand': "Generic", 'color': "Red", 'filament_profile': "Generic PLA",
+            'temperature': temperature, 'source': "test.csv"}
+
+class TestMaterials(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tmp_dir = Path(self.tmp.name)
+        self.bundle = self.tmp_dir / "2.1.11.ini"
+        self.bundle.write_text(BUNDLE)
+        profile_index._loaded_indexes.clear()
+        self.index = load_profile_index(self.bundle, self.tmp_dir / "index")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_printer_model(self):
+        """Test that printer entries map to the printer keys of the filament lookup."""
+        self.assertEqual(printer_model({'name': "Original Prusa MK4IS"}), "MK4IS")
+        self.assertEqual(printer_model({'name': "Prusa CORE ONE"}), "COREONE")
+        self.assertEqual(printer_model({'name': "Original Prusa XL IS"}), "XLIS")
+        self.assertIsNone(printer_model({'name': "Original Prusa MINI+"}))
+
+    def test_material_temperature(self):
+        """Test that the printer's filament variant sets the temperature unless the CSV does."""
+        self.assertEqual(material_temperature(material(), self.index, "MK4S"), "220")
+        self.assertEqual(material_temperature(material(), self.index, "XLIS"), "215")
+        self.assertEqual(material_temperature(material(), self.index), "215")
+        self.assertEqual(material_temperature(material("230"), self.index, "MK4S"), "230")
+
+PRINTERS = [
+    {'name': "Original Prusa MK4IS", 'profile': "Original Prusa MK4S", 'print_profiles': ["0.20mm QUALITY MK4S"]},
+    {'name': "Original Prusa MK4S", 'profile': "Original Prusa MK4S", 'print_profiles': ["0.20mm QUALITY MK4S"]},
+    {'name': "Original Prusa XL IS", 'profile': "Original Prusa XL", 'print_profiles': ["0.20mm QUALITY XL"]},
+]
+
+class TestEquivalenceClasses(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp.name)
+        Path("2.1.11.ini").write_text(BUNDLE)
+        profile_index._loaded_indexes.clear()
+        self.jobs, self.targets = expand_matrix([material()], PRINTERS, Path("2.1.11.ini"), cache_dir=None)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_shared_profile_sliced_once(self):
+        """Test that printers resolving to the same settings form one class with one conversion and slice."""
+        mk4is, mk4s, xl = self.targets
+        self.assertEqual(mk4is['class'], mk4s['class'])
+        self.assertNotEqual(mk4is['class'], xl['class'])
+        self.assertEqual(mk4s['canonical'], mk4is['gcode'])
+        self.assertEqual(mk4s['slice_job'], mk4is['slice_job'])
+        self.assertEqual(xl['canonical'], xl['gcode'])
+
+        stages = [job.stage for job in self.jobs]
+        self.assertEqual((stages.count("convert"), stages.count("slice")), (2, 2))
+        # The MK4S variant's temperature differs from the generic profile's, so the XL gets its own render
+        self.assertEqual(stages.count("render"), 3)
+
+    def test_hardlink_aliases(self):
+        """Test that aliases get their own names, linked to the canonical files, once the class is sliced."""
+        mk4is, mk4s, _ = self.targets
+        for path in (Path(mk4is['3mf']), Path(mk4is['gcode'])):
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(path.name)
+        results = {mk4is['slice_job']: JobResult(BuildJob(mk4is['slice_job'], "slice", [], []), "done", 0)}
+
+        self.assertEqual(materialize_aliases(self.targets, {}), 0)
+        self.assertFalse(Path(mk4s['gcode']).exists())
+        self.assertEqual(materialize_aliases(self.targets, results), 1)
+        self.assertTrue(os.path.samefile(mk4s['gcode'], mk4is['gcode']))
+        self.assertTrue(os.path.samefile(mk4s['3mf'], mk4is['3mf']))
+
+    def test_manifest_aliases(self):
+        """Test that in manifest mode aliases point at the canonical files and nothing is written."""
+        mk4is, mk4s, _ = self.targets
+        alias_gcode = mk4s['gcode']
+        results = {mk4is['slice_job']: JobResult(BuildJob(mk4is['slice_job'], "slice", [], []), "done", 0)}
+        self.assertEqual(materialize_aliases(self.targets, results, mode="manifest"), 0)
+        self.assertEqual((mk4s['3mf'], mk4s['gcode']), (mk4is['3mf'], mk4is['gcode']))
+        self.assertFalse(Path(alias_gcode).exists())
+
+    def test_manifest_verify_status(self):
+        """Test that a binary G-code target is only done once its slice is verified."""
+        printers = [dict(printer, binary_gcode=printer['profile'] == "Original Prusa XL") for printer in PRINTERS]
+        jobs, targets = expand_matrix([material()], printers, Path("2.1.11.ini"), cache_dir=None, binary_gcode=True)
+        verify = [job for job in jobs if job.stage == "verify"]
+        self.assertEqual([job.job_id for job in verify], [targets[2]['verify_job']])
+        self.assertNotIn('verify_job', targets[0])
+
+        results = {job.job_id: JobResult(job, "done", 0) for job in jobs}
+        results[verify[0].job_id] = JobResult(verify[0], "failed", 1)
+        write_manifest(targets, results, Path("manifest.json"))
+        entries = json.loads(Path("manifest.json").read_text())['targets']
+        self.assertEqual([entry['status'] for entry in entries], ["done", "done", "failed"])
+        self.assertFalse(any('verify_job' in entry or 'slice_job' in entry for entry in entries))
+
+        del results[verify[0].job_id]
+        write_manifest(targets, results, Path("manifest.json"))
+        self.assertEqual(json.loads(Path("manifest.json").read_text())['targets'][2]['status'], "missing")
+
+    def test_check_is_advisory(self):
+        """Test that conversions wait for their render only, while the dimensional check runs alongside."""
+        checks = {job.job_id: job for job in self.jobs if job.stage == "check"}
+        self.assertTrue(all("--advisory" in job.command for job in checks.values()))
+        for job in self.jobs:
+            if job.stage == "convert":
+                self.assertEqual([dep.split(":")[0] for dep in job.depends_on], ["render"])
+                self.assertIn(job.depends_on[0].replace("render:", "check:"), checks)
+
+class TestScheduling(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tmp_dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_history_key(self):
+        """Test that durations are filed by stage, printer, profile and text length bucket."""
+        self.assertEqual(history_key(job("slice:a", "slice", "XL")), ("slice", "XL", "0.20mm QUALITY XL", 1))
+        self.assertEqual(history_key(job("render:a", "render", brand="A Much Longer Brand Name")),
+                         ("render", "", "", 3))
+
+    def test_estimate_fallbacks(self):
+        """Test that unseen jobs use the closest history, then the stage defaults."""
+        history = {
+            ("slice", "XL", "0.20mm QUALITY XL", 1): 90.0,
+            ("slice", "MINI", "0.20mm QUALITY MINI", 1): 20.0,
+            ("slice", "MINI", "0.20mm QUALITY MINI", 3): 30.0,
+            ("render", "", "", 1): 40.0,
+        }
+        self.assertEqual(estimate_cost(job("slice:a", "slice", "XL"), history), 90.0)
+        # Same printer and profile, different text length
+        self.assertEqual(estimate_cost(job("slice:b", "slice", "XL", brand="A Much Longer Brand Name"), history),
+                         90.0)
+        # Unseen printer: same text length bucket
+        self.assertEqual(estimate_cost(job("slice:c", "slice", "MK4S"), history), 55.0)
+        # Unseen printer and text length: the whole stage
+        long_brand = job("slice:d", "slice", "MK4S", brand="An Even Longer Brand Name Than That")
+        self.assertEqual(estimate_cost(long_brand, history), 140.0 / 3)
+        self.assertEqual(estimate_cost(job("convert:a", "convert", "XL"), history), DEFAULT_STAGE_COSTS['convert'])
+
+    def test_priorities(self):
+        """Test that a job ranks by the longest chain of estimated work it starts."""
+        jobs = [job("render", "render"), job("slice:mini", "slice", "MINI", depends_on=["render"]),
+                job("slice:xl", "slice", "XL", depends_on=["render"]), job("other", "render")]
+        costs = {'render': 10.0, 'slice:mini': 5.0, 'slice:xl': 30.0, 'other': 20.0}
+        self.assertEqual(schedule_priorities(jobs, costs),
+                         {'render': 40.0, 'slice:mini': 5.0, 'slice:xl': 30.0, 'other': 20.0})
+
+    def test_longest_first_order(self):
+        """Test that a free worker takes the ready job with the highest priority."""
+        order = self.tmp_dir / "order.txt"
+        jobs = [job(name, "slice", command=[sys.executable, "-c", f"open({str(order)!r}, 'a').write('{name} ')"])
+                for name in ("mini", "xl", "mk4s")]
+        results = run_jobs(jobs, 1, priorities={'mini': 1.0, 'xl': 3.0, 'mk4s': 2.0})
+        self.assertTrue(all(r.status == "done" for r in results.values()))
+        self.assertEqual(order.read_text().split(), ["xl", "mk4s", "mini"])
+
+        order.unlink()
+        run_jobs(jobs, 1)
+        self.assertEqual(order.read_text().split(), ["mini", "xl", "mk4s"])
+
+    def test_history_recorded(self):
+        """Test that only jobs that actually ran feed the duration history."""
+        ledger = RunLedger(self.tmp_dir / "ledger.db")
+        slice_job = job("slice:a", "slice", "XL")
+        record_result(ledger, JobResult(slice_job, "done", 0, 42.0))
+        record_result(ledger, JobResult(slice_job, "done", 0, 0.1, cached=True))
+        record_result(ledger, JobResult(job("slice:b", "slice", "MINI"), "failed", 1, 3.0))
+        self.assertEqual(ledger.durations(), {history_key(slice_job): 42.0})
+
+class TestSharding(unittest.TestCase):
+    def jobs(self) -> list:
+        """Return a body render and four render groups with a check, conversion and slice each."""
+        jobs = [job("render:body", "render")]
+        for name in "abcd":
+            jobs += [job(f"render:{name}", "render", depends_on=["render:body"]),
+                     job(f"check:{name}", "check", depends_on=[f"render:{name}"]),
+                     job(f"convert:{name}", "convert", "XL", depends_on=[f"render:{name}"]),
+                     job(f"slice:{name}", "slice", "XL", depends_on=[f"convert:{name}"])]
+        return jobs
+
+    def test_parse_shard(self):
+        """Test the i/N argument."""
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for value in ("0/4", "5/4", "2", "a/b"):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                parse_shard(value)
+
+    def test_render_groups(self):
+        """Test that every job belongs to the render it builds on, except the shared body."""
+        groups = render_groups(self.jobs())
+        self.assertIsNone(groups["render:body"])
+        self.assertEqual(groups["slice:c"], "render:c")
+
+    def test_partition_balances_cost(self):
+        """Test that groups are spread by estimated cost."""
+        jobs = self.jobs()
+        costs = {j.job_id: 1.0 for j in jobs}
+        costs["render:a"] = 10.0
+        assignment = partition_groups(jobs, costs, 2)
+        self.assertEqual(sorted(assignment), ["render:a", "render:b", "render:c", "render:d"])
+        # The expensive group gets a shard to itself
+        self.assertEqual([g for g, shard in assignment.items() if shard == assignment["render:a"]], ["render:a"])
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    suite = unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
+    result = runner.run(suite)
+    sys.exit(not result.wasSuccessful())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+import unittest
+import sys
+from build_report import analyze_build, load_build, render_html
+
+def job_span(name: str, stage: str, start: float, wall: float, depends_on=(), brand: str = "Generic",
+             status: str = "ok") -> dict:
+    """Return the trace record build_matrix.py writes for a job."""
+    return {'id': f"1:{name}", 'parent': "1:root", 'name': name, 'cat': stage, 'start': 1000.0 + start,
+            'wall_s': wall, 'child_cpu_s': wall, 'max_rss_kb': 1000, 'status': status,
+            'args': {'depends_on': list(depends_on), 'cached': False,
+                     'meta': {'material': "PLA", 'brand': brand, 'color': "Red"}}}
+
+def build_trace() -> list:
+    """Return a small traced build: two swatches, one slow to render, on two workers."""
+    records = [
+        job_span("render:body", "render", 0, 2),
+        job_span("render:a", "render", 2, 3, ["render:body"]),
+        job_span("render:b", "render", 2, 10, ["render:body"], brand="Very Long Brand Name"),
+        job_span("convert:a", "convert", 5, 1, ["render:a"]),
+        job_span("slice:a", "slice", 6, 4, ["convert:a"]),
+        # Both workers were busy, so the conversion waited 1s after its render
+        job_span("convert:b", "convert", 13, 1, ["render:b"], brand="Very Long Brand Name"),
+        job_span("slice:b", "slice", 14, 4, ["convert:b"], brand="Very Long Brand Name"),
+    ]
+    records[0]['args']['meta'] = {}
+    root = {'id': "1:root", 'parent': None, 'name': "run_jobs", 'cat': "build", 'start': 1000.0,
+            'wall_s': 18.0, 'status': "ok", 'args': {'jobs': 7, 'workers': 2}}
+    return records + [root]
+
+class TestBuildReport(unittest.TestCase):
+    def setUp(self):
+        root, jobs = load_build(build_trace())
+        self.report = analyze_build(root, jobs, top=1)
+
+    def test_critical_path(self):
+        """Test that the path runs back from the last job through the gating dependencies."""
+        critical = self.report['critical_path']
+        self.assertEqual([j['job'] for j in critical['jobs']],
+                         ["render:body", "render:b", "convert:b", "slice:b"])
+        self.assertEqual(critical['duration_s'], 18.0)
+        self.assertEqual(critical['run_s'], 17.0)
+        self.assertEqual(critical['wait_s'], 1.0)
+
+    def test_stages(self):
+        """Test per-stage totals, queue waits and utilization."""
+        stages = self.report['stages']
+        self.assertEqual(stages['render']['jobs'], 3)
+        self.assertEqual(stages['render']['run_s'], 15.0)
+        self.assertEqual(stages['convert']['mean_wait_s'], 0.5)
+        self.assertEqual(stages['slice']['utilization'], round(8 / 36, 4))
+        self.assertEqual(self.report['build']['utilization'], round(25 / 36, 4))
+
+    def test_slowest_swatches(self):
+        """Test that swatches are ranked by the run time of all their jobs."""
+        self.assertEqual(self.report['slowest_swatches'],
+                         [{'swatch': "Very Long Brand Name PLA Red", 'run_s': 15.0, 'jobs': 3}])
+
+    def test_outliers(self):
+        """Test that a render far slower than its stage's median is flagged with its parameters."""
+        records = build_trace()
+        for i in range(5):
+            records.append(job_span(f"render:c{i}", "render", 2, 3 + 0.1 * i, ["render:body"]))
+        root, jobs = load_build(records)
+        outliers = analyze_build(root, jobs)['outliers']
+        self.assertEqual([o['job'] for o in outliers], ["render:b"])
+        self.assertEqual(outliers[0]['meta']['brand'], "Very Long Brand Name")
+        self.assertEqual(outliers[0]['median_s'], 3.2)
+
+    def test_html(self):
+        """Test that the HTML report is one self-contained page."""
+        page = render_html(self.report)
+        self.assertTrue(page.startswith("<!DOCTYPE html>"))
+        self.assertIn("render:b", page)
+        self.assertNotIn("<script", page)
+
+    def test_no_build(self):
+        """Test that a trace without a build run is rejected."""
+        with self.assertRaises(ValueError):
+            load_build([])
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    suite = unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
+    result = runner.run(suite)
+    sys.exit(not result.wasSuccessful())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+import unittest
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from unittest import mock
+
+import numpy as np
+
+import conformance
+from conformance import (check_conformance, expected_dimensions, inside_convex, measure, offset_polygon,
+                         parse_scad_constants, ray_crossings)
+
+# A closed 10 x 10 x 2 box, wound outwards
+BOX_VERTICES = np.array([[x, y, z] for x in (0, 10) for y in (0, 10) for z in (0, 2)], dtype=np.float64)
+BOX_TRIANGLES = np.array([[0, 1, 3], [0, 3, 2], [4, 6, 7], [4, 7, 5], [0, 4, 5], [0, 5, 1],
+                          [2, 3, 7], [2, 7, 6], [0, 2, 6], [0, 6, 4], [1, 5, 7], [1, 7, 3]])
+
+# Small swatch constants; DEPTHS give steps at 0.4, 0.8 and 1.6 mm
+CONSTANTS = {
+    'BASE_WIDTH': 40.0, 'BASE_HEIGHT': 20.0, 'BASE_THICKNESS': 2.0, 'P_EPSILON': 0.01,
+    'CHAMFER_RIGHT': 3.0, 'CHAMFER_LEFT': 8.0, 'INNER_WALL_OFFSET': 2.0, 'SHELF_THICKNESS': 1.0,
+    'DEPTHS': [0.4, 0.8, -0.6], 'CIRCLE_RADIUS': 1.5, 'CIRCLE_DIAMETER': 3.0,
+    'CIRCLE_TOP_MARGIN': 1.0, 'CIRCLE_SPACING': 4.0,
+}
+STEP_COLUMNS = {0.4: range(-15, -11), 0.8: range(-10, -6), 1.6: range(-5, -1)}
+
+def swatch_heights(omit_step: Optional[float] = None, closed_hole: Optional[int] = None) -> Dict:
+    """Return the height of each 1 mm column of a swatch, keyed by its lower-left corner (0 for holes)."""
+    expected = expected_dimensions(CONSTANTS)
+    heights = {}
+    for x in range(-20, 20):
+        for y in range(-10, 10):
+            center = np.array([[x + 0.5, y + 0.5]])
+            heights[x, y] = expected['rim_level'] if not inside_convex(center, expected['inner_path'])[0] \
+                else expected['shelf_level']
+    for level, columns in STEP_COLUMNS.items():
+        if level != omit_step:
+            heights.update({(x, y): level for x in columns for y in range(-5, -2)})
+    for i, (hx, hy) in enumerate(expected['holes']):
+        if i != closed_hole:
+            heights.update({key: 0 for key in heights if np.hypot(key[0] + 0.5 - hx, key[1] + 0.5 - hy) < 1.5})
+    return heights
+
+def columns_mesh(heights: Dict, offset: Tuple[float, float] = (0, 0)) -> Tuple[np.ndarray, np.ndarray]:
+    """Build a mesh of closed unit-square boxes, one per column, moved by offset."""
+    vertices, triangles = [], []
+    for (x, y), height in heights.items():
+        if height:
+            triangles.append(BOX_TRIANGLES + 8 * len(triangles))
+            vertices.append(BOX_VERTICES / [10, 10, 2] * [1, 1, height] + [x + offset[0], y + offset[1], 0])
+    return np.concatenate(vertices), np.concatenate(triangles)
+
+class TestConformance(unittest.TestCase):
+    def test_parse_scad_constants(self):
+        """Test that arithmetic, lists and $preview ternaries are evaluated and the rest skipped."""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "vars.scad"
+            path.write_text("WIDTH = 10;\nHALF = WIDTH / 2 - .5;\nEPS = $preview ? 0.1 : .01;\n"
+                            "  DEPTHS = [-.6, 0.2];\nNAME = \"text\";\nlower = 1;\n")
+            self.assertEqual(parse_scad_constants([path]),
+                             {'WIDTH': 10.0, 'HALF': 4.5, 'EPS': 0.01, 'DEPTHS': [-0.6, 0.2]})
+
+    def test_offset_polygon(self):
+        """Test that shrinking keeps sharp corners in the original vertex order."""
+        square = np.array([[0, 0], [10, 0], [10, 10], [0, 10]], dtype=np.float64)
+        np.testing.assert_allclose(offset_polygon(square, -1), [[1, 1], [9, 1], [9, 9], [1, 9]])
+        np.testing.assert_allclose(offset_polygon(square[::-1], -1), [[1, 9], [9, 9], [9, 1], [1, 1]])
+
+    def test_measure_box(self):
+        """Test bounding box, volume, area and top-surface histogram of a box."""
+        inner = np.array([[2, 2], [8, 2], [8, 8], [2, 8]], dtype=np.float64)
+        metrics = measure(BOX_VERTICES, BOX_TRIANGLES, inner)
+        self.assertEqual(metrics['size'], [10.0, 10.0, 2.0])
+        self.assertAlmostEqual(metrics['volume'], 200.0)
+        self.assertAlmostEqual(metrics['area'], 280.0)
+        self.assertEqual(sum(metrics['levels']['rim'].values()) + sum(metrics['levels']['shelf'].values()), 100.0)
+        self.assertEqual(set(metrics['levels']['rim']) | set(metrics['levels']['shelf']), {2.0})
+
+    def test_ray_crossings(self):
+        """Test that a vertical ray through a solid crosses its top and bottom."""
+        self.assertEqual(ray_crossings(BOX_VERTICES, BOX_TRIANGLES, 3.3, 6.1), 2)
+        self.assertEqual(ray_crossings(BOX_VERTICES, BOX_TRIANGLES, 12, 5), 0)
+
+    def test_conforming_swatch(self):
+        """Test that a swatch with rim, shelf, steps and open holes passes wherever it is placed."""
+        for offset in ((0, 0), (125, 105)):
+            errors, metrics = check_conformance(*columns_mesh(swatch_heights(), offset), CONSTANTS)
+            self.assertEqual(errors, [])
+            self.assertEqual(metrics['center'], list(offset))
+
+    def test_missing_features(self):
+        """Test that a missing thickness step and a closed hole are reported."""
+        errors, _ = check_conformance(*columns_mesh(swatch_heights(omit_step=0.8), (125, 105)), CONSTANTS)
+        self.assertEqual(errors, ["No thickness step at 0.80 mm"])
+        errors, _ = check_conformance(*columns_mesh(swatch_heights(closed_hole=1), (125, 105)), CONSTANTS)
+        self.assertEqual(len(errors), 1)
+        self.assertRegex(errors[0], r"^Hole 6 at \(.+\) is not open$")
+
+    def test_advisory_exit_status(self):
+        """Test that --advisory reports a failed check but exits successfully."""
+        missing = str(Path(tempfile.gettempdir()) / "missing.3mf")
+        with mock.patch('conformance.parse_scad_constants', return_value=CONSTANTS), \
+                mock.patch('builtins.print'):
+            with mock.patch.object(sys, 'argv', ["conformance.py", missing]):
+                self.assertEqual(conformance.main(), 1)
+            with mock.patch.object(sys, 'argv', ["conformance.py", "--advisory", missing]):
+                self.assertEqual(conformance.main(), 0)
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    suite = unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
+    result = runner.run(suite)
+    sys.exit(not result.wasSuccessful())
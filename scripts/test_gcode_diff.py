@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+import unittest
+import sys
+import tempfile
+from pathlib import Path
+from gcode_diff import catalog_pairs, compare_gcode
+
+def gcode(header: str, top_infill: float = 0.8, ironing: float = 0.05) -> str:
+    """Return a two-layer G-code file with the given header comment and extrusion amounts."""
+    return (f"; generated by PrusaSlicer 2.8.1 on {header}\nM83\n"
+            ";LAYER_CHANGE\n;Z:0.2\n;TYPE:Perimeter\nG1 X10 Y10 F6000\nG1 X20 Y10 E0.5\n"
+            f";LAYER_CHANGE\n;Z:0.4\n;TYPE:Top solid infill\nG1 X20 Y20 E{top_infill}\n"
+            f";TYPE:Ironing\nG1 X10 Y20 E{ironing}\n"
+            f"; estimated printing time (normal mode) = 1m 2s\n; checksum {header}\n")
+
+class TestGcodeDiff(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tmp_dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name: str, content: str) -> Path:
+        path = self.tmp_dir / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+        return path
+
+    def test_volatile_comments_ignored(self):
+        """Test that headers and timestamps do not count as differences."""
+        result = compare_gcode(self.write("a.gcode", gcode("2024-01-01 at 10:00:00")),
+                               self.write("b.gcode", gcode("2025-06-30 at 23:59:59")))
+        self.assertTrue(result['match'])
+        self.assertIsNone(result['first_divergence'])
+
+    def test_first_divergent_layer(self):
+        """Test that the first divergent layer and the feature deltas are reported."""
+        result = compare_gcode(self.write("a.gcode", gcode("x")), self.write("b.gcode", gcode("x", ironing=0.08)))
+        self.assertFalse(result['match'])
+        self.assertEqual(result['divergent_layers'], 1)
+        self.assertEqual(result['first_divergence'], {'layer': 2, 'z': 0.4,
+                                                      'reasons': ["Ironing 0.050 -> 0.080 mm"]})
+        self.assertEqual(result['features']['Ironing']['delta'], 0.03)
+        self.assertTrue(result['features']['Perimeter']['within_tolerance'])
+
+    def test_tolerance(self):
+        """Test that differences within tolerance still match."""
+        expected = self.write("a.gcode", gcode("x"))
+        actual = self.write("b.gcode", gcode("x", top_infill=0.802))
+        self.assertTrue(compare_gcode(expected, actual)['match'])
+        self.assertFalse(compare_gcode(expected, actual, abs_tol=0.001, rel_tol=0)['match'])
+
+    def test_missing_layer(self):
+        """Test that a truncated file diverges at the first missing layer."""
+        truncated = gcode("x").split(";LAYER_CHANGE\n;Z:0.4")[0]
+        result = compare_gcode(self.write("a.gcode", gcode("x")), self.write("b.gcode", truncated))
+        self.assertEqual(result['layers'], {'expected': 2, 'actual': 1})
+        self.assertEqual(result['first_divergence']['reasons'], ["layer missing"])
+
+    def test_catalog_pairs(self):
+        """Test that fixtures are paired with same-named outputs."""
+        fixture = self.write("fixtures/sub/a.gcode", gcode("x"))
+        self.assertEqual(catalog_pairs(self.tmp_dir / "fixtures", self.tmp_dir / "output"),
+                         [(fixture, self.tmp_dir / "output" / "sub" / "a.gcode")])
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    suite = unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
+    result = runner.run(suite)
+    sys.exit(not result.wasSuccessful())
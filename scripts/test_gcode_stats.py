@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+import unittest
+import sys
+import tempfile
+from pathlib import Path
+from gcode_stats import analyze_batch, analyze_gcode, parse_duration
+
+# Two layers of a relative-extrusion PrusaSlicer file, ironed on the last one
+SAMPLE_GCODE = """; generated by PrusaSlicer
+M140 S60
+M104 S215
+M190 S60
+M109 S220
+M83
+G1 Z0.2 F720
+;LAYER_CHANGE
+;Z:0.2
+;HEIGHT:0.2
+;TYPE:Perimeter
+G1 X10 Y10 F6000
+G1 X20 Y10 E0.5 F1200
+G1 X20 Y20 E0.5
+G1 E-0.8 F2100
+;LAYER_CHANGE
+;Z:0.4
+;HEIGHT:0.2
+G1 Z0.4
+;TYPE:Top solid infill
+G1 E0.8
+G1 X10 Y20 E0.25
+;TYPE:Ironing
+G1 X10 Y10 E0.05
+; filament used [mm] = 1.30
+; filament used [g] = 0.00
+; estimated printing time (normal mode) = 1h 2m 3s
+; filament_diameter = 1.75
+; filament_density = 1.24
+"""
+
+class TestGcodeStats(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "swatch.gcode"
+        self.path.write_text(SAMPLE_GCODE)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_analyze(self):
+        """Test layer count, feature totals, ironing, footer values and extrusion bounding box."""
+        stats = analyze_gcode(self.path)
+        self.assertEqual(stats['layers'], 2)
+        self.assertEqual(stats['features'], {'Ironing': 0.05, 'Perimeter': 1.0, 'Top solid infill': 0.25})
+        self.assertEqual(stats['ironing'], {'total_mm': 0.05, 'layers': [2], 'top_layer': 2,
+                                            'top_layer_mm': 0.05, 'top_only': True})
+        self.assertEqual(stats['estimated_time_s'], 3723)
+        self.assertEqual((stats['filament_mm'], stats['filament_g']), (1.3, 0.0))
+        self.assertEqual((stats['max_nozzle_temp'], stats['max_bed_temp']), (220, 60))
+        self.assertEqual(stats['bbox'], {'min': [10.0, 10.0, 0.2], 'max': [20.0, 20.0, 0.4]})
+
+    def test_absolute_extrusion(self):
+        """Test that absolute E positions and G92 resets give the same totals."""
+        absolute = self.path.with_name("absolute.gcode")
+        absolute.write_text("M82\n;TYPE:Perimeter\nG1 X1 E1\nG1 X2 E1.5\nG92 E0\nG1 X3 E0.5\n")
+        self.assertEqual(analyze_gcode(absolute)['features'], {'Perimeter': 2.0})
+
+    def test_retraction(self):
+        """Test that retractions and unretracts are not extrusion, but extra restart length is."""
+        retracting = self.path.with_name("retracting.gcode")
+        retracting.write_text(";TYPE:Perimeter\nM83\nG1 X1 E1\nG1 X2 E-0.3\nG1 E-0.5\nG1 X5 Y5\nG1 E0.9\n"
+                              "G1 X6 E1\nM82\nG1 E1.7\nG1 E2.5\nG1 X7 E3\n")
+        self.assertEqual(analyze_gcode(retracting)['features'], {'Perimeter': 3.0})
+
+    def test_batch(self):
+        """Test that batch mode reports every file, including unreadable ones, in order."""
+        empty = self.path.with_name("empty.gcode")
+        empty.write_text("")
+        results = list(analyze_batch([self.path, empty, self.path.with_name("missing.gcode")], 2))
+        self.assertEqual(results[0]['layers'], 2)
+        self.assertEqual(results[1]['layers'], 0)
+        self.assertIn('error', results[2])
+
+    def test_parse_duration(self):
+        """Test PrusaSlicer duration strings."""
+        self.assertEqual(parse_duration("1d 0h 5m 1s"), 86701)
+        self.assertIsNone(parse_duration("unknown"))
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    suite = unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
+    result = runner.run(suite)
+    sys.exit(not result.wasSuccessful())
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+import unittest
+import sys
+from label_cache import format_scad_value, parse_label_echoes, parse_scad_value
+
+ECHO_OUTPUT = """\
+ECHO: "LABEL", "[\\"PLA\\", 0.6, 5.5]", ["PLA", 0.6, 5.5, "Liberation Sans:style=Bold", 1, "baseline", 0, undef, 64]
+ECHO: "swatch ready"
+ECHO: "LABEL", "[\\"Say \\\\\\"hi\\\\\\"\\"]", ["Say \\"hi\\"", 1e-05, 1e+06, [0, -1, 0], true, false]
+ECHO: "LABEL", "broken", ["PLA", 0.6
+"""
+
+class TestLabelEchoes(unittest.TestCase):
+    def test_parse_echoes(self):
+        """Test that label echoes parse with booleans, undef, exponents, vectors and escaped quotes."""
+        labels = parse_label_echoes(ECHO_OUTPUT)
+        self.assertEqual(len(labels), 2)
+        self.assertEqual(labels['["PLA", 0.6, 5.5]'],
+                         ["PLA", 0.6, 5.5, "Liberation Sans:style=Bold", 1, "baseline", 0, None, 64])
+        self.assertEqual(labels['["Say \\"hi\\""]'], ['Say "hi"', 1e-05, 1e+06, [0, -1, 0], True, False])
+
+    def test_malformed_values(self):
+        """Test that values OpenSCAD would not print are rejected."""
+        for text in ('[1, 2', '[1] 2', 'foo', '"open', ']'):
+            with self.assertRaises(ValueError):
+                parse_scad_value(text)
+
+    def test_format_round_trip(self):
+        """Test that arguments are written back as OpenSCAD literals with their exact values."""
+        args = ['Ä "quoted" \\ text', 0.1 + 0.2, 64.0, -2.5e-07, None, True, [0.0, -1.0, 0.0]]
+        literal = format_scad_value(args)
+        self.assertEqual(literal, '["Ä \\"quoted\\" \\\\ text", 0.30000000000000004, 64, -2.5e-07, '
+                                  'undef, true, [0, -1, 0]]')
+        self.assertEqual(parse_scad_value(literal), args)
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    suite = unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
+    result = runner.run(suite)
+    sys.exit(not result.wasSuccessful())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+import unittest
+import json
+import sys
+import tempfile
+from multiprocessing import Pool
+from pathlib import Path
+from build_matrix import (BuildJob, JobResult, estimate_cost, partition_groups, select_shard,
+                          shard_manifest_path, write_manifest)
+from artifact_cache import cache_key
+from merge_shards import merge_manifests
+
+PRINTERS = {"MK4S": ["0.20mm QUALITY MK4S", "0.28mm DRAFT MK4S"], "XL": ["0.20mm QUALITY XL"]}
+
+def matrix(brands: int = 5):
+    """Return the jobs and targets of a small matrix shaped like build_matrix.expand_matrix's."""
+    jobs = [BuildJob("render:body", "render", ["true"], [])]
+    targets = []
+    for i in range(brands):
+        swatch = {'material': "PLA", 'brand': f"Brand {'x' * 4 * i}", 'color': "Red"}
+        render = f"render:{i}"
+        jobs += [BuildJob(render, "render", ["true"], [], depends_on=["render:body"], meta=swatch),
+                 BuildJob(f"check:{i}", "check", ["true"], [], depends_on=[render], meta=swatch)]
+        for printer, profiles in PRINTERS.items():
+            for profile in profiles:
+                meta = dict(swatch, printer=printer, print_profile=profile)
+                stem = f"{i}_{printer}_{profile.split()[1]}"
+                jobs += [BuildJob(f"convert:{stem}", "convert", ["true"], [], depends_on=[render], meta=meta),
+                         BuildJob(f"slice:{stem}", "slice", ["true"], [], depends_on=[f"convert:{stem}"], meta=meta)]
+                targets.append(dict(meta, **{'class': cache_key(stem=stem)[:16], '3mf': f"{stem}.3mf",
+                                             'gcode': f"{stem}.gcode", 'canonical': f"{stem}.gcode",
+                                             'slice_job': f"slice:{stem}"}))
+    return jobs, targets
+
+def build_shard(args) -> Path:
+    """Plan and "build" one shard in its own process, writing its manifest like build_matrix.py."""
+    output_dir, index, count = args
+    jobs, targets = matrix()
+    assignment = partition_groups(jobs, {job.job_id: estimate_cost(job, {}) for job in jobs}, count)
+    total = len(targets)
+    jobs, targets = select_shard(jobs, targets, assignment, index)
+    results = {job.job_id: JobResult(job, "done", 0) for job in jobs}
+    path = Path(output_dir) / shard_manifest_path(index, count).name
+    write_manifest(targets, results, path, {'index': index, 'count': count,
+                                            'partition': cache_key(assignment=assignment)[:16],
+                                            'targets': len(targets), 'total_targets': total})
+    return path
+
+class TestMergeShards(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tmp_dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def shard_manifests(self, count: int) -> list:
+        """Build every shard side by side in separate processes and load their manifests."""
+        with Pool(count) as pool:
+            paths = pool.map(build_shard, [(self.tmp_dir, index, count) for index in range(1, count + 1)])
+        return [json.loads(path.read_text()) for path in paths]
+
+    def test_side_by_side_shards_merge(self):
+        """Test that shards planned in separate processes cover the matrix exactly once."""
+        manifests = self.shard_manifests(3)
+        merged, errors = merge_manifests(manifests)
+        self.assertEqual(errors, [])
+        self.assertEqual(merged['shards'], 3)
+        self.assertEqual(len(merged['targets']), len(matrix()[1]))
+        self.assertTrue(all(m['targets'] for m in manifests))
+
+    def test_missing_and_duplicate_shards(self):
+        """Test that a missing shard and a shard given twice are reported."""
+        manifests = self.shard_manifests(3)
+        _, errors = merge_manifests([manifests[0], manifests[0], manifests[2]])
+        self.assertIn("Shard 1/3 given 2 times", errors)
+        self.assertIn("Shard 2/3 missing", errors)
+        self.assertTrue(any("built by shards 1 and 1" in e for e in errors))
+        self.assertTrue(any(e.endswith(f"of {len(matrix()[1])} targets built") for e in errors))
+
+    def test_mismatched_partition(self):
+        """Test that shards planned from different histories do not merge."""
+        manifests = self.shard_manifests(2)
+        manifests[1]['shard']['partition'] = "0" * 16
+        _, errors = merge_manifests(manifests)
+        self.assertTrue(any("partitioned differently" in e for e in errors))
+
+    def test_failed_target(self):
+        """Test that a target that was not built blocks the merge."""
+        manifests = self.shard_manifests(2)
+        manifests[0]['targets'][0]['status'] = "failed"
+        _, errors = merge_manifests(manifests)
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].endswith(": failed"))
+
+    def test_check_files(self):
+        """Test that --check-files reports missing outputs."""
+        manifests = self.shard_manifests(1)
+        _, errors = merge_manifests(manifests, check_files=True)
+        self.assertEqual(len(errors), 2 * len(matrix()[1]))
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    suite = unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
+    result = runner.run(suite)
+    sys.exit(not result.wasSuccessful())
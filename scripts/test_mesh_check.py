@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+import unittest
+import io
+import sys
+import numpy as np
+from mesh_check import check_mesh, load_meshes
+
+# Unit cube, outward-facing counter-clockwise triangles
+CUBE_VERTICES = np.array([[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0],
+                          [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1]], dtype=np.float64)
+CUBE_TRIANGLES = np.array([[0, 2, 1], [0, 3, 2], [4, 5, 6], [4, 6, 7],
+                           [0, 1, 5], [0, 5, 4], [1, 2, 6], [1, 6, 5],
+                           [2, 3, 7], [2, 7, 6], [3, 0, 4], [3, 4, 7]], dtype=np.int64)
+
+def model_xml(objects: str) -> io.BytesIO:
+    """Wrap object elements in a 3MF model document."""
+    return io.BytesIO(f"""<?xml version="1.0" encoding="UTF-8"?>
+<model unit="millimeter" xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02"
+       xmlns:slic3rpe="http://schemas.slic3r.org/3mf/2017/06">
+<resources>{objects}</resources><build/></model>""".encode())
+
+def mesh_object(object_id: int, triangles=CUBE_TRIANGLES, modifier: bool = False) -> str:
+    """Return an <object> element for the cube vertices and the given triangles."""
+    vertices = "".join(f'<vertex x="{x:g}" y="{y:g}" z="{z:g}"/>' for x, y, z in CUBE_VERTICES)
+    faces = "".join(f'<triangle v1="{a}" v2="{b}" v3="{c}"/>' for a, b, c in triangles)
+    attributes = ' slic3rpe:modifier="1"' if modifier else ''
+    return (f'<object id="{object_id}" type="model"{attributes}>'
+            f'<mesh><vertices>{vertices}</vertices><triangles>{faces}</triangles></mesh></object>')
+
+class TestCheckMesh(unittest.TestCase):
+    def test_closed_cube(self):
+        """Test that a closed, consistently wound cube has no errors."""
+        report = check_mesh("1", CUBE_VERTICES, CUBE_TRIANGLES)
+        self.assertEqual(report.errors(), [])
+        self.assertTrue(report.watertight and report.manifold)
+        self.assertEqual((report.vertices, report.triangles), (8, 12))
+
+    def test_flipped_face(self):
+        """Test that a face wound against its neighbours is reported on each of its edges."""
+        triangles = CUBE_TRIANGLES.copy()
+        triangles[0] = triangles[0][::-1]
+        report = check_mesh("1", CUBE_VERTICES, triangles)
+        self.assertEqual(report.inconsistent_edges, 3)
+        self.assertTrue(report.watertight and report.manifold)
+        self.assertEqual(report.errors(), ["Object 1: 3 edges with inconsistent winding"])
+
+    def test_duplicate_face(self):
+        """Test that a repeated face is a duplicate and makes its edges non-manifold."""
+        triangles = np.vstack([CUBE_TRIANGLES, CUBE_TRIANGLES[:1]])
+        report = check_mesh("1", CUBE_VERTICES, triangles)
+        self.assertEqual(report.duplicate, 1)
+        self.assertEqual(report.nonmanifold_edges, 3)
+
+    def test_open_edge(self):
+        """Test that a missing face leaves its three edges open."""
+        report = check_mesh("1", CUBE_VERTICES, CUBE_TRIANGLES[1:])
+        self.assertEqual(report.boundary_edges, 3)
+        self.assertFalse(report.watertight)
+        self.assertEqual(report.errors(), ["Object 1: 3 open edges (not watertight)"])
+
+    def test_bad_and_degenerate_triangles(self):
+        """Test that out-of-range indices and zero-area faces are counted."""
+        triangles = np.vstack([CUBE_TRIANGLES, [[0, 1, 99]], [[0, 0, 1]], [[0, 1, 0]]])
+        report = check_mesh("1", CUBE_VERTICES, triangles)
+        self.assertEqual(report.bad_indices, 1)
+        self.assertEqual(report.degenerate, 2)
+
+class TestLoadMeshes(unittest.TestCase):
+    def test_load(self):
+        """Test that every object mesh is read into arrays."""
+        meshes = load_meshes(model_xml(mesh_object(1) + mesh_object(2, CUBE_TRIANGLES[1:])))
+        self.assertEqual(sorted(meshes), ["1", "2"])
+        vertices, triangles = meshes["1"]
+        np.testing.assert_array_equal(vertices, CUBE_VERTICES)
+        np.testing.assert_array_equal(triangles, CUBE_TRIANGLES)
+        self.assertEqual(meshes["2"][1].shape, (11, 3))
+
+    def test_skip_modifiers(self):
+        """Test that modifier volumes can be left out."""
+        source = mesh_object(1) + mesh_object(2, modifier=True)
+        self.assertEqual(sorted(load_meshes(model_xml(source))), ["1", "2"])
+        self.assertEqual(sorted(load_meshes(model_xml(source), skip_modifiers=True)), ["1"])
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    suite = unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
+    result = runner.run(suite)
+    sys.exit(not result.wasSuccessful())
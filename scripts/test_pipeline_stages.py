@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+import unittest
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict
+from unittest import mock
+import artifact_cache
+from pipeline import (STAGE_CONFIG_KEYS, STAGE_GRAPH, STAGE_SCRIPTS, PipelineStage, SwatchPipeline,
+                      run_pipelines, stage_descendants)
+from run_ledger import RunLedger
+
+CONFIG = {'material': "PLA", 'brand': "Prusament", 'color': "Galaxy Black", 'nozzle_temp': 215}
+
+class RecordingPipeline:
+    """Stand-in for SwatchPipeline that records how each stage was asked to run."""
+    def __init__(self, job: str):
+        self.job = job
+        self.runs = {}
+
+    def run_stage(self, stage, upstream, force=False, deep_check=False):
+        self.runs[stage] = force
+        return Path(f"{self.job}_{stage.name}")
+
+class TestStageGraph(unittest.TestCase):
+    def test_descendants(self):
+        """Test that a stage's descendants follow the dependency graph."""
+        self.assertEqual(stage_descendants(PipelineStage.BASE_3MF),
+                         {PipelineStage.BASE_3MF, PipelineStage.MODIFIER, PipelineStage.VALIDATION})
+        self.assertEqual(stage_descendants(PipelineStage.METADATA),
+                         {PipelineStage.METADATA, PipelineStage.BASE_3MF, PipelineStage.MODIFIER,
+                          PipelineStage.VALIDATION})
+        self.assertEqual(stage_descendants(PipelineStage.BASE_MODEL) & {PipelineStage.METADATA}, set())
+
+    def test_from_stage(self):
+        """Test that --from-stage forces exactly that stage and its descendants in every pipeline."""
+        for from_stage in PipelineStage:
+            pipelines = [RecordingPipeline("a"), RecordingPipeline("b")]
+            self.assertEqual(run_pipelines(pipelines, max_workers=2, from_stage=from_stage), [True, True])
+            for pipeline in pipelines:
+                self.assertEqual(set(pipeline.runs), set(STAGE_GRAPH))
+                forced = {stage for stage, force in pipeline.runs.items() if force}
+                self.assertEqual(forced, stage_descendants(from_stage))
+
+class TestStageFingerprints(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tmp_dir = Path(self.tmp.name)
+        self.cwd = os.getcwd()
+        os.chdir(self.tmp_dir)
+        Path("swatch").mkdir()
+        Path("swatch/swatch.scad").write_text("cube(10);")
+        self.ledger = RunLedger(self.tmp_dir / "ledger.db")
+
+        # Every stage's output exists and stays the same between runs
+        self.upstream = {}
+        for stage in PipelineStage:
+            self.upstream[stage] = self.tmp_dir / "outputs" / stage.name
+            self.upstream[stage].parent.mkdir(exist_ok=True)
+            self.upstream[stage].write_text(stage.name)
+
+        for finder in ('find_openscad', 'find_prusaslicer'):
+            patcher = mock.patch(f'pipeline.{finder}', return_value=self.tmp_dir / "missing-tool")
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def pipeline(self, **changes) -> SwatchPipeline:
+        """Create a pipeline on the shared ledger, with the fingerprints of every stage computed."""
+        pipeline = SwatchPipeline({**CONFIG, **changes}, work_dir=self.tmp_dir / "work", ledger=self.ledger)
+        # Each run is a new process, so nothing is memoized from the previous one
+        with mock.patch.dict(artifact_cache._memo, clear=True):
+            pipeline.fingerprints = {stage: pipeline.stage_fingerprint(stage, self.upstream)
+                                     for stage in PipelineStage}
+        return pipeline
+
+    def complete(self, **changes) -> Dict[PipelineStage, str]:
+        """Record every stage of a pipeline as done and return its fingerprints."""
+        pipeline = self.pipeline(**changes)
+        for stage in PipelineStage:
+            pipeline.mark_stage_complete(stage, self.upstream[stage])
+        return pipeline.fingerprints
+
+    def rerun(self, **changes) -> set:
+        """Return the stages a pipeline would run again."""
+        pipeline = self.pipeline(**changes)
+        return {stage for stage in PipelineStage if pipeline.should_run_stage(stage)}
+
+    def test_unchanged_inputs_skip(self):
+        """Test that a rerun with the same inputs skips every stage."""
+        self.complete()
+        self.assertEqual(self.rerun(), set())
+
+    def test_config_change(self):
+        """Test that changing one config value reruns only the stages that read it."""
+        self.complete()
+        self.assertEqual(self.rerun(nozzle_temp=220),
+                         {stage for stage, keys in STAGE_CONFIG_KEYS.items() if "nozzle_temp" in keys})
+
+        # The colour names a different job, so compare the fingerprints directly
+        before, after = self.complete(), self.complete(color="Jet Black")
+        self.assertEqual({stage for stage in PipelineStage if before[stage] != after[stage]},
+                         {stage for stage, keys in STAGE_CONFIG_KEYS.items() if "color" in keys})
+
+    def test_scad_change(self):
+        """Test that editing a .scad file reruns the stages that read the sources."""
+        self.complete()
+        Path("swatch/swatch.scad").write_text("cube(20);")
+        self.assertEqual(self.rerun(), {PipelineStage.BASE_MODEL, PipelineStage.VALIDATION})
+
+    def test_missing_script(self):
+        """Test that a stage script that does not exist is fingerprinted instead of raising."""
+        with mock.patch.dict(STAGE_SCRIPTS, {PipelineStage.MODIFIER: ("no_such_script.py",)}):
+            self.complete()
+            self.assertEqual(self.rerun(), set())
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    suite = unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
+    result = runner.run(suite)
+    sys.exit(not result.wasSuccessful())
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+import unittest
+import sys
+import tempfile
+import io
+import json
+from pathlib import Path
+from get_material_config import find_matching_sections, get_inherited_value, resolve_batch
+import profile_index
+from profile_index import load_profile_index, index_path, read_config_file, InheritanceResolver
+from bench_inheritance import scan_inherited_value
+
+SAMPLE_BUNDLE = """\
+[vendor]
+name = Prusa Research
+config_version = 2.1.11
+
+[filament:*common*]
+cooling = 1
+filament_diameter = 1.75
+fill_density = 15%
+
+[filament:*PLA*]
+inherits = *common*
+bed_temperature = 60
+temperature = 215
+filament_type = PLA
+
+[filament:Generic PLA]
+inherits = *PLA*
+filament_vendor = Generic
+
+[filament:Generic PLA @MK4S]
+inherits = Generic PLA
+temperature = 220
+
+[filament:Prusament PLA]
+inherits = *PLA*
+filament_vendor = Prusament
+
+[print:*common*]
+layer_height = 0.2
+perimeters = 2
+
+[print:0.20mm QUALITY @MK4S]
+inherits = *common*
+perimeters = 3
+
+[printer:Original Prusa MK4S]
+printer_model = MK4S
+"""
+
+class TestProfileIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tmp_dir = Path(self.tmp.name)
+        self.bundle = self.tmp_dir / "2.1.11.ini"
+        self.bundle.write_text(SAMPLE_BUNDLE)
+        self.index_dir = self.tmp_dir / "index"
+        profile_index._loaded_indexes.clear()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_flattens_inherited_values(self):
+        """Test that values are resolved through the inheritance chain."""
+        index = load_profile_index(self.bundle, self.index_dir)
+        self.assertEqual(index.get('filament:Generic PLA', 'temperature'), '215')
+        self.assertEqual(index.get('filament:Generic PLA @MK4S', 'temperature'), '220')
+        self.assertEqual(index.get('filament:Generic PLA @MK4S', 'fill_density'), '15%')
+        self.assertEqual(index.get('print:0.20mm QUALITY @MK4S', 'layer_height'), '0.2')
+        self.assertEqual(index.get('print:0.20mm QUALITY @MK4S', 'perimeters'), '3')
+
+    def test_only_indexes_profile_sections(self):
+        """Test that vendor metadata is left out of the index."""
+        index = load_profile_index(self.bundle, self.index_dir)
+        self.assertNotIn('vendor', index)
+        self.assertIn('printer:Original Prusa MK4S', index)
+
+    def test_persists_by_content_hash(self):
+        """Test that the index is reused from disk and rebuilt when the bundle changes."""
+        index = load_profile_index(self.bundle, self.index_dir)
+        path = index_path(index.digest, self.index_dir)
+        self.assertTrue(path.exists())
+
+        profile_index._loaded_indexes.clear()
+        reloaded = load_profile_index(self.bundle, self.index_dir)
+        self.assertEqual(reloaded.digest, index.digest)
+        self.assertEqual(reloaded.sections(), index.sections())
+
+        self.bundle.write_text(SAMPLE_BUNDLE.replace('temperature = 220', 'temperature = 225'))
+        changed = load_profile_index(self.bundle, self.index_dir)
+        self.assertNotEqual(changed.digest, index.digest)
+        self.assertEqual(changed.get('filament:Generic PLA @MK4S', 'temperature'), '225')
+
+    def test_find_matching_sections(self):
+        """Test that section matching works against the index."""
+        index = load_profile_index(self.bundle, self.index_dir)
+        self.assertEqual(
+            find_matching_sections(index, 'Generic PLA', 'MK4S'),
+            ['filament:Generic PLA', 'filament:Generic PLA @MK4S']
+        )
+
+    def test_resolve_batch(self):
+        """Test that batch mode streams one result or error per request line."""
+        load_profile_index(self.bundle, self.index_dir)
+        requests = io.StringIO(
+            '{"id": "a", "filament_profile": "Generic PLA", "printer": "MK4S"}\n'
+            '\n'
+            '{"filament_profile": "Missing PLA"}\n'
+            'not json\n'
+        )
+        output = io.StringIO()
+        failures = resolve_batch(requests, output, self.bundle)
+
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(failures, 2)
+        self.assertEqual(len(results), 3)
+        self.assertEqual(results[0]['id'], 'a')
+        self.assertEqual(results[0]['config'], {'temperature': '220', 'layer_height': '0.2'})
+        self.assertIn('Missing PLA', results[1]['error'])
+        self.assertEqual(results[2]['line'], 4)
+        self.assertIn('error', results[2])
+
+    def test_resolve_batch_malformed_fields(self):
+        """Test that a request with fields of the wrong type fails alone instead of aborting the batch."""
+        load_profile_index(self.bundle, self.index_dir)
+        requests = io.StringIO(
+            '{"filament_profile": 42}\n'
+            '{"filament_profile": "Generic PLA", "printer": ["MK4S"]}\n'
+            '{"filament_profile": "Generic PLA"}\n'
+        )
+        output = io.StringIO()
+        failures = resolve_batch(requests, output, self.bundle)
+
+        results = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(failures, 2)
+        self.assertIn("'filament_profile' must be a string", results[0]['error'])
+        self.assertIn("'printer' must be a string", results[1]['error'])
+        self.assertIn('config', results[2])
+
+class TestInheritanceResolver(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.bundle = Path(self.tmp.name) / "2.1.11.ini"
+        self.bundle.write_text(SAMPLE_BUNDLE + """
+[filament:Diamond]
+inherits = Generic PLA; Prusament PLA
+
+[filament:Loop A]
+inherits = Loop B
+temperature = 200
+
+[filament:Loop B]
+inherits = Loop A
+""")
+        self.config = read_config_file(self.bundle)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_wildcard_and_variant_parents(self):
+        """Test that *PLA* and "<name> @<printer>" parents are resolved."""
+        resolver = InheritanceResolver(self.config)
+        self.assertEqual(resolver.parent_sections('filament', '*PLA*'), ['filament:*PLA*'])
+        self.assertEqual(
+            resolver.parent_sections('filament', 'Generic PLA'),
+            ['filament:Generic PLA', 'filament:Generic PLA @MK4S']
+        )
+
+    def test_matches_scanning_resolver(self):
+        """Test that every lookup agrees with the section-scanning resolver."""
+        resolver = InheritanceResolver(self.config)
+        keys = ['temperature', 'fill_density', 'filament_vendor', 'layer_height', 'missing']
+        for section in self.config.sections():
+            for key in keys:
+                with self.subTest(section=section, key=key):
+                    self.assertEqual(resolver.get(section, key),
+                                     scan_inherited_value(self.config, section, key))
+
+    def test_get_inherited_value(self):
+        """Test the get_material_config entry point, including cycles."""
+        self.assertEqual(get_inherited_value(self.config, 'filament:Diamond', 'filament_vendor'), 'Generic')
+        self.assertEqual(get_inherited_value(self.config, 'filament:Loop B', 'temperature'), '200')
+        self.assertIsNone(get_inherited_value(self.config, 'filament:Loop B', 'cooling'))
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    suite = unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
+    result = runner.run(suite)
+    sys.exit(not result.wasSuccessful())
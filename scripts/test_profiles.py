@@ -4,9 +4,9 @@ import unittest
 import json
 import sys
 from pathlib import Path
-import configparser
 import re
 from get_material_config import get_latest_config_file, get_filament_config
+from profile_index import load_profile_index
 
 class TestProfiles(unittest.TestCase):
     @classmethod
@@ -20,16 +20,14 @@ class TestProfiles(unittest.TestCase):
         
         cls.config_file = get_latest_config_file()
         cls.assertTrue(cls.config_file is not None, "No PrusaSlicer config file found")
+        cls.profile_index = load_profile_index(cls.config_file)
         
         print(f"\nUsing PrusaSlicer config: {cls.config_file}")
     
     def find_print_profile(self, profile_name):
         """Check if a print profile exists in the PrusaSlicer config."""
-        config = configparser.ConfigParser()
-        config.read(self.config_file)
-        
         pattern = f'^print:{re.escape(profile_name)}($|\\s@)'
-        return any(re.match(pattern, section) for section in config.sections())
+        return any(re.match(pattern, section) for section in self.profile_index.sections())
     
     def test_print_profiles(self):
         """Test that all configured print profiles exist."""
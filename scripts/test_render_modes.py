@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+import unittest
+import os
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+
+import numpy as np
+
+from conformance import expected_dimensions, measure, parse_scad_constants
+from generate_3mf import find_openscad, openscad_defines, render_params, run_openscad
+from mesh_check import load_meshes
+from threemf import MODEL_ENTRY
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# The longest material name allowed; its line of front text runs through the hole features
+LONG_MATERIAL = "Polycarbonate Carbon Fiber XL1"
+
+def merged_mesh(path: Path):
+    """Load every mesh object of a 3MF into one vertex and triangle array."""
+    with zipfile.ZipFile(path) as archive, archive.open(MODEL_ENTRY) as model:
+        meshes = list(load_meshes(model).values())
+    offsets = np.cumsum([0] + [len(vertices) for vertices, _ in meshes[:-1]])
+    return (np.concatenate([vertices for vertices, _ in meshes]),
+            np.concatenate([triangles + offset for (_, triangles), offset in zip(meshes, offsets)]))
+
+@unittest.skipUnless((REPO_ROOT / "BOSL2" / "std.scad").exists() and find_openscad(),
+                     "needs OpenSCAD and the BOSL2 submodule")
+class TestRenderModes(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tmp_dir = Path(self.tmp.name)
+        self.cwd = os.getcwd()
+        os.chdir(REPO_ROOT)
+        self.openscad = find_openscad()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.tmp.cleanup()
+
+    def test_text_mode_matches_full_render(self):
+        """Test that cutting the text out of the body mesh gives the same swatch as a full render."""
+        defines = openscad_defines(render_params(LONG_MATERIAL, "Generic", "Natural",
+                                                 temperature=215, layer_height=0.2))
+        body, full, text = (self.tmp_dir / name for name in ("body.stl", "full.3mf", "text.3mf"))
+        self.assertTrue(run_openscad(self.openscad, body, "binstl", ["-D", 'RENDER_MODE="body"']))
+        self.assertTrue(run_openscad(self.openscad, full, "3mf", defines))
+        self.assertTrue(run_openscad(self.openscad, text, "3mf", defines + [
+            "-D", 'RENDER_MODE="text"', "-D", f'BODY_FILE="{body.as_posix()}"']))
+
+        inner_path = expected_dimensions(parse_scad_constants())['inner_path']
+        full_metrics, text_metrics = (measure(*merged_mesh(path), inner_path) for path in (full, text))
+        np.testing.assert_allclose(text_metrics['size'], full_metrics['size'], atol=1e-3)
+        self.assertAlmostEqual(text_metrics['volume'], full_metrics['volume'], delta=1e-3 * full_metrics['volume'])
+        self.assertAlmostEqual(text_metrics['area'], full_metrics['area'], delta=5e-3 * full_metrics['area'])
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    suite = unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
+    result = runner.run(suite)
+    sys.exit(not result.wasSuccessful())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+import unittest
+import sys
+import tempfile
+from multiprocessing import Pool
+from pathlib import Path
+from run_ledger import RunLedger
+
+def record_many(args):
+    """Record a batch of stages from a separate process."""
+    path, worker, count = args
+    ledger = RunLedger(path)
+    for i in range(count):
+        ledger.register_job(f"job{worker}_{i}", {'worker': worker})
+        ledger.record(f"job{worker}_{i}", "BASE_MODEL", "done", duration=0.1, exit_status=0)
+    return count
+
+class TestRunLedger(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "ledger.db"
+        self.ledger = RunLedger(self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_record_keeps_unset_fields(self):
+        """Test that a later record only overwrites the fields it sets."""
+        self.ledger.record("PLA", "BASE_MODEL", "done", fingerprint="abc", artifact=Path("base.3mf"))
+        self.ledger.record("PLA", "BASE_MODEL", "done", duration=2.5, exit_status=0)
+        row = self.ledger.stages("PLA")["BASE_MODEL"]
+        self.assertEqual((row['fingerprint'], row['artifact'], row['duration']), ("abc", "base.3mf", 2.5))
+
+        self.ledger.record("PLA", "BASE_MODEL", "failed", exit_status=1, message="boom")
+        row = self.ledger.stages("PLA")["BASE_MODEL"]
+        self.assertEqual((row['status'], row['exit_status'], row['message']), ("failed", 1, "boom"))
+
+    def test_pending(self):
+        """Test that jobs with missing or failed stages are reported as left to build."""
+        run_id = self.ledger.start_run(["pipeline.py"])
+        for job in ("PLA", "PETG", "ASA"):
+            self.ledger.register_job(job, {'material': job}, run_id)
+        self.ledger.record("PLA", "BASE_MODEL", "done")
+        self.ledger.record("PLA", "VALIDATION", "done")
+        self.ledger.record("PETG", "BASE_MODEL", "done")
+        self.ledger.record("PETG", "VALIDATION", "failed")
+        self.ledger.finish_run(run_id, False)
+
+        self.assertEqual(self.ledger.pending(["BASE_MODEL", "VALIDATION"]),
+                         {'ASA': ["BASE_MODEL", "VALIDATION"], 'PETG': ["VALIDATION"]})
+        self.assertEqual(self.ledger.jobs()['ASA'], {'material': "ASA"})
+        self.assertEqual(self.ledger.summary(), {'done': 3, 'failed': 1})
+
+    def test_duration_history(self):
+        """Test that durations average exactly at first and then as a moving average."""
+        for duration in (10.0, 20.0, 30.0):
+            self.ledger.record_duration("slice", "Original Prusa XL IS", "0.20mm QUALITY XL", 2, duration)
+        self.ledger.record_duration("slice", "Original Prusa MINI+", "0.20mm QUALITY MINI", 2, 5.0)
+        history = self.ledger.durations()
+        self.assertAlmostEqual(history[("slice", "Original Prusa XL IS", "0.20mm QUALITY XL", 2)], 20.0)
+        self.assertEqual(history[("slice", "Original Prusa MINI+", "0.20mm QUALITY MINI", 2)], 5.0)
+
+        for _ in range(3):
+            self.ledger.record_duration("slice", "Original Prusa XL IS", "0.20mm QUALITY XL", 2, 30.0)
+        # From the fourth run on, each run moves the mean 0.3 of the way
+        self.assertAlmostEqual(self.ledger.durations()[("slice", "Original Prusa XL IS", "0.20mm QUALITY XL", 2)],
+                               30.0 - 10.0 * 0.7 ** 3)
+
+    def test_concurrent_processes(self):
+        """Test that several processes can write the ledger at once without losing updates."""
+        with Pool(4) as pool:
+            written = sum(pool.map(record_many, [(self.path, worker, 25) for worker in range(4)]))
+        self.assertEqual(written, 100)
+        self.assertEqual(len(self.ledger.jobs()), 100)
+        self.assertEqual(self.ledger.summary(), {'done': 100})
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    suite = unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
+    result = runner.run(suite)
+    sys.exit(not result.wasSuccessful())
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+import unittest
+import io
+import sys
+import tempfile
+import zipfile
+from pathlib import Path
+from unittest import mock
+from threemf import CONFIG_ENTRY, MODEL_ENTRY, copy_entry_raw, read_3mf_config, repackage_3mf, write_3mf_config
+
+MODEL = b'<?xml version="1.0"?><model unit="millimeter"><resources/><build/></model>' * 50
+
+def write_source(path: Path):
+    """Write a minimal base 3MF like OpenSCAD's."""
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", b'<Types/>')
+        archive.writestr(MODEL_ENTRY, MODEL)
+
+class Unseekable(io.RawIOBase):
+    """A write-only stream that cannot tell its position, so zipfile writes data descriptors."""
+    def __init__(self, sink: io.BytesIO):
+        self.sink = sink
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self.sink.write(data)
+
+    def tell(self):
+        raise OSError("unseekable")
+
+def mixed_archive() -> bytes:
+    """Return an archive with a stored entry, a deflated entry and entries with data descriptors."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        archive.writestr("stored.txt", b"stored " * 100, compress_type=zipfile.ZIP_STORED)
+        archive.writestr(MODEL_ENTRY, MODEL, compress_type=zipfile.ZIP_DEFLATED)
+    streamed = io.BytesIO()
+    with zipfile.ZipFile(Unseekable(streamed), 'w', zipfile.ZIP_DEFLATED) as archive:
+        with zipfile.ZipFile(buffer) as source:
+            for info in source.infolist():
+                archive.writestr(info, source.read(info))
+        with archive.open("descriptor.bin", 'w') as entry:
+            entry.write(bytes(range(256)) * 40)
+    return streamed.getvalue()
+
+class TestRawCopy(unittest.TestCase):
+    def test_source_has_descriptors(self):
+        """Test that the streamed source really uses data descriptors (flag bit 3)."""
+        with zipfile.ZipFile(io.BytesIO(mixed_archive())) as source:
+            self.assertTrue(all(info.flag_bits & 0x08 for info in source.infolist()))
+
+    def test_copy_entries(self):
+        """Test that stored, deflated and descriptor entries copy raw into a valid archive."""
+        data = mixed_archive()
+        target_buffer = io.BytesIO()
+        with zipfile.ZipFile(io.BytesIO(data)) as source, zipfile.ZipFile(target_buffer, 'w') as target:
+            for info in source.infolist():
+                copy_entry_raw(source, target, info)
+            target.writestr("added.txt", b"added")
+
+        with zipfile.ZipFile(io.BytesIO(data)) as source, zipfile.ZipFile(target_buffer) as target:
+            self.assertIsNone(target.testzip())
+            self.assertEqual(target.namelist(), source.namelist() + ["added.txt"])
+            for info in source.infolist():
+                copied = target.getinfo(info.filename)
+                self.assertEqual((copied.compress_type, copied.CRC), (info.compress_type, info.CRC))
+                self.assertFalse(copied.flag_bits & 0x08)
+                self.assertEqual(target.read(info.filename), source.read(info.filename))
+
+    def test_fallback(self):
+        """Test that entries the raw path does not handle are decompressed and written again."""
+        data = mixed_archive()
+        target_buffer = io.BytesIO()
+        with zipfile.ZipFile(io.BytesIO(data)) as source, zipfile.ZipFile(target_buffer, 'w') as target:
+            with mock.patch('threemf.raw_copy_supported', return_value=False):
+                for info in source.infolist():
+                    copy_entry_raw(source, target, info)
+        with zipfile.ZipFile(io.BytesIO(data)) as source, zipfile.ZipFile(target_buffer) as target:
+            self.assertIsNone(target.testzip())
+            for info in source.infolist():
+                self.assertEqual(target.getinfo(info.filename).compress_type, info.compress_type)
+                self.assertEqual(target.read(info.filename), source.read(info.filename))
+
+class TestThreeMF(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tmp_dir = Path(self.tmp.name)
+        self.base = self.tmp_dir / "base.3mf"
+        write_source(self.base)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_conversion_is_deterministic(self):
+        """Test that converting the same base twice, at different times, gives identical bytes."""
+        settings = {'printer_model': "MK4S", 'ironing': "1"}
+        first, second = self.tmp_dir / "first.3mf", self.tmp_dir / "second.3mf"
+        with mock.patch('time.time', return_value=1_700_000_000):
+            write_3mf_config(self.base, first, settings)
+        with mock.patch('time.time', return_value=1_800_000_000):
+            write_3mf_config(self.base, second, settings)
+        self.assertEqual(first.read_bytes(), second.read_bytes())
+
+    def test_settings_embedded(self):
+        """Test that settings merge with the embedded ones and other entries are kept."""
+        first = self.tmp_dir / "first.3mf"
+        write_3mf_config(self.base, first, {'ironing': "0", 'layer_height': "0.2"})
+        second = self.tmp_dir / "second.3mf"
+        write_3mf_config(first, second, {'ironing': "1"})
+        self.assertEqual(read_3mf_config(second), {'ironing': "1", 'layer_height': "0.2"})
+        with zipfile.ZipFile(second) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.read(MODEL_ENTRY), MODEL)
+            self.assertEqual(archive.namelist().count(CONFIG_ENTRY), 1)
+
+    def test_repackage_streamed_source(self):
+        """Test repackaging a 3MF whose entries carry data descriptors."""
+        source, dest = self.tmp_dir / "streamed.3mf", self.tmp_dir / "dest.3mf"
+        source.write_bytes(mixed_archive())
+        repackage_3mf(source, dest, {"Metadata/extra.txt": "extra"})
+        with zipfile.ZipFile(dest) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.read("descriptor.bin"), bytes(range(256)) * 40)
+            self.assertEqual(archive.read("Metadata/extra.txt"), b"extra")
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    suite = unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
+    result = runner.run(suite)
+    sys.exit(not result.wasSuccessful())
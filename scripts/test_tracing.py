@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+
+import unittest
+import os
+import sys
+import tempfile
+from pathlib import Path
+from unittest import mock
+from tracing import chrome_trace, configure, read_trace, span, traced, traced_run
+
+class TestTracing(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tmp_dir = Path(self.tmp.name)
+        self.trace = self.tmp_dir / "trace.jsonl"
+        self.environ = mock.patch.dict(os.environ)
+        self.environ.start()
+        configure(self.trace)
+
+    def tearDown(self):
+        self.environ.stop()
+        self.tmp.cleanup()
+
+    def test_nested_spans(self):
+        """Test that spans nest, record their outputs and are written as they end."""
+        output = self.tmp_dir / "out.bin"
+        with span("build", "build", jobs=1) as outer:
+            with span("render", "render") as inner:
+                output.write_bytes(b"x" * 100)
+                inner.add_outputs(output)
+        records = {r['name']: r for r in read_trace(self.trace)}
+        self.assertEqual(list(records), ["render", "build"])
+        self.assertEqual(records['render']['parent'], outer.id)
+        self.assertEqual(records['render']['outputs'], {str(output): 100})
+        self.assertEqual(records['build']['args'], {'jobs': 1})
+        self.assertLessEqual(records['render']['wall_s'], records['build']['wall_s'])
+
+    def test_failure(self):
+        """Test that an exception or a failed result marks the span failed."""
+        with self.assertRaises(RuntimeError):
+            with span("broken"):
+                raise RuntimeError("boom")
+
+        @traced("render")
+        def render():
+            return None
+
+        render()
+        records = read_trace(self.trace)
+        self.assertEqual([(r['name'], r['status']) for r in records], [("broken", "failed"), ("render", "failed")])
+        self.assertEqual(records[0]['args']['error'], "boom")
+
+    def test_subprocess_usage(self):
+        """Test that a child process's CPU time, peak RSS and output are captured."""
+        script = "b = bytearray(64 * 1024 * 1024); import time; t = time.process_time()\n" \
+                 "while time.process_time() - t < 0.2: pass\nprint('done')"
+        with span("job") as job:
+            result = traced_run([sys.executable, "-c", script], name="burn")
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stdout, "done\n")
+        burn, parent = read_trace(self.trace)
+        self.assertEqual(burn['parent'], job.id)
+        self.assertGreaterEqual(burn['child_cpu_s'], 0.2)
+        self.assertGreater(burn['max_rss_kb'], 64 * 1024)
+        # Usage rolls up into the enclosing span
+        self.assertEqual(parent['child_cpu_s'], burn['child_cpu_s'])
+
+    def test_child_process_spans(self):
+        """Test that spans of a traced child process join the same trace under the launching span."""
+        script = "from tracing import span\nwith span('inner'): pass"
+        with mock.patch.dict(os.environ, PYTHONPATH=str(Path(__file__).parent.resolve())):
+            with span("launch") as launch:
+                traced_run([sys.executable, "-c", script], name="child")
+        records = {r['name']: r for r in read_trace(self.trace)}
+        self.assertEqual(records['inner']['parent'], records['child']['id'])
+        self.assertNotEqual(records['inner']['pid'], records['child']['pid'])
+        self.assertEqual(records['child']['parent'], launch.id)
+
+    def test_failed_command(self):
+        """Test that a non-zero exit marks the subprocess span failed."""
+        result = traced_run([sys.executable, "-c", "import sys; sys.exit(3)"])
+        self.assertEqual(result.returncode, 3)
+        record, = read_trace(self.trace)
+        self.assertEqual(record['status'], "failed")
+        self.assertEqual(record['args']['returncode'], 3)
+
+    def test_chrome_trace(self):
+        """Test the conversion to complete and process-name trace events."""
+        with span("render", "render"):
+            pass
+        events = chrome_trace(read_trace(self.trace))['traceEvents']
+        self.assertEqual([e['ph'] for e in events], ["X", "M"])
+        self.assertEqual(events[0]['name'], "render")
+        self.assertEqual(events[0]['pid'], os.getpid())
+        self.assertIn('child_cpu_s', events[0]['args'])
+        self.assertIsInstance(events[0]['ts'], int)
+
+    def test_new_trace(self):
+        """Test that configuring a trace file starts it afresh."""
+        with span("first"):
+            pass
+        configure(self.trace)
+        with span("second"):
+            pass
+        self.assertEqual([r['name'] for r in read_trace(self.trace)], ["second"])
+
+    def test_disabled(self):
+        """Test that nothing is written when tracing is off."""
+        configure(None)
+        with span("quiet"):
+            pass
+        self.assertEqual(traced_run([sys.executable, "-c", "print(1)"]).stdout, "1\n")
+        self.assertFalse(self.trace.exists())
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    suite = unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
+    result = runner.run(suite)
+    sys.exit(not result.wasSuccessful())
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+import unittest
+import sys
+import tempfile
+import tracemalloc
+import zipfile
+from pathlib import Path
+from validate import validate_base_model, validate_model_file, validate_modifier
+
+MODEL_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<model unit="millimeter" xmlns="http://schemas.microsoft.com/3dmanufacturing/core/2015/02"'
+    ' xmlns:slic3rpe="http://schemas.slic3r.org/3mf/2017/06">\n'
+)
+
+def mesh(vertices: int = 3, triangles: int = 1) -> str:
+    """Return a mesh element with the given number of vertices and triangles."""
+    return ('<mesh><vertices>' + '<vertex x="0" y="0" z="0"/>' * vertices + '</vertices>'
+            '<triangles>' + '<triangle v1="0" v2="1" v3="2"/>' * triangles + '</triangles></mesh>')
+
+def model(objects: str, items: str = '<item objectid="1"/>') -> str:
+    """Return a model document with the given objects and build items."""
+    return f'{MODEL_HEADER}<resources>{objects}</resources><build>{items}</build></model>'
+
+class TestValidate(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tmp_dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_3mf(self, model_xml: str, name: str = "swatch.3mf") -> Path:
+        path = self.tmp_dir / name
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('3D/3dmodel.model', model_xml)
+            archive.writestr('Metadata/Slic3r_PE.config', '; temperature = 215\n')
+        return path
+
+    def test_valid_base_model(self):
+        """Test that a complete model passes the base checks."""
+        path = self.write_3mf(model(f'<object id="1" type="model">{mesh()}</object>'))
+        self.assertEqual(validate_base_model(path), [])
+
+    def test_missing_sections(self):
+        """Test that missing resources and build sections are reported."""
+        path = self.write_3mf(f'{MODEL_HEADER}</model>')
+        self.assertEqual(validate_base_model(path), ["Missing resources element", "Missing build element"])
+
+    def test_invalid_xml(self):
+        """Test that malformed XML is reported instead of raising."""
+        errors = validate_base_model(self.write_3mf(f'{MODEL_HEADER}<resources></model>'))
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].startswith("Invalid XML structure"))
+
+    def test_model_file_checks(self):
+        """Test object attribute and build item checks on an extracted model."""
+        model_file = self.tmp_dir / "3dmodel.model"
+        model_file.write_text(model(f'<object id="1">{mesh()}</object><object type="model"/>', items=''))
+        self.assertEqual(validate_model_file(model_file), [
+            "Object missing required type attribute",
+            "Object missing required id attribute",
+            "No items found in build",
+        ])
+
+    def test_modifier_checks(self):
+        """Test that modifiers are found and their meshes checked in the same pass."""
+        good = self.write_3mf(model(
+            f'<object id="1" type="model">{mesh()}</object>'
+            f'<object id="2" type="other" slic3rpe:modifier="1">{mesh()}</object>'), "good.3mf")
+        self.assertEqual(validate_modifier(good), [])
+
+        empty = self.write_3mf(model(
+            f'<object id="2" type="other" slic3rpe:modifier="1">{mesh(vertices=0)}</object>'
+            '<object id="3" type="other" slic3rpe:modifier="1"/>'), "empty.3mf")
+        self.assertEqual(validate_modifier(empty),
+                         ["Modifier mesh has no vertices", "Modifier missing mesh element"])
+
+        none = self.write_3mf(model(f'<object id="1" type="model">{mesh()}</object>'), "none.3mf")
+        self.assertEqual(validate_modifier(none), ["No modifier objects found"])
+
+    def test_memory_is_bounded(self):
+        """Test that peak memory does not grow with the mesh size."""
+        def peak(vertices):
+            path = self.write_3mf(model(f'<object id="1" type="model">{mesh(vertices, vertices)}</object>'),
+                                  f"mesh{vertices}.3mf")
+            tracemalloc.start()
+            errors = validate_base_model(path)
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            self.assertEqual(errors, [])
+            return peak_bytes
+
+        self.assertLess(peak(50000), 4 * peak(500))
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    suite = unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
+    result = runner.run(suite)
+    sys.exit(not result.wasSuccessful())
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+import unittest
+import os
+import sys
+import tempfile
+import time
+from multiprocessing import Process
+from pathlib import Path
+from unittest import mock
+from pipeline import PipelineStage
+from run_ledger import SHARED_JOURNAL, RunLedger
+from work_queue import WorkQueue, build_swatch, run_worker
+
+def config(color: str) -> dict:
+    """Return the pipeline config of a Generic PLA swatch."""
+    return {'material': "PLA", 'brand': "Generic", 'color': color, 'nozzle_temp': 215}
+
+class FakeBuild:
+    """Build a swatch by writing its color to a file, logging every build."""
+    def __init__(self, tmp_dir: Path, crash_color: str = ""):
+        self.tmp_dir = tmp_dir
+        self.crash_color = crash_color
+
+    def __call__(self, swatch: dict, token: int) -> dict:
+        marker = self.tmp_dir / f"crashed_{swatch['color']}"
+        if swatch['color'] == self.crash_color and not marker.exists():
+            # Die mid-build, holding the lease, the first time this swatch is built
+            marker.touch()
+            os._exit(1)
+        with open(self.tmp_dir / "builds.log", 'a') as f:
+            f.write(f"{swatch['color']}\n")
+        time.sleep(0.05)
+        path = self.tmp_dir / f"build_{os.getpid()}_{swatch['color']}.3mf"
+        path.write_text(f"{swatch['color']} by {os.getpid()}")
+        return {'3mf': path}
+
+def work(tmp_dir: Path, crash_color: str):
+    """Run one worker process until the queue is drained."""
+    queue = WorkQueue(tmp_dir / "queue.db", lease_seconds=0.6)
+    counts = run_worker(queue, FakeBuild(tmp_dir, crash_color), publish_dir=tmp_dir / "published", poll=0.05)
+    sys.exit(1 if counts['failed'] or counts['lost'] else 0)
+
+class TestWorkQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tmp_dir = Path(self.tmp.name)
+        self.queue = WorkQueue(self.tmp_dir / "queue.db", lease_seconds=0.2, max_attempts=2)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_lease_is_exclusive(self):
+        """Test that tasks are leased oldest first, each to one worker."""
+        for color in ("Red", "Blue"):
+            self.assertTrue(self.queue.enqueue(config(color)))
+        self.assertFalse(self.queue.enqueue(config("Red")))
+        first, second = self.queue.lease("a"), self.queue.lease("b")
+        self.assertEqual((first.job, second.job), ("PLA_Generic_Red", "PLA_Generic_Blue"))
+        self.assertEqual(second.config['color'], "Blue")
+        self.assertIsNone(self.queue.lease("c"))
+        self.assertEqual(self.queue.summary(), {'leased': 2})
+
+    def test_expired_lease_is_fenced(self):
+        """Test that a worker whose lease expired can neither renew it nor publish."""
+        self.queue.enqueue(config("Red"))
+        stale = self.queue.lease("a")
+        self.assertTrue(self.queue.heartbeat(stale))
+        time.sleep(0.3)
+        current = self.queue.lease("b")
+        self.assertEqual((current.job, current.token), (stale.job, 2))
+        self.assertFalse(self.queue.heartbeat(stale))
+
+        artifact = self.tmp_dir / "stale.3mf"
+        artifact.write_text("stale")
+        self.assertFalse(self.queue.publish(stale, {'3mf': artifact}, self.tmp_dir / "published"))
+        artifact.write_text("current")
+        self.assertTrue(self.queue.publish(current, {'3mf': artifact}, self.tmp_dir / "published"))
+        self.assertEqual(os.listdir(self.tmp_dir / "published"), ["PLA_Generic_Red.3mf"])
+        self.assertEqual((self.tmp_dir / "published" / "PLA_Generic_Red.3mf").read_text(), "current")
+        self.assertEqual(self.queue.summary(), {'done': 1})
+
+    def test_attempts_run_out(self):
+        """Test that a task failing every attempt is marked failed and can be requeued."""
+        self.queue.enqueue(config("Red"))
+        self.queue.fail(self.queue.lease("a"), "render failed")
+        self.queue.lease("a")
+        time.sleep(0.3)
+        self.assertIsNone(self.queue.lease("b"))
+        task = self.queue.tasks()["PLA_Generic_Red"]
+        self.assertEqual((task['status'], task['attempts'], task['message']), ("failed", 2, "lease expired"))
+
+        self.assertTrue(self.queue.enqueue(config("Red")))
+        self.assertEqual(self.queue.lease("a").token, 1)
+
+    def test_shared_journal(self):
+        """Test that a queue shared by several hosts uses the rollback journal instead of WAL."""
+        shared = WorkQueue(self.tmp_dir / "shared.db", journal_mode=SHARED_JOURNAL)
+        shared.enqueue(config("Red"))
+        self.assertEqual(shared.connection().execute("PRAGMA journal_mode").fetchone()[0], "delete")
+        self.assertFalse((self.tmp_dir / "shared.db-wal").exists())
+        self.assertEqual(self.queue.connection().execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
+    def test_leases_build_apart(self):
+        """Test that each lease builds in its own directory and does not restore another lease's stages."""
+        ledger = RunLedger(self.tmp_dir / "ledger.db")
+        ledger.register_job("PLA_Generic_Red", config("Red"))
+        ledger.record("PLA_Generic_Red", "BASE_MODEL", "done", fingerprint="0" * 64,
+                      artifact=str(self.tmp_dir / "work" / "PLA_Generic_Red" / "1" / "base" / "red.3mf"))
+        pipelines = []
+
+        def run(started, *args, **kwargs):
+            pipelines.extend(started)
+            return [False]
+
+        with mock.patch('pipeline.find_openscad', return_value=Path("openscad")), \
+                mock.patch('pipeline.find_prusaslicer', return_value=Path("prusa-slicer")), \
+                mock.patch('work_queue.run_pipelines', side_effect=run):
+            for token in (1, 2):
+                self.assertIsNone(build_swatch(config("Red"), token, self.tmp_dir / "work", None, ledger))
+        self.assertEqual([pipeline.validation_dir for pipeline in pipelines],
+                         [self.tmp_dir / "work" / "PLA_Generic_Red" / token for token in ("1", "2")])
+        self.assertEqual(pipelines[1].work_dir, self.tmp_dir / "work" / "PLA_Generic_Red" / "2" / "tmp")
+        self.assertFalse(any(pipeline.stages[PipelineStage.BASE_MODEL].completed for pipeline in pipelines))
+
+    def test_crashed_worker_recovered(self):
+        """Test that workers in separate processes publish every task once, despite one dying mid-build."""
+        queue = WorkQueue(self.tmp_dir / "queue.db")
+        colors = ["Red", "Blue", "Green", "Black", "White", "Grey"]
+        for color in colors:
+            queue.enqueue(config(color))
+        workers = [Process(target=work, args=(self.tmp_dir, "Green")) for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+        # The worker that leased Green died; the others drained the queue
+        self.assertEqual(sorted(worker.exitcode for worker in workers), [0, 0, 1])
+
+        self.assertEqual(queue.summary(), {'done': len(colors)})
+        builds = (self.tmp_dir / "builds.log").read_text().split()
+        self.assertEqual(sorted(builds), sorted(colors))
+        self.assertEqual(queue.tasks()["PLA_Generic_Green"]['attempts'], 2)
+        published = self.tmp_dir / "published"
+        self.assertEqual(sorted(os.listdir(published)), sorted(f"PLA_Generic_{c}.3mf" for c in colors))
+        for color in colors:
+            self.assertTrue((published / f"PLA_Generic_{color}.3mf").read_text().startswith(color))
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner(verbosity=2)
+    suite = unittest.TestLoader().loadTestsFromModule(sys.modules[__name__])
+    result = runner.run(suite)
+    sys.exit(not result.wasSuccessful())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+
+import argparse
+import copy
+import os
+import struct
+import sys
+import zipfile
+from pathlib import Path
+from typing import Dict, Union
+from xml.etree.ElementTree import XMLPullParser
+
+# Project-wide PrusaSlicer settings stored inside a 3MF
+CONFIG_ENTRY = "Metadata/Slic3r_PE.config"
+
+# The mesh part every 3MF must contain
+MODEL_ENTRY = "3D/3dmodel.model"
+
+# ZipFile internals copy_entry_raw() updates on the target archive
+RAW_COPY_ATTRIBUTES = ('fp', 'filelist', 'NameToInfo', 'start_dir')
+
+# Timestamp of written entries, so equal inputs give byte-identical archives (and cache keys)
+ENTRY_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+def raw_copy_supported(source: zipfile.ZipFile, target: zipfile.ZipFile, info: zipfile.ZipInfo) -> bool:
+    """Return whether copy_entry_raw() can copy an entry through zipfile's internals.
+
+    The raw copy uses ZipFile attributes that are not public API. Encrypted
+    and Zip64-sized entries, and zipfile versions without those attributes,
+    take the decompressing path instead.
+    """
+    internals = (hasattr(zipfile, 'sizeFileHeader') and hasattr(info, 'FileHeader')
+                 and all(hasattr(target, a) for a in RAW_COPY_ATTRIBUTES)
+                 and getattr(source, 'fp', None) is not None and target.fp is not None)
+    return (internals and not info.flag_bits & 0x01
+            and max(info.file_size, info.compress_size, info.header_offset) < zipfile.ZIP64_LIMIT)
+
+def copy_entry_raw(source: zipfile.ZipFile, target: zipfile.ZipFile, info: zipfile.ZipInfo):
+    """Copy one entry's compressed bytes into another archive without decompressing them.
+
+    Entries raw_copy_supported() rejects are decompressed and written again,
+    keeping their name, timestamp and compression.
+    """
+    if not raw_copy_supported(source, target, info):
+        entry = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+        entry.compress_type = info.compress_type
+        entry.external_attr = info.external_attr
+        target.writestr(entry, source.read(info))
+        return
+
+    # Skip the source's local header to reach the entry data
+    source.fp.seek(info.header_offset)
+    header = source.fp.read(zipfile.sizeFileHeader)
+    name_length, extra_length = struct.unpack('<HH', header[26:30])
+    source.fp.seek(info.header_offset + zipfile.sizeFileHeader + name_length + extra_length)
+
+    entry = copy.copy(info)
+    # Sizes and CRC are known up front, so the copy needs no trailing data descriptor
+    entry.flag_bits &= ~0x08
+    entry.header_offset = target.fp.tell()
+    target.fp.write(entry.FileHeader())
+    remaining = info.compress_size
+    while remaining:
+        chunk = source.fp.read(min(remaining, 1024 * 1024))
+        if not chunk:
+            raise zipfile.BadZipFile(f"Truncated entry {info.filename}")
+        target.fp.write(chunk)
+        remaining -= len(chunk)
+
+    target.filelist.append(entry)
+    target.NameToInfo[entry.filename] = entry
+    target.start_dir = target.fp.tell()
+
+def check_xml_entry(archive: zipfile.ZipFile, name: str) -> str:
+    """Check that an archive entry is well-formed XML without extracting or loading it whole.
+
+    Returns the root element's tag; raises xml.etree.ElementTree.ParseError.
+    """
+    parser = XMLPullParser(events=('start', 'end'))
+    root = None
+    with archive.open(name) as entry:
+        for chunk in iter(lambda: entry.read(1024 * 1024), b''):
+            parser.feed(chunk)
+            for event, element in parser.read_events():
+                if root is None:
+                    root = element.tag
+                if event == 'end':
+                    element.clear()  # Keep memory flat on large meshes
+    parser.close()
+    return root
+
+def repackage_3mf(src: Path, dest: Path, entries: Dict[str, Union[bytes, str, Path]]):
+    """Copy a 3MF, adding or replacing the given entries.
+
+    Unchanged entries are copied compressed, byte for byte. Values are entry
+    contents, or paths of files to store. Written entries get a fixed
+    timestamp, so the output only depends on the inputs.
+    """
+    dest = Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp_dest = dest.with_name(f".{dest.name}.{os.getpid()}.tmp")
+
+    with zipfile.ZipFile(src) as archive, zipfile.ZipFile(tmp_dest, 'w', zipfile.ZIP_DEFLATED) as output:
+        for info in archive.infolist():
+            if info.filename not in entries:
+                copy_entry_raw(archive, output, info)
+        for name, content in entries.items():
+            info = zipfile.ZipInfo(name, date_time=ENTRY_DATE_TIME)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+            output.writestr(info, Path(content).read_bytes() if isinstance(content, Path) else content)
+
+    os.replace(tmp_dest, dest)
+
+def parse_config(text: str) -> Dict[str, str]:
+    """Parse the "; key = value" lines of a Slic3r_PE.config."""
+    settings = {}
+    for line in text.splitlines():
+        if not line.startswith('; ') or ' = ' not in line:
+            continue
+        key, value = line[2:].split(' = ', 1)
+        settings[key.strip()] = value
+    return settings
+
+def format_config(settings: Dict[str, str]) -> str:
+    """Serialize settings the way PrusaSlicer writes Slic3r_PE.config."""
+    lines = ["; generated by generate_3mf.py", ""]
+    lines.extend(f"; {key} = {value}" for key, value in sorted(settings.items()))
+    return "\n".join(lines) + "\n"
+
+def read_3mf_config(path: Path) -> Dict[str, str]:
+    """Return the settings embedded in a 3MF, or an empty dict if it has none."""
+    with zipfile.ZipFile(path) as archive:
+        if CONFIG_ENTRY not in archive.namelist():
+            return {}
+        return parse_config(archive.read(CONFIG_ENTRY).decode('utf-8'))
+
+def write_3mf_config(src: Path, dest: Path, settings: Dict[str, str], merge: bool = True):
+    """Copy a 3MF, embedding settings in Metadata/Slic3r_PE.config.
+
+    Every other entry is copied across unchanged. With merge, settings
+    already embedded in src are kept unless overridden.
+    """
+    embedded = read_3mf_config(src) if merge else {}
+    embedded.update(settings)
+    repackage_3mf(src, dest, {CONFIG_ENTRY: format_config(embedded)})
+
+def main():
+    parser = argparse.ArgumentParser(description='Show or set the PrusaSlicer settings embedded in a 3MF')
+    parser.add_argument('input', type=Path, help='3MF file')
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                      help='Setting to embed (repeatable)')
+    parser.add_argument('--output', type=Path, help='Write the result here instead of modifying the input')
+    args = parser.parse_args()
+
+    if not args.set:
+        for key, value in sorted(read_3mf_config(args.input).items()):
+            print(f"{key} = {value}")
+        return 0
+
+    settings = {}
+    for setting in args.set:
+        if '=' not in setting:
+            print(f"Error: Expected KEY=VALUE, got {setting!r}", file=sys.stderr)
+            return 1
+        key, value = setting.split('=', 1)
+        settings[key.strip()] = value.strip()
+    write_3mf_config(args.input, args.output or args.input, settings)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Spans are appended to the file named here, so tool processes launched by a
+# traced driver write into the same trace
+TRACE_ENV = "SWATCH_TRACE"
+# The span that launched a traced process, which its outermost spans nest in
+PARENT_ENV = "SWATCH_TRACE_PARENT"
+
+# Default trace location for the --trace flags
+TRACE_FILE = Path(".cache/trace.jsonl")
+
+_lock = threading.Lock()
+_local = threading.local()
+_ids = itertools.count(1)
+
+def max_rss_kb(usage) -> int:
+    """Return a rusage's peak resident set size in KiB (macOS reports bytes)."""
+    return usage.ru_maxrss // 1024 if sys.platform == "darwin" else usage.ru_maxrss
+
+class Span:
+    """One timed piece of work, with the resources its child processes used."""
+    def __init__(self, name: str, category: str, args: Dict, parent: Optional['Span']):
+        self.id = f"{os.getpid()}:{next(_ids)}"
+        self.name = name
+        self.category = category
+        self.args = args
+        self.parent = parent
+        self.parent_id = parent.id if parent else os.environ.get(PARENT_ENV)
+        self.outputs = []
+        self.status = "ok"
+        self.child_cpu_s = 0.0
+        self.max_rss_kb = 0
+        self.start = time.time()
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+
+    def add_outputs(self, *paths):
+        """Record files or directories this span produced; their sizes are taken when it ends."""
+        self.outputs.extend(Path(p) for p in paths if p)
+
+    def set(self, **args):
+        """Attach extra arguments to the span."""
+        self.args.update(args)
+
+    def add_child_usage(self, cpu_s: float, rss_kb: int):
+        """Account a finished child process or sub-span to this span."""
+        with _lock:
+            self.child_cpu_s += cpu_s
+            self.max_rss_kb = max(self.max_rss_kb, rss_kb)
+
+    def record(self) -> Dict:
+        """Return the span as a trace record."""
+        outputs = {}
+        for path in self.outputs:
+            if path.is_dir():
+                outputs[str(path)] = sum(p.stat().st_size for p in path.rglob('*') if p.is_file())
+            elif path.exists():
+                outputs[str(path)] = path.stat().st_size
+        record = {
+            'id': self.id,
+            'parent': self.parent_id,
+            'name': self.name,
+            'cat': self.category,
+            'process': Path(sys.argv[0]).name,
+            'pid': os.getpid(),
+            'tid': threading.get_native_id(),
+            'start': self.start,
+            'wall_s': round(time.perf_counter() - self._wall, 6),
+            'cpu_s': round(time.thread_time() - self._cpu, 6),
+            'child_cpu_s': round(self.child_cpu_s, 6),
+            'max_rss_kb': self.max_rss_kb,
+            'self_max_rss_kb': max_rss_kb(resource.getrusage(resource.RUSAGE_SELF)) if resource else None,
+            'outputs': outputs,
+            'status': self.status,
+        }
+        if self.args:
+            record['args'] = self.args
+        return record
+
+def configure(path: Optional[Path]):
+    """Start a new trace in path, for this process and the tools it launches."""
+    if path is None:
+        os.environ.pop(TRACE_ENV, None)
+        return
+    path = Path(path).resolve()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.unlink(missing_ok=True)
+    os.environ[TRACE_ENV] = str(path)
+
+def trace_file() -> Optional[Path]:
+    """Return the file spans are written to, or None when tracing is off."""
+    path = os.environ.get(TRACE_ENV)
+    return Path(path) if path else None
+
+def current_span() -> Optional[Span]:
+    """Return the innermost open span of this thread."""
+    stack = getattr(_local, 'stack', None)
+    return stack[-1] if stack else None
+
+def write_record(record: Dict, path: Path):
+    """Append one record as a single write, so concurrent writers never interleave lines."""
+    line = (json.dumps(record) + "\n").encode()
+    fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, line)
+    finally:
+        os.close(fd)
+
+@contextmanager
+def span(name: str, category: str = "", parent: Optional[Span] = None, **args) -> Iterator[Span]:
+    """Time the enclosed block as a span nested in parent (default: this thread's open span).
+
+    The span is written when the block ends; an exception marks it failed.
+    Spans are always created, so callers need not check whether tracing is on.
+    """
+    current = Span(name, category, args, parent or current_span())
+    stack = _local.__dict__.setdefault('stack', [])
+    stack.append(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "failed"
+        current.set(error=str(e) or type(e).__name__)
+        raise
+    finally:
+        stack.pop()
+        if current.parent:
+            current.parent.add_child_usage(current.child_cpu_s, current.max_rss_kb)
+        path = trace_file()
+        if path:
+            write_record(current.record(), path)
+
+def traced(category: str = ""):
+    """Decorate a function to run in a span named after it.
+
+    A returned path is recorded as the span's output; a None or False
+    result marks the span failed, as it does for the callers.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(func.__name__, category) as current:
+                result = func(*args, **kwargs)
+                if isinstance(result, Path):
+                    current.add_outputs(result)
+                elif result is None or result is False:
+                    current.status = "failed"
+                return result
+        return wrapper
+    return decorator
+
+def traced_run(cmd: List, name: Optional[str] = None, category: str = "subprocess",
+               outputs: List = ()) -> subprocess.CompletedProcess:
+    """Run a command like subprocess.run(cmd, capture_output=True, text=True), inside a span.
+
+    The child's CPU time and peak RSS come from its own rusage (os.wait4),
+    so they are exact even when several commands run concurrently.
+    """
+    cmd = [str(c) for c in cmd]
+    with span(name or Path(cmd[0]).name, category, command=cmd) as current:
+        env = dict(os.environ, **{PARENT_ENV: current.id}) if trace_file() else None
+        if not hasattr(os, 'wait4'):
+            result = subprocess.run(cmd, capture_output=True, text=True, env=env)
+        else:
+            # Output goes to files rather than pipes, so waiting on the child cannot deadlock
+            with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+                proc = subprocess.Popen(cmd, stdout=out, stderr=err, env=env)
+                try:
+                    _, status, usage = os.wait4(proc.pid, 0)
+                except BaseException:
+                    proc.kill()
+                    proc.wait()
+                    raise
+                proc.returncode = os.waitstatus_to_exitcode(status)
+                current.add_child_usage(usage.ru_utime + usage.ru_stime, max_rss_kb(usage))
+                out.seek(0)
+                err.seek(0)
+                result = subprocess.CompletedProcess(cmd, proc.returncode,
+                                                     out.read().decode(errors='replace'),
+                                                     err.read().decode(errors='replace'))
+        current.add_outputs(*outputs)
+        current.set(returncode=result.returncode)
+        if result.returncode != 0:
+            current.status = "failed"
+        return result
+
+def read_trace(path: Path) -> List[Dict]:
+    """Read every span record of a trace file, skipping a partially written last line."""
+    records = []
+    with open(path) as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+def chrome_trace(records: List[Dict]) -> Dict:
+    """Convert span records to the Chrome trace-event format (chrome://tracing, Perfetto)."""
+    events = []
+    processes = {}
+    for record in records:
+        processes.setdefault(record['pid'], record['process'])
+        args = {key: record[key] for key in ('cpu_s', 'child_cpu_s', 'max_rss_kb', 'outputs', 'status')}
+        args.update(record.get('args', {}))
+        events.append({
+            'name': record['name'],
+            'cat': record['cat'] or "span",
+            'ph': "X",
+            'ts': round(record['start'] * 1e6),
+            'dur': round(record['wall_s'] * 1e6),
+            'pid': record['pid'],
+            'tid': record['tid'],
+            'args': args,
+        })
+    for pid, process in processes.items():
+        events.append({'name': "process_name", 'ph': "M", 'pid': pid, 'args': {'name': f"{process} ({pid})"}})
+    return {'traceEvents': events, 'displayTimeUnit': "ms"}
+
+def export_chrome_trace(path: Path, output: Optional[Path] = None) -> Path:
+    """Write the Chrome trace of a span file next to it (or to output) and return its path."""
+    output = output or Path(path).with_suffix('.json')
+    with open(output, 'w') as f:
+        json.dump(chrome_trace(read_trace(path)), f)
+    return output
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert a span trace to the Chrome trace-event format')
+    parser.add_argument('trace', type=Path, nargs='?', default=TRACE_FILE, help='Span trace (JSONL)')
+    parser.add_argument('--output', '-o', type=Path, help='Chrome trace file (default: the trace with .json)')
+    args = parser.parse_args()
+
+    try:
+        output = export_chrome_trace(args.trace, args.output)
+    except OSError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    print(f"Wrote {output}; open it in chrome://tracing or https://ui.perfetto.dev")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -5,11 +5,161 @@ import json
 import os
 import sys
 import xml.etree.ElementTree as ET
+import zipfile
 from pathlib import Path
 from typing import Dict, List, Optional
 
-def validate_base_model(model_path: Path) -> List[str]:
-    """Validate a base 3MF model file."""
+# XML namespaces used in 3MF model files
+CORE_NS = '{http://schemas.microsoft.com/3dmanufacturing/core/2015/02}'
+SLIC3R_NS = '{http://schemas.slic3r.org/3mf/2017/06}'
+
+class ModelVisitor:
+    """A check run during the single streaming pass over a 3MF model.
+
+    start() sees each element with its attributes as it opens, end() as it
+    closes; path is the list of enclosing tags. Visitors must only keep
+    counters or small summaries, never the elements themselves.
+    """
+    def start(self, tag: str, attrib: Dict[str, str], path: List[str]):
+        pass
+
+    def end(self, tag: str, path: List[str]):
+        pass
+
+    def errors(self) -> List[str]:
+        return []
+
+class RequiredElements(ModelVisitor):
+    """Check that the model has resources and build sections."""
+    def __init__(self):
+        self.seen = set()
+
+    def start(self, tag, attrib, path):
+        if tag in (CORE_NS + 'resources', CORE_NS + 'build'):
+            self.seen.add(tag)
+
+    def errors(self):
+        errors = []
+        if CORE_NS + 'resources' not in self.seen:
+            errors.append("Missing resources element")
+        if CORE_NS + 'build' not in self.seen:
+            errors.append("Missing build element")
+        return errors
+
+class ObjectAttributes(ModelVisitor):
+    """Check that resources hold objects and every object has an id and a type."""
+    def __init__(self):
+        self.has_resources = False
+        self.objects = 0
+        self.missing = []
+
+    def start(self, tag, attrib, path):
+        if tag == CORE_NS + 'resources':
+            self.has_resources = True
+        elif tag == CORE_NS + 'object' and CORE_NS + 'resources' in path:
+            self.objects += 1
+            if 'id' not in attrib:
+                self.missing.append("Object missing required id attribute")
+            if 'type' not in attrib:
+                self.missing.append("Object missing required type attribute")
+
+    def errors(self):
+        if not self.has_resources:
+            return []  # Reported by RequiredElements
+        if not self.objects:
+            return ["No objects found in model"]
+        return self.missing
+
+class BuildItems(ModelVisitor):
+    """Check that the build section places at least one item."""
+    def __init__(self):
+        self.has_build = False
+        self.items = 0
+
+    def start(self, tag, attrib, path):
+        if tag == CORE_NS + 'build':
+            self.has_build = True
+        elif tag == CORE_NS + 'item' and CORE_NS + 'build' in path:
+            self.items += 1
+
+    def errors(self):
+        if self.has_build and not self.items:
+            return ["No items found in build"]
+        return []
+
+class ModifierMeshes(ModelVisitor):
+    """Check that modifier objects exist and each has a mesh with vertices and triangles."""
+    def __init__(self):
+        self.modifiers = []  # [has mesh, vertex count, triangle count] per modifier
+        self.depth = None  # Depth of the modifier object being read
+
+    def start(self, tag, attrib, path):
+        if tag == CORE_NS + 'object' and attrib.get(SLIC3R_NS + 'modifier') == '1':
+            self.modifiers.append([False, 0, 0])
+            self.depth = len(path)
+        elif self.depth is not None:
+            if tag == CORE_NS + 'mesh':
+                self.modifiers[-1][0] = True
+            elif tag == CORE_NS + 'vertex':
+                self.modifiers[-1][1] += 1
+            elif tag == CORE_NS + 'triangle':
+                self.modifiers[-1][2] += 1
+
+    def end(self, tag, path):
+        if self.depth is not None and len(path) == self.depth:
+            self.depth = None
+
+    def errors(self):
+        if not self.modifiers:
+            return ["No modifier objects found"]
+        errors = []
+        for has_mesh, vertices, triangles in self.modifiers:
+            if not has_mesh:
+                errors.append("Modifier missing mesh element")
+                continue
+            if not vertices:
+                errors.append("Modifier mesh has no vertices")
+            if not triangles:
+                errors.append("Modifier mesh has no triangles")
+        return errors
+
+def visit_model(source, visitors: List[ModelVisitor]) -> List[str]:
+    """Run every visitor over one iterparse pass of a model file.
+
+    Each element is detached from its parent once closed, so memory stays
+    bounded by the nesting depth rather than the mesh size.
+    """
+    path = []
+    elements = []
+    try:
+        for event, element in ET.iterparse(source, events=('start', 'end')):
+            if event == 'start':
+                for visitor in visitors:
+                    visitor.start(element.tag, element.attrib, path)
+                path.append(element.tag)
+                elements.append(element)
+            else:
+                path.pop()
+                elements.pop()
+                for visitor in visitors:
+                    visitor.end(element.tag, path)
+                element.clear()
+                if elements:
+                    elements[-1].remove(element)
+    except ET.ParseError as e:
+        return [f"Invalid XML structure: {e}"]
+
+    errors = []
+    for visitor in visitors:
+        errors.extend(visitor.errors())
+    return errors
+
+def validate_base_model(model_path: Path, visitors: Optional[List[ModelVisitor]] = None) -> List[str]:
+    """Validate a base 3MF model file.
+
+    The archive is opened once and the model streamed once; extra visitors
+    are run in the same pass.
+    """
     errors = []
     
     # Check file exists and has correct extension
@@ -27,31 +177,20 @@ def validate_base_model(model_path: Path) -> List[str]:
     if size > 10 * 1024 * 1024:  # 10MB
         errors.append("File is too large (>10MB)")
     
-    # Try to extract and validate contents
-    import zipfile
+    # Validate contents without extracting them
     try:
         with zipfile.ZipFile(model_path) as zf:
             # Check required files exist
+            names = set(zf.namelist())
             required_files = ['3D/3dmodel.model', 'Metadata/Slic3r_PE.config']
             for file in required_files:
-                if file not in zf.namelist():
+                if file not in names:
                     errors.append(f"Missing required file: {file}")
             
             # Validate model file structure
-            if '3D/3dmodel.model' in zf.namelist():
+            if '3D/3dmodel.model' in names:
                 with zf.open('3D/3dmodel.model') as f:
-                    try:
-                        tree = ET.parse(f)
-                        root = tree.getroot()
-                        
-                        # Check for required elements
-                        if root.find('.//*{http://schemas.microsoft.com/3dmanufacturing/core/2015/02}resources') is None:
-                            errors.append("Missing resources element")
-                        if root.find('.//*{http://schemas.microsoft.com/3dmanufacturing/core/2015/02}build') is None:
-                            errors.append("Missing build element")
-                            
-                    except ET.ParseError as e:
-                        errors.append(f"Invalid XML structure: {e}")
+                    errors.extend(visit_model(f, [RequiredElements()] + (visitors or [])))
                         
     except zipfile.BadZipFile:
         errors.append("Not a valid ZIP/3MF file")
@@ -60,53 +199,10 @@ def validate_base_model(model_path: Path) -> List[str]:
 
 def validate_model_file(model_file: Path) -> List[str]:
     """Validate an extracted model file."""
-    errors = []
-    
     if not model_file.exists():
-        errors.append(f"File not found: {model_file}")
-        return errors
-    
-    try:
-        tree = ET.parse(model_file)
-        root = tree.getroot()
-        
-        # Check namespace declarations
-        ns = {
-            'core': 'http://schemas.microsoft.com/3dmanufacturing/core/2015/02',
-            'slic3r': 'http://schemas.slic3r.org/3mf/2017/06'
-        }
-        
-        # Validate structure
-        resources = root.find('.//core:resources', ns)
-        if resources is None:
-            errors.append("Missing resources element")
-        else:
-            # Check for at least one object
-            objects = resources.findall('.//core:object', ns)
-            if not objects:
-                errors.append("No objects found in model")
-            
-            # Validate each object
-            for obj in objects:
-                if 'id' not in obj.attrib:
-                    errors.append("Object missing required id attribute")
-                if 'type' not in obj.attrib:
-                    errors.append("Object missing required type attribute")
-        
-        # Check build section
-        build = root.find('.//core:build', ns)
-        if build is None:
-            errors.append("Missing build element")
-        else:
-            # Check for at least one item
-            items = build.findall('.//core:item', ns)
-            if not items:
-                errors.append("No items found in build")
-            
-    except ET.ParseError as e:
-        errors.append(f"Invalid XML structure: {e}")
+        return [f"File not found: {model_file}"]
     
-    return errors
+    return visit_model(str(model_file), [RequiredElements(), ObjectAttributes(), BuildItems()])
 
 def validate_metadata(metadata_dir: Path) -> List[str]:
     """Validate metadata files."""
@@ -135,49 +231,11 @@ def validate_metadata(metadata_dir: Path) -> List[str]:
 
 def validate_modifier(model_path: Path) -> List[str]:
     """Validate a model with modifier."""
-    errors = []
-    
     if not model_path.exists():
-        errors.append(f"File not found: {model_path}")
-        return errors
+        return [f"File not found: {model_path}"]
     
-    # First run base model validation
-    errors.extend(validate_base_model(model_path))
-    if errors:
-        return errors
-    
-    # Check for modifier-specific elements
-    import zipfile
-    with zipfile.ZipFile(model_path) as zf:
-        with zf.open('3D/3dmodel.model') as f:
-            tree = ET.parse(f)
-            root = tree.getroot()
-            
-            # Check for modifier object
-            ns = {
-                'core': 'http://schemas.microsoft.com/3dmanufacturing/core/2015/02',
-                'slic3r': 'http://schemas.slic3r.org/3mf/2017/06'
-            }
-            
-            modifiers = root.findall('.//core:object[@slic3r:modifier="1"]', ns)
-            if not modifiers:
-                errors.append("No modifier objects found")
-            
-            # Check modifier mesh
-            for modifier in modifiers:
-                mesh = modifier.find('.//core:mesh', ns)
-                if mesh is None:
-                    errors.append("Modifier missing mesh element")
-                else:
-                    vertices = mesh.find('.//core:vertices', ns)
-                    triangles = mesh.find('.//core:triangles', ns)
-                    
-                    if vertices is None or len(vertices) == 0:
-                        errors.append("Modifier mesh has no vertices")
-                    if triangles is None or len(triangles) == 0:
-                        errors.append("Modifier mesh has no triangles")
-    
-    return errors
+    # Base checks and modifier checks share one pass over the model
+    return validate_base_model(model_path, [ModifierMeshes()])
 
 def validate_stage(stage: str, path: Path) -> bool:
     """Validate a specific pipeline stage."""
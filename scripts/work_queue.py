@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from artifact_cache import ArtifactStore
+from pipeline import PipelineStage, SwatchPipeline, check_dependencies, job_name, run_pipelines
+from run_ledger import LEDGER_FILE, LOCAL_JOURNAL, SHARED_JOURNAL, RunLedger, Transaction, connect
+
+# Default location of the shared work queue
+QUEUE_FILE = Path('.cache/queue.db')
+
+# Where workers publish finished swatches
+PUBLISH_DIR = Path('output/queue')
+
+# How long a lease lasts without a heartbeat (seconds); workers renew it every third of this
+LEASE_SECONDS = 300.0
+
+# Leases a task gets (crashes and failures included) before it is marked failed
+MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    job TEXT PRIMARY KEY,
+    config TEXT NOT NULL,
+    status TEXT NOT NULL,
+    worker TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_expires REAL,
+    artifacts TEXT,
+    message TEXT,
+    enqueued REAL,
+    finished REAL
+);
+"""
+
+class Lease:
+    """A worker's claim on one task; `token` fences it against later leases of the same task."""
+    def __init__(self, job: str, config: Dict, worker: str, token: int):
+        self.job = job
+        self.config = config
+        self.worker = worker
+        self.token = token
+
+class WorkQueue:
+    """Pull-based queue of swatch jobs shared by worker processes.
+
+    Backed by one SQLite database like the run ledger: in WAL mode for
+    workers on one host, or with the rollback journal (SHARED_JOURNAL) when
+    hosts share the file. A worker leases a task, renews the lease with
+    heartbeats while it builds, and publishes the result. A lease that is not
+    renewed expires, and the task goes back to the queue, so a crashed
+    worker's task is rebuilt by another one.
+    """
+    def __init__(self, path: Path = QUEUE_FILE, lease_seconds: float = LEASE_SECONDS,
+                 max_attempts: int = MAX_ATTEMPTS, journal_mode: str = LOCAL_JOURNAL):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.journal_mode = journal_mode
+        self._local = threading.local()
+        self.connection().executescript(SCHEMA)
+
+    def connection(self) -> sqlite3.Connection:
+        """Return this thread's connection, opening it on first use."""
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = connect(self.path, self.journal_mode)
+        return db
+
+    def transaction(self):
+        """Return a context manager holding the write lock for its duration."""
+        return Transaction(self.connection())
+
+    def enqueue(self, config: Dict) -> bool:
+        """Add a swatch job; a failed job is queued again, a queued, leased or done one is left alone.
+
+        Returns:
+            Whether the job was (re)queued
+        """
+        with self.transaction() as db:
+            cursor = db.execute(
+                "INSERT INTO tasks (job, config, status, enqueued) VALUES (?, ?, 'queued', ?) "
+                "ON CONFLICT (job) DO UPDATE SET config = excluded.config, status = 'queued',"
+                " attempts = 0, message = NULL, enqueued = excluded.enqueued WHERE status = 'failed'",
+                (job_name(config), json.dumps(config, sort_keys=True), time.time()))
+            return cursor.rowcount == 1
+
+    def _expire(self, db: sqlite3.Connection):
+        """Requeue tasks whose lease ran out, or fail them once they used up their attempts."""
+        db.execute("UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,"
+                   " worker = NULL, lease_expires = NULL, message = 'lease expired'"
+                   " WHERE status = 'leased' AND lease_expires < ?", (self.max_attempts, time.time()))
+
+    def lease(self, worker: str) -> Optional[Lease]:
+        """Lease the oldest queued task, first requeueing expired leases; None when nothing is queued."""
+        with self.transaction() as db:
+            self._expire(db)
+            row = db.execute("SELECT job, config, attempts FROM tasks WHERE status = 'queued' "
+                             "ORDER BY enqueued, rowid LIMIT 1").fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE tasks SET status = 'leased', worker = ?, attempts = attempts + 1,"
+                       " lease_expires = ? WHERE job = ?",
+                       (worker, time.time() + self.lease_seconds, row['job']))
+            return Lease(row['job'], json.loads(row['config']), worker, row['attempts'] + 1)
+
+    def _holds(self, db: sqlite3.Connection, lease: Lease) -> bool:
+        """Return whether a lease is still the current one for its task."""
+        row = db.execute("SELECT 1 FROM tasks WHERE job = ? AND status = 'leased' AND worker = ? AND attempts = ?",
+                         (lease.job, lease.worker, lease.token)).fetchone()
+        return row is not None
+
+    def heartbeat(self, lease: Lease) -> bool:
+        """Extend a lease; False means it was lost and the worker should give the task up."""
+        with self.transaction() as db:
+            cursor = db.execute("UPDATE tasks SET lease_expires = ? WHERE job = ? AND status = 'leased'"
+                                " AND worker = ? AND attempts = ?",
+                                (time.time() + self.lease_seconds, lease.job, lease.worker, lease.token))
+            return cursor.rowcount == 1
+
+    def fail(self, lease: Lease, message: str):
+        """Give a task back after a failed build; it is retried until it used up its attempts."""
+        with self.transaction() as db:
+            if self._holds(db, lease):
+                db.execute("UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,"
+                           " worker = NULL, lease_expires = NULL, message = ? WHERE job = ?",
+                           (self.max_attempts, message, lease.job))
+
+    def publish(self, lease: Lease, artifacts: Dict[str, Path], publish_dir: Path = PUBLISH_DIR) -> bool:
+        """Publish a task's artifacts as `{job}.{name}` and mark it done, if the lease is still held.
+
+        The files are copied next to their destination first. The lease check,
+        the renames into place and the status update then happen under the
+        queue's write lock, so a worker whose lease expired can never publish
+        over the worker that took the task over. If a worker dies between the
+        renames and the commit, the task is rebuilt after its lease expires
+        and the same paths are replaced again, so every published file is
+        complete and every task is recorded done once.
+
+        Returns:
+            Whether the artifacts were published
+        """
+        publish_dir = Path(publish_dir)
+        publish_dir.mkdir(parents=True, exist_ok=True)
+        staged = {}
+        try:
+            for name, path in artifacts.items():
+                final = publish_dir / f"{lease.job}.{name}"
+                staged[final] = publish_dir / f".{final.name}.{lease.token}.tmp"
+                shutil.copyfile(path, staged[final])
+            with self.transaction() as db:
+                if not self._holds(db, lease):
+                    return False
+                for final, tmp in staged.items():
+                    os.replace(tmp, final)
+                    # Copies left behind by earlier leases of this task
+                    for stale in publish_dir.glob(f".{final.name}.*.tmp"):
+                        stale.unlink(missing_ok=True)
+                db.execute("UPDATE tasks SET status = 'done', worker = NULL, lease_expires = NULL,"
+                           " artifacts = ?, message = NULL, finished = ? WHERE job = ?",
+                           (json.dumps({name: str(final) for name, final in zip(artifacts, staged)}),
+                            time.time(), lease.job))
+            return True
+        finally:
+            for tmp in staged.values():
+                tmp.unlink(missing_ok=True)
+
+    def requeue_failed(self) -> int:
+        """Queue every failed task again with fresh attempts; returns how many."""
+        with self.transaction() as db:
+            return db.execute("UPDATE tasks SET status = 'queued', attempts = 0, message = NULL"
+                              " WHERE status = 'failed'").rowcount
+
+    def tasks(self) -> Dict[str, Dict]:
+        """Return the state of every task, by job."""
+        rows = self.connection().execute("SELECT * FROM tasks ORDER BY enqueued, rowid")
+        return {row['job']: dict(row) for row in rows}
+
+    def summary(self) -> Dict[str, int]:
+        """Count tasks by status."""
+        rows = self.connection().execute("SELECT status, COUNT(*) AS n FROM tasks GROUP BY status")
+        return {row['status']: row['n'] for row in rows}
+
+    def unfinished(self) -> int:
+        """Count tasks that are queued or leased."""
+        summary = self.summary()
+        return summary.get('queued', 0) + summary.get('leased', 0)
+
+def default_worker_id() -> str:
+    """Name this worker process by host and pid."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def run_worker(queue: WorkQueue, build: Callable[[Dict], Optional[Dict[str, Path]]],
+               worker: Optional[str] = None, publish_dir: Path = PUBLISH_DIR,
+               poll: float = 5.0) -> Dict[str, int]:
+    """Lease, build and publish tasks until no task is queued or leased.
+
+    `build` turns a job config and its lease token into the artifacts by
+    name, or returns None when the build failed. While it runs, a thread renews the lease. A worker
+    whose lease was lost finishes the build but does not publish it.
+
+    Returns:
+        The number of tasks this worker published, failed and lost
+    """
+    worker = worker or default_worker_id()
+    counts = {'published': 0, 'failed': 0, 'lost': 0}
+    while True:
+        lease = queue.lease(worker)
+        if lease is None:
+            if not queue.unfinished():
+                return counts
+            # Other workers hold the rest; one of them may still crash
+            time.sleep(poll)
+            continue
+
+        print(f"[{worker}] {lease.job} (attempt {lease.token})")
+        stop = threading.Event()
+        lost = threading.Event()
+
+        def _heartbeat():
+            while not stop.wait(queue.lease_seconds / 3):
+                if not queue.heartbeat(lease):
+                    lost.set()
+                    return
+
+        beat = threading.Thread(target=_heartbeat, daemon=True)
+        beat.start()
+        try:
+            artifacts, message = build(lease.config, lease.token), "build failed"
+        except Exception as e:
+            artifacts, message = None, str(e)
+        finally:
+            stop.set()
+            beat.join()
+
+        if artifacts is None:
+            print(f"[{worker}] {lease.job} failed: {message}", file=sys.stderr)
+            queue.fail(lease, message)
+            counts['failed'] += 1
+        elif not lost.is_set() and queue.publish(lease, artifacts, publish_dir):
+            print(f"[{worker}] {lease.job} published")
+            counts['published'] += 1
+        else:
+            print(f"[{worker}] {lease.job}: lease lost, not publishing", file=sys.stderr)
+            counts['lost'] += 1
+
+def build_swatch(config: Dict, token: int, work_dir: Path, store: Optional[ArtifactStore], ledger: RunLedger,
+                 run_id: Optional[int] = None, max_workers: int = 1,
+                 deep_check: bool = False) -> Optional[Dict[str, Path]]:
+    """Run a swatch's SwatchPipeline stages and return its final 3MF.
+
+    Every lease builds in its own directory, `work_dir/<job>/<token>`, and
+    does not restore stages recorded by earlier leases: a worker whose lease
+    expired may still be running and writing its own files. Renders still
+    come from the artifact cache.
+    """
+    lease_dir = work_dir / job_name(config) / str(token)
+    pipeline = SwatchPipeline(config, lease_dir / "tmp", store, ledger, run_id,
+                              validation_dir=lease_dir, resume=False)
+    try:
+        succeeded, = run_pipelines([pipeline], max_workers, deep_check=deep_check)
+        if not succeeded:
+            return None
+        return {'3mf': pipeline.stages[PipelineStage.MODIFIER].output_file}
+    finally:
+        pipeline.cleanup()
+
+def main():
+    parser = argparse.ArgumentParser(description='Distribute swatch pipelines over pull-based workers')
+    parser.add_argument('command', choices=['enqueue', 'work', 'status', 'requeue'],
+                      help='enqueue: add jobs; work: run a worker; status: show tasks; '
+                           'requeue: retry failed tasks')
+    parser.add_argument('--queue', type=Path, default=QUEUE_FILE, help='Work queue database')
+    parser.add_argument('--config', '-c', nargs='+', default=[], help='Configuration file(s) to enqueue')
+    parser.add_argument('--worker', help='Worker name (default: host:pid)')
+    parser.add_argument('--publish-dir', type=Path, default=PUBLISH_DIR, help='Where finished swatches go')
+    parser.add_argument('--lease', type=float, default=LEASE_SECONDS,
+                      help=f'Lease length in seconds (default: {LEASE_SECONDS:g})')
+    parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS,
+                      help=f'Leases per task before it is marked failed (default: {MAX_ATTEMPTS})')
+    parser.add_argument('--poll', type=float, default=5.0,
+                      help='Seconds between polls while other workers hold the remaining tasks')
+    parser.add_argument('--ledger', type=Path, default=LEDGER_FILE, help='Run ledger database')
+    parser.add_argument('--shared', action='store_true',
+                      help='The queue and ledger are shared by several hosts over a network file system '
+                           '(use the rollback journal instead of WAL)')
+    parser.add_argument('--work-dir', '-w', type=Path, default=Path("tests/tmp"), help='Working directory')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                      help='Maximum number of stages of one swatch running at once')
+    parser.add_argument('--no-cache', action='store_true',
+                      help='Always run OpenSCAD instead of using the artifact cache')
+    parser.add_argument('--deep-check', action='store_true',
+                      help='Also load the final model in PrusaSlicer after the mesh check')
+    parser.add_argument('--skip-dependency-check', action='store_true',
+                      help='Skip checking for external dependencies')
+    args = parser.parse_args()
+
+    if args.command in ('status', 'requeue') and not args.queue.exists():
+        print(f"Error: No queue at {args.queue}", file=sys.stderr)
+        return 1
+    journal_mode = SHARED_JOURNAL if args.shared else LOCAL_JOURNAL
+    queue = WorkQueue(args.queue, args.lease, args.max_attempts, journal_mode)
+
+    if args.command == 'enqueue':
+        if not args.config:
+            parser.error("enqueue needs --config")
+        added = 0
+        for config_file in args.config:
+            try:
+                with open(config_file) as f:
+                    added += queue.enqueue(json.load(f))
+            except (FileNotFoundError, json.JSONDecodeError) as e:
+                print(f"Error reading config {config_file}: {e}", file=sys.stderr)
+                return 1
+        print(f"Queued {added} of {len(args.config)} jobs in {args.queue}")
+    elif args.command == 'status':
+        for status, count in sorted(queue.summary().items()):
+            print(f"{status:10} {count}")
+        for job, task in queue.tasks().items():
+            if task['status'] == 'leased':
+                print(f"  {job}: {task['worker']}, attempt {task['attempts']}, "
+                      f"lease ends in {task['lease_expires'] - time.time():.0f}s")
+            elif task['status'] == 'failed':
+                print(f"  {job}: failed after {task['attempts']} attempts: {task['message']}")
+    elif args.command == 'requeue':
+        print(f"Queued {queue.requeue_failed()} failed jobs again")
+    else:
+        if not args.skip_dependency_check and not check_dependencies():
+            print("Missing required dependencies. Please install them and try again.", file=sys.stderr)
+            return 1
+        ledger = RunLedger(args.ledger, journal_mode)
+        store = None if args.no_cache else ArtifactStore()
+        run_id = ledger.start_run(sys.argv)
+        counts = {}
+        try:
+            counts = run_worker(
+                queue,
+                lambda config, token: build_swatch(config, token, args.work_dir, store, ledger, run_id,
+                                                   max(1, args.jobs), args.deep_check),
+                args.worker, args.publish_dir, args.poll)
+        finally:
+            ledger.finish_run(run_id, bool(counts) and not counts['failed'])
+        print(f"Published {counts['published']}, failed {counts['failed']}, lost {counts['lost']} leases")
+        if queue.summary().get('failed'):
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())